@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from typing import List
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -23,9 +23,176 @@ class Settings(BaseSettings):
     MODBUS_STOPBITS: int = Field(default=1, description="停止位: 1 或 2，默认1")
     MODBUS_BYTESIZE: int = Field(default=8, description="数据位: 7 或 8，默认8")
     
+    # SensorCore 振动/温度传感器（独立 RS485 串口，协议见 docs/RS485通信协议说明_SensorCore.md）
+    SENSORCORE_ENABLED: bool = Field(default=False, description="是否启用 SensorCore 采集")
+    SENSORCORE_PORT: str = Field(default="COM6", description="SensorCore 串口名称")
+    SENSORCORE_BAUDRATE: int = Field(default=115200, description="SensorCore 波特率")
+    SENSORCORE_STALE_TIMEOUT: float = Field(default=2.0, description="超过该秒数未更新的 SensorCore 数据视为过期，不再合并")
+    SENSORCORE_RECONNECT_INTERVAL: float = Field(default=2.0, description="SensorCore 串口断开后的重连间隔（秒）")
+    SENSORCORE_LATENCY: float = Field(default=0.15, description="SensorCore 帧相对接收时刻的滞后（秒），默认取 512 点 FFT 窗口(1660Hz)的中心")
+    
+    # 驱动器 / SensorCore 数据融合
+    FUSION_MODE: str = Field(default="interp", description="对齐方式：interp（线性插值）或 asof（取帧时刻之前最近的驱动器样本）")
+    FUSION_MAX_GAP: float = Field(default=0.5, description="帧两侧驱动器样本间隔超过该秒数时不融合（通信中断）")
+    FUSION_DRIVE_BUFFER: int = Field(default=600, description="驱动器样本缓冲长度")
+    FUSION_SENSOR_BUFFER: int = Field(default=120, description="SensorCore 帧缓冲长度")
+    FUSION_OUTPUT_BUFFER: int = Field(default=7200, description="融合结果缓冲长度（2Hz 下约 1 小时）")
+    
+    # 原始振动波形与频谱分析（POST /api/vibration/waveform 上传的波形块）
+    SPECTRUM_NPERSEG: int = Field(default=1024, description="Welch 分段长度（FFT 点数）")
+    SPECTRUM_OVERLAP: float = Field(default=0.5, description="Welch 分段重叠比例（0~1）")
+    SPECTRUM_WINDOW: str = Field(default="hann", description="窗函数：hann / hamming / blackman / rect")
+    SPECTRUM_BANDS: List[List[float]] = Field(
+        default_factory=lambda: [[0, 100], [100, 500], [500, 2000], [2000, 5000]],
+        description="频带能量的频带列表 [[下限Hz, 上限Hz], ...]",
+    )
+    SPECTRUM_IMPULSE_THRESHOLD: float = Field(default=4.0, description="冲击判定阈值（RMS 的倍数）")
+    WAVEFORM_BUFFER_SECONDS: float = Field(default=600.0, description="内存中保留的原始波形时长（秒）")
+    WAVEFORM_STALE_TIMEOUT: float = Field(default=2.0, description="超过该秒数没有新波形时不再用波形结果填充振动指标")
+    SPECTROGRAM_TILE_COLUMNS: int = Field(default=256, description="时频图每个缓存瓦片的列数")
+    SPECTROGRAM_MAX_SEGMENTS_PER_COLUMN: int = Field(default=8, description="时频图每列最多平均的 FFT 段数（列宽较大时抽取）")
+    SPECTROGRAM_CACHE_MB: int = Field(default=64, description="时频图瓦片缓存上限（MB），超出按最近最少使用淘汰")
+    SPECTROGRAM_DB_MIN: float = Field(default=-120.0, description="时频图量化下限（dB），可由请求参数覆盖")
+    SPECTROGRAM_DB_MAX: float = Field(default=0.0, description="时频图量化上限（dB），可由请求参数覆盖")
+    
+    # 阶次跟踪（以驱动器转速为转速计，对原始波形做等角度重采样）
+    ORDER_SAMPLES_PER_REV: int = Field(default=64, description="每转的等角度采样点数，可分析的最高阶次为其一半")
+    ORDER_REVOLUTIONS: int = Field(default=16, description="每帧阶次谱包含的转数，阶次分辨率 = 1 / 转数")
+    ORDER_MIN_RPM: float = Field(default=60.0, description="低于该转速时不做阶次跟踪")
+    ORDER_BEARING_ORDERS: Dict[str, float] = Field(
+        default_factory=dict,
+        description='轴承故障阶次，如 {"bpfo": 3.58, "bpfi": 5.42, "bsf": 2.32, "ftf": 0.40}',
+    )
+    
+    # 健康指数 / 刀具磨损在线估计
+    HEALTH_STATE_FILE: str = Field(default="data/health_state.json", description="估计器状态文件，重启后继续累计")
+    HEALTH_SAVE_INTERVAL: float = Field(default=60.0, description="状态文件保存间隔（秒）")
+    HEALTH_MIN_RPM: float = Field(default=100.0, description="高于该转速才视为运行，参与基线学习和磨损累计")
+    HEALTH_FAST_TAU: float = Field(default=10.0, description="快速 EWMA 时间常数（秒）")
+    HEALTH_BASELINE_TAU: float = Field(default=86400.0, description="基线 EWMA 时间常数（秒）")
+    HEALTH_WARMUP_SECONDS: float = Field(default=600.0, description="基线学习时长（运行秒数），期间健康指数保持 100")
+    HEALTH_RMS_WEIGHT: float = Field(default=1.0, description="振动 RMS 相对基线升高的权重")
+    HEALTH_IMPULSE_WEIGHT: float = Field(default=0.5, description="冲击次数相对基线升高的权重")
+    HEALTH_CURRENT_WEIGHT: float = Field(default=2.0, description="电流/转矩比相对基线漂移的权重")
+    TOOL_LIFE_HOURS: float = Field(default=100.0, description="刀具寿命（满负载小时），累计到该值时磨损为 100%")
+    TOOL_WEAR_LOAD_EXPONENT: float = Field(default=1.5, description="磨损速率随负载的指数，1 为线性")
+    
+    # 流式异常检测（EWMA z-score / CUSUM）与事件日志
+    ANOMALY_ENABLED: bool = Field(default=True, description="是否启用遥测异常检测")
+    ANOMALY_BATCH_SIZE: int = Field(default=100, ge=1, description="攒够多少个样本做一次向量化检测（10Hz 下 100 个约 10 秒，即最大报警延迟）；批大小约 100 起每 (样本, 通道) 开销低于 1µs，10 个时约 4µs")
+    ANOMALY_ALPHA: float = Field(default=0.01, description="EWMA 均值/方差的平滑系数")
+    ANOMALY_BASELINE_ALPHA: float = Field(default=0.001, description="CUSUM 参考基线的 EWMA 平滑系数（应远小于 ANOMALY_ALPHA）")
+    ANOMALY_Z_THRESHOLD: float = Field(default=6.0, description="z-score 报警阈值")
+    ANOMALY_CUSUM_K: float = Field(default=0.5, description="CUSUM 允许偏移量（以标准差计）")
+    ANOMALY_CUSUM_H: float = Field(default=12.0, description="CUSUM 报警阈值")
+    ANOMALY_WARMUP_SAMPLES: int = Field(default=300, description="每个通道前多少个样本只学习不报警")
+    ANOMALY_SLOPE_WINDOW: float = Field(default=30.0, description="温度变化率的计算窗口（秒）")
+    ANOMALY_RPM_SETTLE_SECONDS: float = Field(default=3.0, description="转速设定值变化后多少秒内不检测转速跟踪误差")
+    EVENT_DB_FILE: str = Field(default="data/events.db", description="事件日志 SQLite 文件")
+    
+    # 能耗与工况累计（电能、运行时间、转速×转矩工况谱）
+    ENERGY_ENABLED: bool = Field(default=True, description="是否启用能耗与工况累计")
+    ENERGY_DB_FILE: str = Field(default="data/energy.db", description="能耗时间桶 SQLite 文件")
+    ENERGY_BUCKET_MINUTES: float = Field(default=15.0, description="时间桶长度（分钟），班次起点应为其整数倍")
+    ENERGY_SAVE_INTERVAL: float = Field(default=60.0, description="时间桶写入数据库的间隔（秒）")
+    ENERGY_MAX_GAP_SECONDS: float = Field(default=5.0, description="相邻样本间隔超过该值（断线/暂停）时该区间不积分")
+    ENERGY_RUN_RPM_THRESHOLDS: List[float] = Field(default=[100.0, 1000.0, 2000.0], description="分别累计转速高于各阈值的运行时间")
+    ENERGY_DWELL_RPM_MAX: float = Field(default=3000.0, description="工况谱转速上限（rpm），超出计入最后一格")
+    ENERGY_DWELL_RPM_BINS: int = Field(default=30, description="工况谱转速分格数")
+    ENERGY_DWELL_TORQUE_MAX: float = Field(default=10.0, description="工况谱转矩上限（N·m），超出计入最后一格")
+    ENERGY_DWELL_TORQUE_BINS: int = Field(default=20, description="工况谱转矩分格数")
+    ENERGY_SHIFTS: Dict[str, str] = Field(
+        default={"A": "06:00", "B": "14:00", "C": "22:00"},
+        description="班次名称 → 本地起始时间（HH:MM），按班次汇总时使用",
+    )
+    
+    # 转速×转矩运行点 / 效率图（每天一张，可跨天、跨驱动器合并）
+    OPERATING_MAP_ENABLED: bool = Field(default=True, description="是否启用运行点图")
+    OPERATING_MAP_DIR: str = Field(default="data/operating_map", description="运行点图目录（每天一个 npz 文件）")
+    OPERATING_MAP_DRIVE: str = Field(default="drive-1", description="本驱动器名称，合并多台驱动器的图时用于区分来源")
+    OPERATING_MAP_SAVE_INTERVAL: float = Field(default=60.0, description="当天的图写入文件的间隔（秒）")
+    OPERATING_MAP_RPM_MAX: float = Field(default=3000.0, description="转速上限（rpm），超出计入最后一格")
+    OPERATING_MAP_RPM_BINS: int = Field(default=30, description="转速分格数")
+    OPERATING_MAP_TORQUE_MAX: float = Field(default=10.0, description="转矩上限（N·m），超出计入最后一格")
+    OPERATING_MAP_TORQUE_BINS: int = Field(default=20, description="转矩分格数")
+    
+    # 历史数据存储（压缩分段文件）
+    HISTORY_ENABLED: bool = Field(default=True, description="是否持久化遥测历史数据")
+    HISTORY_DIR: str = Field(default="data/history", description="历史数据分段文件目录")
+    HISTORY_BLOCK_SIZE: int = Field(default=256, ge=1, le=65535, description="每个压缩块的样本数（块头按 uint16 存储，最大 65535），越大压缩率越高、落盘越晚")
+    
+    # 原始寄存器抓取（内存映射环形日志，用于故障后还原）
+    CAPTURE_ENABLED: bool = Field(default=False, description="是否记录每次寄存器读写的原始值")
+    CAPTURE_FILE: str = Field(default="data/capture/raw_registers.bin", description="抓取文件路径，上次运行的文件保留为 .prev")
+    CAPTURE_CAPACITY: int = Field(default=200000, ge=1, description="环形日志容量（记录条数，每条48字节）")
+    
+    # 回放（USE_MODBUS=false 时可用录制数据代替随机模拟数据）
+    REPLAY_SOURCE: str = Field(default="", description="启动时回放的数据源：抓取文件路径，或 history 表示历史存储；留空不回放")
+    REPLAY_SPEED: float = Field(default=1.0, description="回放倍速，1=实时，10=十倍速，0=最快")
+    REPLAY_LOOP: bool = Field(default=False, description="回放结束后是否从头循环")
+    
     # 心跳配置
     HEARTBEAT_INTERVAL: float = Field(default=0.5, description="心跳更新间隔（秒），建议小于超时时间的一半")
     
+    # Modbus 专用执行器（路由中的阻塞总线调用，带准入控制）
+    BUS_EXECUTOR_WORKERS: int = Field(default=1, description="总线执行器线程数；串口是串行的，多于 1 个线程只会在串口锁上排队")
+    BUS_EXECUTOR_MAX_QUEUE: int = Field(default=8, description="最多排队的总线调用数，超过后直接返回 503 或旧数据")
+    BUS_EXECUTOR_QUEUE_TIMEOUT: float = Field(default=0.5, description="排队超过多少秒才轮到的调用不再执行（控制写入除外）")
+    BUS_EXECUTOR_TIMEOUT: float = Field(default=3.0, description="调用方最多等待多少秒（控制写入除外，写入被接收后等待其执行完）")
+    STATUS_MAX_AGE_MS: float = Field(default=500.0, description="/status/detailed、/fault 默认可接受的寄存器镜像时长（毫秒），更旧时才读总线")
+    
+    # 多速率轮询（快通道每个槽都读，慢通道按抽取比读）
+    POLL_SCHEDULE_ENABLED: bool = Field(default=True, description="是否按多速率计划轮询；关闭时为固定 10Hz 整块读取")
+    POLL_RATES: Dict[str, float] = Field(
+        default={
+            "rpm": 0, "motor_current": 0, "position": 0,
+            "power": 10, "duty_cycle": 10, "bus_current": 10, "angle": 10,
+            "fault": 2, "temperature": 1, "voltage": 1,
+        },
+        description="通道 → 目标频率（Hz），0 表示在总线预算内尽可能快；通道名同 decode_input_block",
+    )
+    POLL_DEFAULT_RATE: float = Field(default=1.0, description="POLL_RATES 未列出的通道的频率（Hz）")
+    POLL_BUS_BUDGET: float = Field(default=0.7, description="轮询可占用的总线时间比例，其余留给控制写入和心跳")
+    POLL_MAX_RATE: float = Field(default=100.0, description="轮询槽频率上限（Hz），即快通道的最高频率")
+    POLL_TURNAROUND_MS: float = Field(default=3.0, description="驱动器每次应答的处理时间（毫秒），用于估计总线时间")
+    POLL_RATE_WINDOW: float = Field(default=10.0, description="统计各通道实际频率的窗口（秒）")
+    POLL_PUBLISH_HZ: float = Field(default=10.0, gt=0, description="发布到遥测管道的频率（Hz）；轮询更快时其余读取只刷新寄存器镜像")
+    
+    # 安全看门狗（独立线程发送心跳，并监视事件循环）
+    WATCHDOG_ENABLED: bool = Field(default=True, description="是否由看门狗线程发送心跳；关闭时回退为 asyncio 心跳任务")
+    WATCHDOG_LOOP_TIMEOUT: float = Field(default=2.0, description="事件循环无响应多少秒后停机（空模式）并暂停心跳")
+    WATCHDOG_PING_INTERVAL: float = Field(default=0.1, description="事件循环活性计数器的递增间隔（秒）")
+    WATCHDOG_THREAD_PRIORITY: int = Field(default=0, description="看门狗线程的 SCHED_FIFO 优先级（1-99，需要 CAP_SYS_NICE）；0 表示不调整")
+    
+    # 事件循环延迟监视
+    LOOP_MONITOR_ENABLED: bool = Field(default=True, description="是否持续测量事件循环调度延迟并抓取阻塞调用栈")
+    LOOP_LAG_INTERVAL: float = Field(default=0.05, description="采样任务的 sleep 间隔（秒）")
+    LOOP_LAG_THRESHOLD: float = Field(default=0.1, description="调度延迟超过多少秒视为阻塞并抓取调用栈")
+    LOOP_LAG_STACK_DEPTH: int = Field(default=15, description="抓取调用栈的最大帧数（从最内层算起）")
+    
+    # 运动曲线执行器（后端按固定节拍发送转速/转矩设定值）
+    PROFILE_UPDATE_HZ: float = Field(default=20.0, description="线性插值曲线的设定值更新频率（Hz）")
+    PROFILE_MAX_DURATION: float = Field(default=3600.0, description="单条曲线最长时长（秒）")
+    PROFILE_MAX_POINTS: int = Field(default=100000, description="单条曲线编译后的最大设定值个数")
+    
+    # 控制命令延迟测量（HTTP 接收 → 开始处理 → 寄存器写入 → 遥测响应）
+    LATENCY_RESPONSE_PERCENT: float = Field(default=5.0, description="实测值进入目标的 ±百分比 范围即视为驱动器已响应")
+    LATENCY_RESPONSE_FLOOR: float = Field(default=10.0, description="响应判定的最小绝对容差（目标接近 0 时使用，rpm 或 N·m）")
+    LATENCY_RESPONSE_TIMEOUT: float = Field(default=10.0, description="写入后多少秒未观察到响应计为超时")
+    
+    # 阶跃响应 / 系统辨识实验
+    STEP_TEST_SAMPLE_HZ: float = Field(default=100.0, description="实验期间直接读取输入寄存器块的频率（Hz），受总线速率限制")
+    STEP_TEST_MAX_SECONDS: float = Field(default=60.0, description="单次实验最长时长（秒）")
+    STEP_TEST_MAX_DELAY: float = Field(default=0.5, description="模型拟合搜索的最大纯滞后（秒）")
+    STEP_TEST_SETTLING_BAND: float = Field(default=0.02, description="调节时间的误差带（相对阶跃幅值）")
+    STEP_TEST_RESULTS_FILE: str = Field(default="data/step_tests.jsonl", description="实验结果文件（JSON Lines，追加写入）")
+    
+    # 位置航点队列（按轮询到的位置判定到位后发送下一个目标）
+    WAYPOINT_TOLERANCE: float = Field(default=0.5, description="默认到位容差（度）")
+    WAYPOINT_SETTLE_SAMPLES: int = Field(default=2, description="连续多少个样本在容差内才判定到位")
+    WAYPOINT_TIMEOUT: float = Field(default=30.0, description="单个航点发出后多少秒未到位判定失败并停机")
+    WAYPOINT_MAX_POINTS: int = Field(default=1000, description="单个序列最多航点数")
+    
     # 电机参数（用于转速转换）
     MOTOR_POLE_PAIRS: int = Field(default=4, description="电机极对数，用于 erpm 转 rpm：rpm = erpm / 极对数")
     
@@ -35,6 +202,9 @@ class Settings(BaseSettings):
     # 或者：转矩(Nm) = 电流(A) × 0.4
     # 注意：后端返回单位为 N·m，前端显示时转换为 mN·m（乘以1000）
     TORQUE_CURRENT_RATIO: float = Field(default=0.4, description="转矩转换系数：转矩(Nm) = 电流(A) × 此系数。默认0.4对应每安培400mN·m")
+    # 电流 × 温度 → 转矩 标定表（CSV，生成方法见 calibrate_torque.py），配置后替代上面的线性系数
+    TORQUE_TABLE_FILE: str = Field(default="", description="转矩标定表文件路径，留空使用 TORQUE_CURRENT_RATIO 线性模型")
+    TORQUE_REFERENCE_TEMPERATURE: float = Field(default=25.0, description="尚未读到电机温度时，转矩设定值换算电流使用的温度（℃）")
     
     # 输入寄存器地址（功能码 0x04，只读）
     # 注意：地址是实际寄存器地址，不是从0开始
@@ -0,0 +1,19 @@
+"""
+ASGI 中间件
+"""
+import time
+
+
+class ReceiveTimestampMiddleware:
+    """
+    在请求进入应用时记录 time.monotonic()，路由中通过 request.state.received_mono 读取
+    （纯 ASGI 实现，不经过 BaseHTTPMiddleware 的额外任务调度，时间戳更接近实际到达时刻）
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["received_mono"] = time.monotonic()
+        await self.app(scope, receive, send)
@@ -17,10 +17,34 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.routers.control import router as control_router
+from app.routers.energy import router as energy_router
+from app.routers.events import router as events_router
 from app.routers.health import router as health_router
+from app.routers.history import router as history_router
+from app.routers.replay import router as replay_router
+from app.routers.vibration import router as vibration_router
 from app.core.config import settings
+from app.core.middleware import ReceiveTimestampMiddleware
 from app.services.mock_data_service import generate_mock_data
+from app.services.anomaly_service import anomaly_service
+from app.services.bus_executor import bus_executor
+from app.services.capture_service import raw_capture
+from app.services.energy_service import energy_accountant
+from app.services.event_service import event_service
+from app.services.fusion_service import fusion_service
+from app.services.health_service import health_estimator
+from app.services.latency_service import latency_tracker
+from app.services.loop_monitor_service import loop_monitor
+from app.services.history_service import history_store
 from app.services.modbus_service import modbus_service
+from app.services.operating_map_service import operating_map_service
+from app.services.order_tracking_service import order_tracker
+from app.services.replay_service import replay_service
+from app.services.sensorcore_service import sensorcore_service
+from app.services.telemetry_pipeline import register_consumer
+from app.services.waypoint_service import waypoint_executor
+from app.services.watchdog_service import safety_watchdog
+from app.services.waveform_service import waveform_service
 from app.utils.logger import get_logger
 
 logger = get_logger("main")
@@ -42,10 +66,17 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    # 请求到达时间戳（控制命令延迟测量的起点）
+    app.add_middleware(ReceiveTimestampMiddleware)
 
     # Routers
     app.include_router(health_router, prefix="/api")
     app.include_router(control_router, prefix="/api/control", tags=["control"])
+    app.include_router(history_router, prefix="/api/history", tags=["history"])
+    app.include_router(replay_router, prefix="/api/replay", tags=["replay"])
+    app.include_router(vibration_router, prefix="/api/vibration", tags=["vibration"])
+    app.include_router(events_router, prefix="/api/events", tags=["events"])
+    app.include_router(energy_router, prefix="/api/energy", tags=["energy"])
 
     # Startup event: start data reader/generator
     @app.on_event("startup")
@@ -54,8 +85,17 @@ def create_app() -> FastAPI:
         logger.info(f"Configuration - USE_MODBUS: {settings.USE_MODBUS}")
         logger.info(f"Configuration - MODBUS_PORT: {settings.MODBUS_PORT}, BAUDRATE: {settings.MODBUS_BAUDRATE}")
         
+        # 事件循环延迟监视最先启动，启动阶段的阻塞调用（编码器初始化等）也能被记录
+        if settings.LOOP_MONITOR_ENABLED:
+            loop_monitor.start()
+        
         if settings.USE_MODBUS:
             logger.info("Using ModbusRTU for data reading")
+            if settings.CAPTURE_ENABLED:
+                try:
+                    raw_capture.open()
+                except Exception as e:
+                    logger.error(f"Failed to open raw register capture: {e}", exc_info=True)
             # 初始化编码器Z信号（在启动心跳之前执行）
             try:
                 logger.info("Initializing encoder Z signal...")
@@ -68,15 +108,50 @@ def create_app() -> FastAPI:
                 logger.error(f"Failed to initialize encoder Z signal: {e}", exc_info=True)
                 logger.warning("Continuing startup despite Z signal initialization failure")
             
-            # 启动心跳任务（必须，否则驱动器会停止电机）
+            # 启动心跳（必须，否则驱动器会停止电机）；看门狗启用时由看门狗线程发送
+            if not settings.WATCHDOG_ENABLED:
+                try:
+                    modbus_service.start_heartbeat()
+                    logger.info("ModbusRTU heartbeat started")
+                except Exception as e:
+                    logger.error(f"Failed to start heartbeat: {e}", exc_info=True)
+        elif settings.REPLAY_SOURCE:
+            logger.info(f"Replaying recorded telemetry from {settings.REPLAY_SOURCE}")
             try:
-                modbus_service.start_heartbeat()
-                logger.info("ModbusRTU heartbeat started")
-            except Exception as e:
-                logger.error(f"Failed to start heartbeat: {e}", exc_info=True)
+                replay_service.start(settings.REPLAY_SOURCE, settings.REPLAY_SPEED, loop=settings.REPLAY_LOOP)
+            except ValueError as e:
+                logger.error(f"Failed to start replay: {e}")
         else:
             logger.info("Using mock data generator")
         
+        if settings.SENSORCORE_ENABLED:
+            # 融合：驱动器样本和 SensorCore 帧分别送入融合缓冲
+            register_consumer(fusion_service.on_drive_sample)
+            sensorcore_service.add_listener(fusion_service.on_sensor_frame)
+            sensorcore_service.start()
+        
+        if settings.ANOMALY_ENABLED:
+            register_consumer(anomaly_service.on_sample)
+        
+        if settings.ENERGY_ENABLED:
+            register_consumer(energy_accountant.on_sample)
+        if settings.OPERATING_MAP_ENABLED:
+            register_consumer(operating_map_service.on_sample)
+        
+        # 控制命令延迟：观察驱动器对设定值的响应
+        register_consumer(latency_tracker.on_sample)
+        
+        # 航点队列：按轮询到的位置判定到位
+        register_consumer(waypoint_executor.on_sample)
+        
+        # 阶次跟踪：以驱动器转速为转速计，对上传的原始振动波形做等角度重采样
+        register_consumer(order_tracker.on_drive_sample)
+        waveform_service.add_listener(order_tracker.on_waveform_block)
+        
+        # 安全看门狗：发送心跳并监视事件循环（模拟模式下只监视，不写寄存器）
+        if settings.WATCHDOG_ENABLED:
+            safety_watchdog.start()
+        
         # 启动数据读取/生成任务
         asyncio.create_task(generate_mock_data())
         logger.info("Data service started")
@@ -85,9 +160,27 @@ def create_app() -> FastAPI:
     @app.on_event("shutdown")
     async def shutdown_event():
         logger.info("Shutting down FastAPI application...")
+        if settings.WATCHDOG_ENABLED:
+            safety_watchdog.stop()
+        if settings.LOOP_MONITOR_ENABLED:
+            loop_monitor.stop()
+        replay_service.stop()
+        if settings.SENSORCORE_ENABLED:
+            sensorcore_service.stop()
+        health_estimator.save()
+        event_service.close()
+        if settings.ENERGY_ENABLED:
+            energy_accountant.close()
+        if settings.OPERATING_MAP_ENABLED:
+            operating_map_service.save()
+        if settings.HISTORY_ENABLED:
+            history_store.flush()
+            logger.info("History buffer flushed")
+        bus_executor.shutdown()
         if settings.USE_MODBUS:
             modbus_service.close()
             logger.info("ModbusRTU connection closed")
+            raw_capture.close()
 
     return app
 
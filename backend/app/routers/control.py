@@ -1,14 +1,30 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+import time
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional, Tuple
 from app.schemas.motor_schemas import (
     MotorStatus,
     VibrationMetrics,
     ControlCommand,
 )
+from app.services.bus_executor import BusSaturated, bus_executor
+from app.services.command_mailbox import command_mailbox
 from app.services.control_service import control_service
 from app.core.config import settings
 from app.services.modbus_service import modbus_service
+from app.services.sensorcore_service import sensorcore_service
+from app.services.fusion_service import fusion_service
+from app.services.health_service import health_estimator
+from app.services.latency_service import latency_tracker
+from app.services.loop_monitor_service import loop_monitor
+from app.services.motion_profile_service import motion_profile_executor, trapezoid_points
+from app.services.poll_schedule_service import channel_addresses, poll_scheduler
+from app.services.step_response_service import step_response_runner
+from app.services.waypoint_service import Waypoint, waypoint_executor
+from app.services.watchdog_service import safety_watchdog
+from app.services.torque_model import torque_model
 
 router = APIRouter()
 
@@ -26,19 +42,98 @@ def post_vibration_metrics(payload: VibrationMetrics):
 
 
 @router.post("/set-parameters")
-def post_set_parameters(payload: ControlCommand):
+async def post_set_parameters(
+    payload: ControlCommand,
+    request: Request,
+    wait: float = Query(0.0, ge=0.0, le=10.0, description="等待发送完成的秒数；0 表示放入邮箱后立即返回"),
+):
     """
     Receive control panel data from frontend.
-    如果启用 ModbusRTU，会实际发送控制命令到驱动器。
+    命令放入邮箱（后写覆盖）后立即返回 command_id，由总线线程发送最新的设定值；
+    可通过 GET /commands/{command_id} 等待结果。
+    wait > 0 时在事件循环中等待，不占用线程池线程。
     """
     # Basic semantic validation
     if payload.mode == "speed" and payload.target_rpm is None:
         raise HTTPException(status_code=400, detail="target_rpm is required for speed mode")
     if payload.mode == "torque" and payload.target_torque is None:
         raise HTTPException(status_code=400, detail="target_torque is required for torque mode")
+    # 阶跃实验直接写驱动器设定值，实验期间不接受手动设定
+    if step_response_runner.is_driving():
+        raise HTTPException(status_code=409, detail="A step test is running")
+
+    # 手动设定值优先于正在执行的运动曲线（取消要等待执行线程正在进行的写入，放到线程池中）
+    if motion_profile_executor.progress()["state"] == "running":
+        await run_in_threadpool(motion_profile_executor.cancel, stop=False)
+    if waypoint_executor.progress()["state"] == "running":
+        waypoint_executor.cancel(stop=False)
+
+    ticket = command_mailbox.submit(payload, getattr(request.state, "received_mono", time.monotonic()))
+    if wait > 0:
+        await command_mailbox.wait_async(ticket, wait)
+    return ticket.to_dict()
+
+
+@router.get("/commands/{command_id}")
+async def get_command(
+    command_id: int,
+    wait: float = Query(0.0, ge=0.0, le=30.0, description="等待命令完成（已发送或被覆盖）的秒数"),
+):
+    """查询邮箱中命令的状态：pending / sending / applied / error / superseded"""
+    ticket = command_mailbox.get(command_id)
+    if ticket is None:
+        raise HTTPException(status_code=404, detail=f"Command {command_id} not found")
+    if wait > 0:
+        await command_mailbox.wait_async(ticket, wait)
+    return ticket.to_dict()
+
+
+@router.get("/commands")
+def get_command_mailbox_stats():
+    """邮箱统计：提交数、实际发送数、被覆盖数"""
+    return command_mailbox.stats()
+
+
+@router.get("/latency")
+def get_command_latency(
+    buckets: bool = Query(False, description="是否返回直方图各桶计数"),
+    recent: int = Query(10, ge=0, le=50, description="返回最近多少条命令的分阶段延迟"),
+):
+    """控制命令各阶段延迟直方图（HTTP 接收 → 开始处理 → 寄存器写入 → 遥测响应）"""
+    return latency_tracker.snapshot(include_buckets=buckets, recent=recent)
+
+
+@router.post("/latency/reset")
+def reset_command_latency():
+    latency_tracker.reset()
+    return {"status": "ok", "message": "Latency statistics reset"}
+
 
-    result = control_service.set_parameters(payload)
-    return result
+@router.get("/watchdog")
+def get_watchdog(buckets: bool = Query(False, description="是否返回直方图各桶计数")):
+    """安全看门狗状态：事件循环活性、停机次数、心跳唤醒抖动与心跳间隔"""
+    return safety_watchdog.snapshot(include_buckets=buckets)
+
+
+@router.post("/watchdog/reset")
+def reset_watchdog():
+    safety_watchdog.reset()
+    return {"status": "ok", "message": "Watchdog statistics reset"}
+
+
+@router.get("/loop-lag")
+def get_loop_lag(
+    top: int = Query(10, ge=1, le=100, description="返回累计阻塞时间最长的前几个位置"),
+    buckets: bool = Query(False, description="是否返回直方图各桶计数"),
+):
+    """事件循环调度延迟直方图和阻塞排行（按阻塞时最内层的应用代码帧归类）"""
+    return loop_monitor.snapshot(top=top, include_buckets=buckets)
+
+
+@router.post("/loop-lag/reset")
+def reset_loop_lag():
+    loop_monitor.reset()
+    return {"status": "ok", "message": "Loop lag statistics reset"}
 
 
 @router.get("/latest")
@@ -51,45 +146,239 @@ def get_latest():
 
 # ========== ModbusRTU 专用端点 ==========
 
+STATUS_FIELDS = ("rpm", "temperature", "motor_current", "voltage", "power", "position", "duty_cycle")
+STATUS_ADDRESSES = channel_addresses(STATUS_FIELDS)
+FAULT_ADDRESSES = channel_addresses(("fault",))
+
+
+async def _register_image(max_age_ms: Optional[float], addresses: List[int]) -> Dict[str, Any]:
+    """
+    取轮询得到的输入寄存器镜像（按所需寄存器中最旧的读取时刻判断）；
+    比 max_age_ms 更旧时通过总线执行器做一次合并的整块读取。
+    总线饱和时返回旧镜像并标记 stale，没有镜像则 503
+    """
+    max_age = (max_age_ms if max_age_ms is not None else settings.STATUS_MAX_AGE_MS) / 1000.0
+    stale = False
+    image = modbus_service.register_image(max_age, addresses)
+    if image is None:
+        try:
+            image = await bus_executor.run(modbus_service.refresh_register_image, max_age, addresses)
+        except BusSaturated as e:
+            image = modbus_service.register_image(addresses=addresses)
+            if image is None:
+                raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+            stale = True
+        if image is None:
+            raise HTTPException(status_code=500, detail="Failed to read input registers")
+    t, block = image
+    return {"block": block, "age_ms": (time.monotonic() - t) * 1000.0, "stale": stale}
+
+
 @router.get("/fault")
-def get_fault():
-    """读取故障信息"""
+async def get_fault(
+    max_age_ms: Optional[float] = Query(None, ge=0, description="可接受的寄存器镜像最大时长（毫秒），默认 STATUS_MAX_AGE_MS"),
+):
+    """读取故障信息（来自轮询的寄存器镜像）"""
     if not settings.USE_MODBUS:
         raise HTTPException(status_code=400, detail="ModbusRTU is not enabled")
-    
-    fault = modbus_service.read_fault_info()
-    if fault is None:
-        raise HTTPException(status_code=500, detail="Failed to read fault info")
-    
-    return {"fault_code": fault, "fault_message": "无故障" if fault == 0 else f"故障代码: {fault}"}
+    image = await _register_image(max_age_ms, FAULT_ADDRESSES)
+    fault = image["block"]["fault"]
+    return {
+        "fault_code": fault,
+        "fault_message": "无故障" if fault == 0 else f"故障代码: {fault}",
+        "age_ms": image["age_ms"],
+        "stale": image["stale"],
+    }
 
 
 @router.get("/status/detailed")
-def get_detailed_status():
-    """读取详细状态信息（转速、温度、电流、电压、功率等）"""
+async def get_detailed_status(
+    max_age_ms: Optional[float] = Query(None, ge=0, description="可接受的寄存器镜像最大时长（毫秒），默认 STATUS_MAX_AGE_MS"),
+):
+    """读取详细状态信息（转速、温度、电流、电压、功率等，来自轮询的寄存器镜像）"""
     if not settings.USE_MODBUS:
         raise HTTPException(status_code=400, detail="ModbusRTU is not enabled")
     
     try:
-        rpm = modbus_service.read_rpm()
-        temperature = modbus_service.read_temperature()
-        motor_current = modbus_service.read_motor_current()
-        voltage = modbus_service.read_voltage()
-        power = modbus_service.read_power()
-        position = modbus_service.read_position()
-        duty_cycle = modbus_service.read_duty_cycle()
-        
-        return {
-            "rpm": rpm,
-            "temperature": temperature,
-            "motor_current": motor_current,
-            "voltage": voltage,
-            "power": power,
-            "position": position,
-            "duty_cycle": duty_cycle,
-        }
+        image = await _register_image(max_age_ms, STATUS_ADDRESSES)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to read status: {str(e)}")
+    block = image["block"]
+    return {
+        **{name: block[name] for name in STATUS_FIELDS},
+        "age_ms": image["age_ms"],
+        "stale": image["stale"],
+    }
+
+
+@router.get("/poll-schedule")
+def get_poll_schedule():
+    """多速率轮询计划：各通道目标 / 计划 / 实际频率，以及编译后的周期（各槽读取的寄存器段）"""
+    return poll_scheduler.stats()
+
+
+@router.get("/bus-executor")
+def get_bus_executor(buckets: bool = Query(False, description="是否返回直方图各桶计数")):
+    """Modbus 专用执行器：排队数、拒绝/过期/超时次数、排队等待与执行时间"""
+    return bus_executor.stats(include_buckets=buckets)
+
+
+@router.get("/sensorcore")
+def get_sensorcore():
+    """SensorCore 最新帧、各字段组距上次更新的秒数以及帧解析统计"""
+    if not settings.SENSORCORE_ENABLED:
+        raise HTTPException(status_code=400, detail="SensorCore is not enabled")
+    return sensorcore_service.snapshot()
+
+
+@router.get("/fusion")
+def get_fusion(seconds: float = Query(10.0, gt=0, le=3600, description="返回最近多少秒的融合记录")):
+    """驱动器与 SensorCore 时间对齐后的融合记录（每个 SensorCore 帧一条）"""
+    if not settings.SENSORCORE_ENABLED:
+        raise HTTPException(status_code=400, detail="SensorCore is not enabled")
+    return fusion_service.window(seconds)
+
+
+@router.get("/health-estimator")
+def get_health_estimator():
+    """健康指数 / 刀具磨损估计器的当前状态（快速值、基线、累计运行和磨损时间）"""
+    return health_estimator.snapshot()
+
+
+@router.post("/tool-wear/reset")
+def reset_tool_wear():
+    """换刀后清零刀具磨损"""
+    health_estimator.reset_tool_wear()
+    return {"status": "ok", "message": "Tool wear reset"}
+
+
+@router.post("/health-estimator/reset-baseline")
+def reset_health_baseline():
+    """维修后重新学习正常工况基线"""
+    health_estimator.reset_baseline()
+    return {"status": "ok", "message": "Health baseline reset"}
+
+
+@router.get("/torque-model")
+def get_torque_model():
+    """当前使用的电流×温度→转矩标定表"""
+    model = torque_model.model
+    return {
+        "source": model.source,
+        "currents": model.currents.tolist(),
+        "temperatures": model.temperatures.tolist(),
+        "table": model.table.tolist(),
+    }
+
+
+@router.post("/torque-model/reload")
+def reload_torque_model():
+    """重新加载 TORQUE_TABLE_FILE（更换标定表后无需重启）"""
+    try:
+        model = torque_model.reload()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}; keeping {torque_model.model.source} model")
+    return {"status": "ok", "message": f"Torque model loaded from {model.source}"}
+
+
+class TrapezoidRamp(BaseModel):
+    start: float = Field(0.0, ge=0, description="起始设定值")
+    target: float = Field(..., ge=0, description="目标设定值")
+    accel: float = Field(..., gt=0, description="加速斜率（单位/秒）")
+    decel: float = Field(..., gt=0, description="减速斜率（单位/秒）")
+    hold_seconds: float = Field(0.0, ge=0, description="到达目标后保持时间")
+    end: float = Field(0.0, ge=0, description="结束设定值")
+
+
+class MotionProfileRequest(BaseModel):
+    mode: Literal["speed", "torque"]
+    points: Optional[List[Tuple[float, float]]] = Field(None, description="(t 秒, 转速 rpm / 转矩 N·m) 点序列")
+    trapezoid: Optional[TrapezoidRamp] = None
+    interpolation: Literal["linear", "step"] = "linear"
+    stop_on_finish: bool = False
+
+
+@router.post("/profile")
+def start_motion_profile(request: MotionProfileRequest):
+    """提交运动曲线，由后端按固定节拍发送设定值"""
+    if waypoint_executor.progress()["state"] == "running":
+        raise HTTPException(status_code=409, detail="A waypoint sequence is running")
+    if step_response_runner.is_driving():
+        raise HTTPException(status_code=409, detail="A step test is running")
+    if (request.points is None) == (request.trapezoid is None):
+        raise HTTPException(status_code=400, detail="Exactly one of points or trapezoid is required")
+    try:
+        if request.trapezoid is not None:
+            ramp = request.trapezoid
+            points = trapezoid_points(ramp.start, ramp.target, ramp.accel, ramp.decel, ramp.hold_seconds, ramp.end)
+        else:
+            points = request.points
+        return motion_profile_executor.submit(request.mode, points, request.interpolation, request.stop_on_finish)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/profile")
+def get_motion_profile():
+    """当前 / 最近一条运动曲线的执行进度与节拍误差"""
+    return motion_profile_executor.progress()
+
+
+@router.post("/profile/cancel")
+def cancel_motion_profile(stop: bool = Query(True, description="取消后是否立即切到空模式停机")):
+    """取消运动曲线"""
+    return motion_profile_executor.cancel(stop=stop)
+
+
+class StepTestRequest(BaseModel):
+    mode: Literal["speed", "current"] = "speed"
+    initial: float = Field(0.0, description="阶跃前设定值（rpm 或 A）")
+    final: float = Field(..., description="阶跃后设定值（rpm 或 A）")
+    pre_seconds: float = Field(1.0, ge=0.1, description="阶跃前记录时长（秒），用于确定初始稳态")
+    duration: float = Field(3.0, gt=0, description="阶跃后记录时长（秒）")
+    acceleration: Optional[int] = Field(None, gt=0, description="实验前写入的速度环加速度（erpm/s，6016）")
+    deceleration: Optional[int] = Field(None, gt=0, description="实验前写入的速度环减速度（erpm/s，6025）")
+    restore: bool = Field(True, description="实验结束后切到空模式")
+    simulate: bool = Field(False, description="使用内置仿真模型，不访问总线")
+
+
+@router.post("/step-test")
+def start_step_test(request: StepTestRequest):
+    """启动阶跃响应实验（测量上升时间/超调/调节时间并拟合一阶、二阶模型）"""
+    if not request.simulate and (
+        motion_profile_executor.progress()["state"] == "running" or waypoint_executor.progress()["state"] == "running"
+    ):
+        raise HTTPException(status_code=409, detail="A motion profile or waypoint sequence is running")
+    if not request.simulate and command_mailbox.busy():
+        raise HTTPException(status_code=409, detail="A control command is still being sent")
+    try:
+        return step_response_runner.start(request.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/step-test")
+def get_step_test():
+    """当前实验状态与最近一次结果"""
+    return step_response_runner.status()
+
+
+@router.post("/step-test/cancel")
+def cancel_step_test():
+    """取消实验（切到空模式）"""
+    return step_response_runner.cancel()
+
+
+@router.get("/step-test/results")
+def get_step_test_results(limit: int = Query(20, ge=1, le=500)):
+    """历史实验结果（最新在前），用于对比不同加减速设置"""
+    return step_response_runner.results(limit)
 
 
 class PositionControlRequest(BaseModel):
@@ -99,36 +388,99 @@ class PositionControlRequest(BaseModel):
     max_decel: Optional[int] = None
 
 
+def _write_position(request: PositionControlRequest) -> bool:
+    # 设置位置参数
+    if request.max_speed_erpm:
+        modbus_service.set_max_speed(request.max_speed_erpm)
+    if request.max_accel:
+        modbus_service.set_max_acceleration(request.max_accel)
+    if request.max_decel:
+        modbus_service.set_max_deceleration(request.max_decel)
+    
+    # 设置目标位置
+    if not modbus_service.set_absolute_position(request.position_degrees):
+        return False
+    
+    # 切换到绝对位置模式（模式3）
+    modbus_service.set_mode(3, use_empty_mode=True)
+    return True
+
+
 @router.post("/control/position")
-def set_position(request: PositionControlRequest):
+async def set_position(request: PositionControlRequest):
     """设置绝对位置控制"""
     if not settings.USE_MODBUS:
         raise HTTPException(status_code=400, detail="ModbusRTU is not enabled")
+    if step_response_runner.is_driving():
+        raise HTTPException(status_code=409, detail="A step test is running")
     
     try:
-        # 设置位置参数
-        if request.max_speed_erpm:
-            modbus_service.set_max_speed(request.max_speed_erpm)
-        if request.max_accel:
-            modbus_service.set_max_acceleration(request.max_accel)
-        if request.max_decel:
-            modbus_service.set_max_deceleration(request.max_decel)
-        
-        # 设置目标位置
-        success = modbus_service.set_absolute_position(request.position_degrees)
-        if not success:
-            raise HTTPException(status_code=500, detail="Failed to set position")
-        
-        # 切换到绝对位置模式（模式3）
-        modbus_service.set_mode(3, use_empty_mode=True)
-        
-        return {
-            "status": "ok",
-            "message": f"Position set to {request.position_degrees} degrees",
-            "position": request.position_degrees
-        }
+        # 只在准入时拒绝；写入一旦开始排队就等待其执行完，不会对仍在执行的命令返回 503
+        success = await bus_executor.run(_write_position, request, write=True)
+    except BusSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to set position: {str(e)}")
+    if not success:
+        raise HTTPException(status_code=500, detail="Failed to set position")
+    
+    return {
+        "status": "ok",
+        "message": f"Position set to {request.position_degrees} degrees",
+        "position": request.position_degrees
+    }
+
+
+class WaypointItem(BaseModel):
+    position_degrees: float
+    kind: Literal["absolute", "relative_last", "relative_current"] = "absolute"
+    dwell_seconds: float = Field(0.0, ge=0, description="到位后停留时间")
+
+
+class WaypointSequenceRequest(BaseModel):
+    waypoints: List[WaypointItem]
+    tolerance_degrees: Optional[float] = Field(None, gt=0, description="到位容差，默认 WAYPOINT_TOLERANCE")
+    max_speed_erpm: Optional[int] = None
+    max_accel: Optional[int] = None
+    max_decel: Optional[int] = None
+
+
+@router.post("/control/waypoints")
+def start_waypoints(request: WaypointSequenceRequest):
+    """上传航点序列，按轮询位置判定到位后依次发送"""
+    if not settings.USE_MODBUS:
+        raise HTTPException(status_code=400, detail="ModbusRTU is not enabled")
+    if len(request.waypoints) > settings.WAYPOINT_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.WAYPOINT_MAX_POINTS} waypoints per sequence")
+    if motion_profile_executor.progress()["state"] == "running":
+        raise HTTPException(status_code=409, detail="A motion profile is running")
+    if step_response_runner.is_driving():
+        raise HTTPException(status_code=409, detail="A step test is running")
+    waypoints = [Waypoint(w.position_degrees, w.kind, w.dwell_seconds) for w in request.waypoints]
+    try:
+        return waypoint_executor.submit(
+            waypoints,
+            tolerance=request.tolerance_degrees,
+            max_speed_erpm=request.max_speed_erpm,
+            max_accel=request.max_accel,
+            max_decel=request.max_decel,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/control/waypoints")
+def get_waypoints():
+    """航点序列进度与各航点到位记录"""
+    return waypoint_executor.progress()
+
+
+@router.post("/control/waypoints/cancel")
+def cancel_waypoints(stop: bool = Query(True, description="取消后是否立即切到空模式停机")):
+    """取消航点序列"""
+    return waypoint_executor.cancel(stop=stop)
 
 
 @router.post("/control/stop")
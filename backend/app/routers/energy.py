@@ -0,0 +1,70 @@
+from datetime import date, datetime
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+
+from app.services.energy_service import energy_accountant
+from app.services.operating_map_service import OperatingMap, operating_map_service
+from app.utils.time_utils import to_ms
+
+router = APIRouter()
+
+
+@router.get("")
+def get_energy(
+    start: datetime = Query(..., description="起始时间（ISO 8601，未带时区按 UTC）"),
+    end: datetime = Query(..., description="结束时间（ISO 8601，未带时区按 UTC）"),
+    period: Literal["day", "shift", "bucket"] = Query("day", description="汇总粒度：自然日 / 班次 / 时间桶"),
+    include_dwell: bool = Query(False, description="是否返回转速×转矩工况谱（小时）"),
+):
+    """按日或班次汇总的电能、运行时间和工况谱"""
+    start_ms, end_ms = to_ms(start), to_ms(end)
+    if end_ms <= start_ms:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    return energy_accountant.query(start_ms, end_ms, period, include_dwell)
+
+
+@router.get("/live")
+def get_energy_live():
+    """当前功率、当前时间桶累计量及工况谱分格"""
+    return energy_accountant.snapshot()
+
+
+class OperatingMapData(BaseModel):
+    """GET /operating-map?raw=true 导出的原始累加量"""
+    sources: List[str] = []
+    rpm_edges: List[float]
+    torque_edges: List[float]
+    count: List[List[int]]
+    power_sum: List[List[float]]
+    mech_power_sum: List[List[float]]
+
+
+@router.get("/operating-map")
+def get_operating_map(
+    start: Optional[date] = Query(None, description="起始日期（本地日期，含），默认今天"),
+    end: Optional[date] = Query(None, description="结束日期（本地日期，含），默认同起始日期"),
+    raw: bool = Query(False, description="返回原始累加量（用于跨驱动器合并），否则返回热力图"),
+):
+    """转速×转矩运行点 / 效率图（多天合并）"""
+    start = start or date.today()
+    end = end or start
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    merged = operating_map_service.query(start, end)
+    return merged.to_dict() if raw else merged.heatmap()
+
+
+@router.post("/operating-map/merge")
+def merge_operating_maps(maps: List[OperatingMapData]):
+    """合并多台驱动器 / 多天导出的运行点图，返回热力图"""
+    if not maps:
+        raise HTTPException(status_code=400, detail="At least one map is required")
+    try:
+        merged = OperatingMap.from_dict(maps[0].model_dump())
+        for data in maps[1:]:
+            merged.merge(OperatingMap.from_dict(data.model_dump()))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return merged.heatmap()
@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.services.anomaly_service import anomaly_service
+from app.services.event_service import event_service, format_sse
+from app.utils.time_utils import to_ms
+
+router = APIRouter()
+
+KEEPALIVE_SECONDS = 15.0
+
+
+@router.get("")
+def list_events(
+    start: Optional[datetime] = Query(None, description="起始时间（ISO 8601，未带时区按 UTC）"),
+    end: Optional[datetime] = Query(None, description="结束时间（ISO 8601，未带时区按 UTC）"),
+    channel: Optional[str] = Query(None, description="只返回该通道的事件"),
+    limit: int = Query(500, ge=1, le=10000),
+):
+    """查询事件日志（按时间倒序）"""
+    return event_service.query(to_ms(start), to_ms(end), channel, limit)
+
+
+@router.get("/stream")
+async def stream_events(request: Request):
+    """
+    事件推送（Server-Sent Events）
+    每个新事件推送一条 `event: <source>` 消息，空闲时每 15 秒发送一次注释行保持连接
+    """
+    queue = event_service.subscribe()
+
+    async def generate():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            event_service.unsubscribe(queue)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/anomaly")
+def get_anomaly_state():
+    """各检测通道的当前基线、CUSUM 和报警状态"""
+    return anomaly_service.snapshot()
@@ -0,0 +1,45 @@
+from datetime import datetime
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.services.export_service import EXPORT_FORMATS, arrow_available, iter_export
+from app.services.history_service import history_store
+from app.utils.time_utils import to_ms
+
+router = APIRouter()
+
+
+@router.get("/export")
+def export_history(
+    start: datetime = Query(..., description="起始时间（ISO 8601，未带时区按 UTC）"),
+    end: datetime = Query(..., description="结束时间（ISO 8601，未带时区按 UTC）"),
+    format: Literal["csv", "arrow"] = Query("csv", description="导出格式：csv 或 arrow（Arrow IPC 流）"),
+):
+    """
+    导出时间范围内的遥测历史
+    按存储块逐块流式输出（chunked 传输），不会在内存中拼装整个文件
+    """
+    if not settings.HISTORY_ENABLED:
+        raise HTTPException(status_code=400, detail="History storage is not enabled")
+    start_ms = to_ms(start)
+    end_ms = to_ms(end)
+    if end_ms <= start_ms:
+        raise HTTPException(status_code=400, detail="end must be later than start")
+    if format == "arrow" and not arrow_available():
+        raise HTTPException(status_code=501, detail="Arrow export requires pyarrow to be installed")
+
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"telemetry_{start.strftime('%Y%m%dT%H%M%S')}_{end.strftime('%Y%m%dT%H%M%S')}.{extension}"
+    return StreamingResponse(
+        iter_export(format, start_ms, end_ms),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/stats")
+def get_history_stats():
+    return history_store.stats()
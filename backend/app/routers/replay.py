@@ -0,0 +1,51 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+from app.services.replay_service import replay_service
+from app.utils.time_utils import to_ms
+
+router = APIRouter()
+
+
+class ReplayStartRequest(BaseModel):
+    source: str = Field(..., description="抓取文件路径，或 history 表示历史存储")
+    speed: float = Field(1.0, ge=0, description="回放倍速，0 表示最快")
+    start: Optional[datetime] = Field(None, description="起始时间（ISO 8601，未带时区按 UTC），默认为数据起点")
+    end: Optional[datetime] = Field(None, description="结束时间（ISO 8601，未带时区按 UTC），默认为数据终点")
+    loop: bool = False
+
+
+@router.post("/start")
+async def start_replay(request: ReplayStartRequest):
+    """开始回放录制数据（仅在未启用 ModbusRTU 时可用，避免与实时数据混杂）"""
+    if settings.USE_MODBUS:
+        raise HTTPException(status_code=400, detail="Replay is not available while ModbusRTU is enabled")
+    if replay_service.is_running:
+        raise HTTPException(status_code=409, detail="A replay is already running")
+
+    try:
+        replay_service.start(
+            request.source,
+            speed=request.speed,
+            start_ms=to_ms(request.start),
+            end_ms=to_ms(request.end),
+            loop=request.loop,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "ok", "message": f"Replay started from {request.source}"}
+
+
+@router.post("/stop")
+async def stop_replay():
+    replay_service.stop()
+    return {"status": "ok", "message": "Replay stopped"}
+
+
+@router.get("/status")
+def get_replay_status():
+    return replay_service.status()
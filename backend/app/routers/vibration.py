@@ -0,0 +1,127 @@
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.order_tracking_service import order_tracker
+from app.services.spectrogram_service import NPERSEG_CHOICES, spectrogram_service
+from app.services.waveform_service import waveform_service
+from app.utils.time_utils import to_ms
+
+router = APIRouter()
+
+MAX_WAVEFORM_BYTES = 16 * 1024 * 1024
+MAX_SPECTROGRAM_COLUMNS = 8192
+
+
+@router.post("/waveform")
+async def post_waveform(
+    request: Request,
+    sample_rate: float = Query(..., gt=0, description="采样率 (Hz)"),
+    timestamp_ms: Optional[int] = Query(None, description="块首样本的时间（Unix 毫秒），默认按接收时刻倒推"),
+):
+    """
+    上传一个原始振动波形块
+    请求体为 application/octet-stream，内容是小端 float32 样本序列；
+    Welch/FFT 分析在线程池中执行，不阻塞事件循环
+    """
+    body = await request.body()
+    if len(body) == 0 or len(body) % 4 != 0:
+        raise HTTPException(status_code=400, detail="Body must be a non-empty little-endian float32 array")
+    if len(body) > MAX_WAVEFORM_BYTES:
+        raise HTTPException(status_code=413, detail="Waveform block is too large")
+
+    samples = np.frombuffer(body, dtype="<f4")
+    result = await run_in_threadpool(_ingest_waveform, samples, sample_rate, timestamp_ms)
+    return {
+        "status": "ok",
+        "samples": len(samples),
+        "main_freq": result.main_freq,
+        "rms": result.rms,
+        "peak": result.peak,
+        "impulse_count": result.impulse_count,
+        "band_energy": result.band_energy,
+    }
+
+
+def _ingest_waveform(samples: np.ndarray, sample_rate: float, timestamp_ms: Optional[int]):
+    if not np.all(np.isfinite(samples)):
+        raise HTTPException(status_code=400, detail="Waveform contains NaN or Inf")
+    return waveform_service.ingest(samples, sample_rate, timestamp_ms)
+
+
+@router.get("/spectrum")
+def get_spectrum():
+    """最新波形块的 Welch 功率谱密度与频带能量"""
+    snapshot = waveform_service.spectrum_snapshot()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No waveform has been received")
+    return snapshot
+
+
+@router.get("/waveform/stats")
+def get_waveform_stats():
+    return waveform_service.stats()
+
+
+@router.get("/orders")
+def get_orders():
+    """最新阶次谱：以驱动器转速为转速计的等角度重采样结果，含 1×/2×/3× 及轴承故障阶次幅值"""
+    snapshot = order_tracker.snapshot()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No order spectrum yet (needs waveform data while the motor is running)")
+    return snapshot
+
+
+@router.get("/spectrogram")
+def get_spectrogram(
+    start: datetime = Query(..., description="起始时间（ISO 8601，未带时区按 UTC）"),
+    end: datetime = Query(..., description="结束时间（ISO 8601，未带时区按 UTC）"),
+    resolution_ms: int = Query(100, ge=10, le=60000, description="每列的时间宽度（毫秒）"),
+    nperseg: int = Query(1024, description="FFT 点数（频率分辨率 = 采样率 / nperseg）"),
+    db_min: Optional[float] = Query(None, description="量化下限（dB），默认 SPECTROGRAM_DB_MIN"),
+    db_max: Optional[float] = Query(None, description="量化上限（dB），默认 SPECTROGRAM_DB_MAX"),
+):
+    """
+    时频图（瀑布图）
+    返回 application/octet-stream：uint8 强度矩阵，按行（时间列）存储，每行 nperseg/2+1 个频点，
+    0 表示该列没有波形数据，1~255 线性对应 [db_min, db_max]；矩阵形状和坐标信息放在响应头中
+    """
+    if nperseg not in NPERSEG_CHOICES:
+        raise HTTPException(status_code=400, detail=f"nperseg must be one of {list(NPERSEG_CHOICES)}")
+    db_min = settings.SPECTROGRAM_DB_MIN if db_min is None else db_min
+    db_max = settings.SPECTROGRAM_DB_MAX if db_max is None else db_max
+    if db_max <= db_min:
+        raise HTTPException(status_code=400, detail="db_max must be greater than db_min")
+    start_ms = to_ms(start)
+    end_ms = to_ms(end)
+    if end_ms <= start_ms:
+        raise HTTPException(status_code=400, detail="end must be later than start")
+    if (end_ms - start_ms) // resolution_ms > MAX_SPECTROGRAM_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Too many columns, increase resolution_ms (max {MAX_SPECTROGRAM_COLUMNS})")
+
+    result = spectrogram_service.render(start_ms, end_ms, resolution_ms, nperseg, db_min, db_max)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No waveform data in the requested range")
+    columns, bins = result.intensity.shape
+    return Response(
+        content=result.intensity.tobytes(),
+        media_type="application/octet-stream",
+        headers={
+            "X-Spectrogram-Columns": str(columns),
+            "X-Spectrogram-Bins": str(bins),
+            "X-Spectrogram-Start-Ms": str(result.start_ms),
+            "X-Spectrogram-Column-Ms": str(result.column_ms),
+            "X-Spectrogram-Freq-Step": repr(result.sample_rate / result.nperseg),
+            "X-Spectrogram-Db-Min": repr(db_min),
+            "X-Spectrogram-Db-Max": repr(db_max),
+        },
+    )
+
+
+@router.get("/spectrogram/stats")
+def get_spectrogram_stats():
+    return spectrogram_service.stats()
@@ -0,0 +1,237 @@
+"""
+流式异常检测
+对每个遥测通道维护常数大小的状态（EWMA 均值/方差、双向 CUSUM、样本计数），
+在故障寄存器 5000 跳闸之前发现漂移和突变：
+
+- EWMA z-score：用上一时刻的 EWMA 均值/方差预测当前值，|z| 超过阈值即报警（突变）
+- CUSUM：对相对慢速基线的标准化偏差做双向累积和，超过 H 即报警（小幅持续漂移）；
+  基线比 z-score 的均值慢一个数量级，漂移不会在积累完成前就被均值吸收
+
+遥测样本先攒成批（默认 100 个，10Hz 下约 10 秒），整批按 (样本, 通道) 二维数组向量化计算：
+EWMA 用分块闭式解，CUSUM 用累积和 + 累积最小值（Lindley 递推的闭式），批内不逐样本循环。
+报警按通道取上升沿生成事件，写入事件日志并推送给订阅者
+"""
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.control_service import control_service
+from app.services.event_service import Event, event_service
+from app.services.telemetry_pipeline import TelemetrySample
+from app.utils.logger import get_logger
+from app.utils.ring_buffer import RingBuffer
+
+logger = get_logger("anomaly-service")
+
+EWMA_CHUNK = 32      # 分块闭式解的块长，保证 (1-alpha)^-块长 不损失精度
+
+
+class ChannelSpec(NamedTuple):
+    name: str
+    unit: str
+    min_std: float       # 标准差下限，避免量化值（整数温度等）方差过小导致 z 爆表
+
+
+CHANNELS = (
+    ChannelSpec("rpm_error", "rpm", 5.0),
+    ChannelSpec("motor_current", "A", 0.05),
+    ChannelSpec("temperature_slope", "°C/min", 0.2),
+    ChannelSpec("vibration_rms", "", 0.01),
+)
+CHANNEL_NAMES = tuple(c.name for c in CHANNELS)
+
+
+def ewma_batch(x: np.ndarray, m0: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    m_t = (1-a)·m_{t-1} + a·x_t 的批量闭式解，x 形状 (样本, 通道)
+    块内 m_t = b^t·(m0 + a·Σ_{j≤t} x_j / b^j)，b = 1-a
+    """
+    out = np.empty_like(x)
+    b = 1.0 - alpha
+    powers = b ** np.arange(1, EWMA_CHUNK + 1, dtype=np.float64)[:, None]
+    m = m0
+    for start in range(0, len(x), EWMA_CHUNK):
+        chunk = x[start:start + EWMA_CHUNK]
+        p = powers[:len(chunk)]
+        out[start:start + len(chunk)] = p * (m + alpha * np.cumsum(chunk / p, axis=0))
+        m = out[start + len(chunk) - 1]
+    return out
+
+
+def cusum_batch(y: np.ndarray, s0: np.ndarray) -> np.ndarray:
+    """
+    S_t = max(0, S_{t-1} + y_t) 的批量闭式解：S_t = C_t - min(-S_0, min_{j≤t} C_j)，C 为 y 的累积和
+    """
+    c = np.cumsum(y, axis=0)
+    floor = np.minimum(np.minimum.accumulate(c, axis=0), -s0)
+    return c - floor
+
+
+class DetectorBank:
+    def __init__(self, channels=CHANNELS) -> None:
+        n = len(channels)
+        self.channels = tuple(channels)
+        self._min_var = np.array([c.min_std ** 2 for c in channels])
+        self._mean = np.full(n, np.nan)
+        self._baseline = np.full(n, np.nan)
+        self._var = np.array(self._min_var)
+        self._cusum_up = np.zeros(n)
+        self._cusum_down = np.zeros(n)
+        self._count = np.zeros(n, dtype=np.int64)
+        self._last = np.full(n, np.nan)          # 各通道最后一个有效值（缺失样本前向填充）
+        self._alarm = np.zeros(n, dtype=bool)    # 当前是否处于报警状态（只在上升沿产生事件）
+        self.samples = 0
+        self.events = 0
+
+    def update(self, timestamps_ms: np.ndarray, values: np.ndarray) -> List[Event]:
+        """处理一批样本 values[样本, 通道]（缺失值为 NaN），返回新产生的事件"""
+        alpha = settings.ANOMALY_ALPHA
+        valid = ~np.isnan(values)
+
+        # 缺失值前向填充（批首用上一批最后的有效值）；从未出现过的通道用本批第一个有效值回填
+        x = np.vstack((self._last, values))
+        idx = np.where(~np.isnan(x), np.arange(len(x))[:, None], 0)
+        np.maximum.accumulate(idx, axis=0, out=idx)
+        x = np.take_along_axis(x, idx, axis=0)[1:]
+        present = ~np.isnan(x)
+        seen = present.any(axis=0)
+        first_valid = np.where(seen, x[present.argmax(axis=0), np.arange(x.shape[1])], 0.0)
+        x = np.where(present, x, first_valid)
+        mean0 = np.where(np.isnan(self._mean), first_valid, self._mean)
+
+        # 预测误差与 z-score（用上一时刻的均值/方差）
+        mean = ewma_batch(x, mean0, alpha)
+        prev_mean = np.vstack((mean0, mean[:-1]))
+        resid = x - prev_mean
+        var = np.maximum(ewma_batch(resid * resid, self._var, alpha), self._min_var)
+        prev_var = np.vstack((self._var, var[:-1]))
+        z = resid / np.sqrt(prev_var)
+
+        # 慢速基线从单个样本起步收敛太慢，学习期内直接跟随快速均值
+        warming = np.isnan(self._baseline) | (self._count <= settings.ANOMALY_WARMUP_SAMPLES)
+        baseline0 = np.where(warming, mean0, self._baseline)
+        baseline = ewma_batch(x, baseline0, settings.ANOMALY_BASELINE_ALPHA)
+        drift = (x - np.vstack((baseline0, baseline[:-1]))) / np.sqrt(prev_var)
+        k = settings.ANOMALY_CUSUM_K
+        up = cusum_batch(drift - k, self._cusum_up)
+        down = cusum_batch(-drift - k, self._cusum_down)
+
+        count = self._count + np.cumsum(valid, axis=0)
+        armed = valid & (count > settings.ANOMALY_WARMUP_SAMPLES)
+        z_alarm = np.abs(z) > settings.ANOMALY_Z_THRESHOLD
+        up_alarm = up > settings.ANOMALY_CUSUM_H
+        down_alarm = down > settings.ANOMALY_CUSUM_H
+        alarm = armed & (z_alarm | up_alarm | down_alarm)
+        rising = alarm & ~np.vstack((self._alarm, alarm[:-1]))
+
+        events = []
+        for row, col in zip(*np.nonzero(rising)):
+            spec = self.channels[col]
+            if z_alarm[row, col]:
+                kind, score = "zscore", float(z[row, col])
+            elif up_alarm[row, col]:
+                kind, score = "cusum_up", float(up[row, col])
+            else:
+                kind, score = "cusum_down", float(down[row, col])
+            value = float(x[row, col])
+            events.append(Event(
+                int(timestamps_ms[row]), "anomaly", spec.name, kind, value, score,
+                f"{spec.name}={value:.3f}{spec.unit} 偏离基线 {float(prev_mean[row, col]):.3f}{spec.unit}（{kind} {score:.1f}）",
+            ))
+
+        # 保存状态；从未出现过的通道保持初始状态
+        # CUSUM 报警后不清零：漂移持续期间保持报警（只产生一条事件），基线吸收漂移后自然回落
+        self._mean = np.where(seen, mean[-1], np.nan)
+        self._baseline = np.where(seen, baseline[-1], np.nan)
+        self._var = np.where(seen, var[-1], self._var)
+        self._cusum_up = np.where(seen, up[-1], 0.0)
+        self._cusum_down = np.where(seen, down[-1], 0.0)
+        self._count = count[-1]
+        self._last = np.where(seen, x[-1], np.nan)
+        self._alarm = np.where(valid[-1], alarm[-1], self._alarm)
+        self.samples += len(values)
+        self.events += len(events)
+        return events
+
+    def state(self) -> Dict[str, Dict[str, float]]:
+        def clean(v: float) -> Optional[float]:
+            return None if v != v else float(v)
+        return {
+            spec.name: {
+                "mean": clean(self._mean[i]),
+                "baseline": clean(self._baseline[i]),
+                "std": float(np.sqrt(self._var[i])),
+                "cusum_up": float(self._cusum_up[i]),
+                "cusum_down": float(self._cusum_down[i]),
+                "samples": int(self._count[i]),
+                "alarm": bool(self._alarm[i]),
+            }
+            for i, spec in enumerate(self.channels)
+        }
+
+
+class AnomalyService:
+    """遥测管道消费者：把样本转换为检测通道，攒批后交给检测器组"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._bank = DetectorBank()
+        self._temperature = RingBuffer(1024, ("t", "temperature"))
+        self._pending_t: List[int] = []
+        self._pending: List[List[float]] = []
+        self._target: Optional[float] = None
+        self._target_changed_t = 0.0
+
+    def on_sample(self, sample: TelemetrySample) -> None:
+        # 回放的录制数据不产生异常事件
+        if sample.replayed:
+            return
+        status = sample.motor_status
+        target = control_service.target_rpm()
+        if target != self._target:
+            self._target = target
+            self._target_changed_t = sample.t_mono
+        # 设定值刚变化时的跟踪误差是正常的加减速过程，不参与检测
+        rpm_error = np.nan
+        if target is not None and sample.t_mono - self._target_changed_t >= settings.ANOMALY_RPM_SETTLE_SECONDS:
+            rpm_error = target - status.rpm
+        current = np.nan
+        if sample.registers is not None:
+            current = sample.registers.get("motor_current", np.nan)
+        vib_rms = sample.vibration_metrics.rms if sample.vibration_metrics is not None else np.nan
+
+        with self._lock:
+            self._temperature.append((sample.t_mono, status.temperature))
+            self._pending_t.append(sample.timestamp_ms)
+            self._pending.append([rpm_error, current, self._temperature_slope(sample.t_mono), vib_rms])
+            if len(self._pending) < settings.ANOMALY_BATCH_SIZE:
+                return
+            timestamps = np.array(self._pending_t, dtype=np.int64)
+            values = np.array(self._pending, dtype=np.float64)
+            self._pending_t.clear()
+            self._pending.clear()
+            events = self._bank.update(timestamps, values)
+        event_service.record(events)
+
+    def _temperature_slope(self, t_now: float) -> float:
+        """温度变化率（°C/min），取 ANOMALY_SLOPE_WINDOW 秒前的插值温度作差，降低整数量化的影响"""
+        history = self._temperature.latest()
+        window = settings.ANOMALY_SLOPE_WINDOW
+        if len(history) < 2 or history[0, 0] > t_now - window:
+            return np.nan
+        past = np.interp(t_now - window, history[:, 0], history[:, 1])
+        return (history[-1, 1] - past) * 60.0 / window
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "channels": self._bank.state(),
+                "samples": self._bank.samples,
+                "events": self._bank.events,
+            }
+
+
+# 创建全局异常检测实例
+anomaly_service = AnomalyService()
@@ -0,0 +1,130 @@
+"""
+Modbus 专用执行器
+同步路由运行在 Starlette 共享线程池（默认 40 个线程）上，每个读状态请求要占住一个线程等串口锁；
+请求一多线程池被占满，/health 等与总线无关的接口也跟着排队。
+
+总线相关的阻塞调用改由这里的小线程池执行（串口本身是串行的，默认 1 个线程），并做准入控制：
+
+- 已接收（排队 + 执行中）的调用数达到 BUS_EXECUTOR_WORKERS + BUS_EXECUTOR_MAX_QUEUE 时直接拒绝
+- 排队超过 BUS_EXECUTOR_QUEUE_TIMEOUT 才轮到的调用不再执行（调用方多半已不需要结果）
+- 调用方最多等待 BUS_EXECUTOR_TIMEOUT；超时时仍在排队的调用被取消、不会执行，
+  已经开始执行的调用会执行完，占用的名额在执行完才释放
+
+以上情况都抛出 BusSaturated，由路由转换为 503 或返回缓存的旧数据。
+
+控制写入（write=True）只在准入时拒绝：一旦被接收就一定执行，不做排队过期，调用方等待其执行完，
+避免向客户端返回 503 而命令实际仍在执行
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.core.config import settings
+from app.utils.histogram import LatencyHistogram
+from app.utils.logger import get_logger
+
+logger = get_logger("bus-executor")
+
+T = TypeVar("T")
+
+
+class BusSaturated(RuntimeError):
+    """总线繁忙，调用被拒绝、过期或超时"""
+
+
+class BusExecutor:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._admitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.expired = 0
+        self.timeouts = 0
+        self.queue_wait = LatencyHistogram()
+        self.run_time = LatencyHistogram()
+
+    @property
+    def capacity(self) -> int:
+        return settings.BUS_EXECUTOR_WORKERS + settings.BUS_EXECUTOR_MAX_QUEUE
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=settings.BUS_EXECUTOR_WORKERS, thread_name_prefix="modbus-bus")
+        return self._pool
+
+    async def run(self, fn: Callable[..., T], *args: Any, timeout: Optional[float] = None, write: bool = False) -> T:
+        """
+        在总线线程池中执行 fn(*args)；总线饱和时抛出 BusSaturated
+
+        超时抛出 BusSaturated 时，调用可能未执行（仍在排队，已被取消）也可能仍在执行，异常信息中注明；
+        调用方不能假定超时的调用已经或没有发到总线上。
+        write=True 时 BusSaturated 只可能在准入时抛出，被接收的调用不会过期、超时或被取消
+        """
+        with self._lock:
+            if self._admitted >= self.capacity:
+                self.rejected += 1
+                raise BusSaturated(f"Modbus bus saturated ({self._admitted} calls pending)")
+            self._admitted += 1
+            pool = self._get_pool()
+        submitted = time.monotonic()
+
+        def job() -> T:
+            started = time.monotonic()
+            waited = started - submitted
+            self.queue_wait.record(waited)
+            if not write and waited > settings.BUS_EXECUTOR_QUEUE_TIMEOUT:
+                with self._lock:
+                    self.expired += 1
+                raise BusSaturated(f"Modbus call expired after waiting {waited * 1000:.0f} ms in queue")
+            try:
+                return fn(*args)
+            finally:
+                self.run_time.record(time.monotonic() - started)
+
+        future: Future = pool.submit(job)
+        # 名额在调用真正结束（或排队中被取消）时释放，调用方超时不提前释放
+        future.add_done_callback(self._release)
+        if write:
+            # 请求被取消（客户端断开）时也不取消已接收的写入
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or settings.BUS_EXECUTOR_TIMEOUT)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            # wait_for 取消包装的 future：尚在排队的调用随之取消，已开始执行的无法取消
+            outcome = "cancelled in queue" if future.cancelled() else "still running"
+            raise BusSaturated(f"Modbus call timed out after {timeout or settings.BUS_EXECUTOR_TIMEOUT:.1f} s ({outcome})")
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._admitted -= 1
+            if not future.cancelled() and future.exception() is None:
+                self.completed += 1
+
+    def stats(self, include_buckets: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            result: Dict[str, Any] = {
+                "workers": settings.BUS_EXECUTOR_WORKERS,
+                "capacity": self.capacity,
+                "pending": self._admitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "expired": self.expired,
+                "timeouts": self.timeouts,
+            }
+        result["queue_wait_ms"] = self.queue_wait.summary(include_buckets=include_buckets)
+        result["run_time_ms"] = self.run_time.summary(include_buckets=include_buckets)
+        return result
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# 创建全局总线执行器实例
+bus_executor = BusExecutor()
@@ -0,0 +1,172 @@
+"""
+原始寄存器抓取日志
+把每次 Modbus 寄存器读写的原始值连同单调时钟时间戳写入预分配的内存映射文件（环形覆盖），
+用于故障后逐位还原驱动器寄存器。文件为定长二进制记录，离线工具用 struct 即可解析。
+
+文件格式（小端序）：
+    头部 64 字节: magic(8s) | 版本(H) | 记录长度(H) | 容量(I) | 已写入总数(Q) | 墙钟锚点ns(q) | 单调锚点ns(q)
+    记录 48 字节: 单调时钟ns(Q) | 功能码(B) | 从站(B) | 起始地址(H) | 寄存器数(H) | 寄存器值(16H) | 填充(2x)
+
+第 seq 条记录位于 HEADER_SIZE + (seq % 容量) * RECORD_SIZE。
+"""
+import mmap
+import os
+import struct
+import time
+from threading import Lock
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("capture-service")
+
+CAPTURE_MAGIC = b"XMCAP1\x00\x00"
+CAPTURE_VERSION = 1
+HEADER = struct.Struct("<8sHHIQqq")
+HEADER_SIZE = 64
+RECORD = struct.Struct("<QBBHH16H2x")
+RECORD_SIZE = RECORD.size
+RECORD_REGISTERS = 16
+_WRITE_SEQ = struct.Struct("<Q")
+_WRITE_SEQ_OFFSET = 16
+
+# Modbus 功能码
+FC_READ_HOLDING = 0x03
+FC_READ_INPUT = 0x04
+FC_WRITE_SINGLE = 0x06
+FC_WRITE_MULTIPLE = 0x10
+
+
+class CaptureRecord(NamedTuple):
+    seq: int
+    t_mono_ns: int
+    function: int
+    slave: int
+    address: int
+    registers: List[int]
+
+
+class CaptureHeader(NamedTuple):
+    capacity: int
+    write_seq: int
+    wall_anchor_ns: int
+    mono_anchor_ns: int
+
+    def to_wall_ns(self, t_mono_ns: int) -> int:
+        """把记录中的单调时钟换算为墙钟（仅对同一次运行内的记录有效）"""
+        return self.wall_anchor_ns + (t_mono_ns - self.mono_anchor_ns)
+
+
+class RawCaptureLog:
+    """
+    内存映射的环形抓取日志
+    append 只做 struct.pack_into 和写入计数更新，直接写入页缓存，不产生系统调用
+    """
+
+    def __init__(self, path: str, capacity: int) -> None:
+        self._lock = Lock()
+        self._path = path
+        self._capacity = capacity
+        self._write_seq = 0
+        self._fp = None
+        self._mm: Optional[mmap.mmap] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._mm is not None
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def open(self) -> None:
+        """
+        创建并预分配抓取文件
+        已存在的文件（上一次运行的现场）会保留为 .prev，不会被覆盖
+        """
+        if self._mm is not None:
+            return
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self._path):
+            os.replace(self._path, self._path + ".prev")
+
+        size = HEADER_SIZE + self._capacity * RECORD_SIZE
+        self._fp = open(self._path, "w+b")
+        self._fp.truncate(size)
+        self._mm = mmap.mmap(self._fp.fileno(), size)
+        self._write_seq = 0
+        HEADER.pack_into(
+            self._mm, 0, CAPTURE_MAGIC, CAPTURE_VERSION, RECORD_SIZE, self._capacity,
+            0, time.time_ns(), time.monotonic_ns(),
+        )
+        logger.info(f"原始寄存器抓取已启用 - 文件: {self._path}, 容量: {self._capacity} 条")
+
+    def append(self, function: int, address: int, registers: Sequence[int]) -> None:
+        """追加一条记录；超过 16 个寄存器的块按地址顺序拆成多条"""
+        mm = self._mm
+        if mm is None:
+            return
+        t_ns = time.monotonic_ns()
+        slave = settings.MODBUS_SLAVE_ID & 0xFF
+        with self._lock:
+            for start in range(0, max(len(registers), 1), RECORD_REGISTERS):
+                chunk = registers[start:start + RECORD_REGISTERS]
+                padded = list(chunk) + [0] * (RECORD_REGISTERS - len(chunk))
+                offset = HEADER_SIZE + (self._write_seq % self._capacity) * RECORD_SIZE
+                RECORD.pack_into(mm, offset, t_ns, function, slave, address + start, len(chunk), *padded)
+                self._write_seq += 1
+            # 记录写完后再更新计数，读者据此判断哪些记录完整
+            _WRITE_SEQ.pack_into(mm, _WRITE_SEQ_OFFSET, self._write_seq)
+
+    def flush(self) -> None:
+        if self._mm is not None:
+            self._mm.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mm is not None:
+                self._mm.flush()
+                self._mm.close()
+                self._mm = None
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.is_open,
+            "path": self._path,
+            "capacity": self._capacity,
+            "records_written": self._write_seq,
+        }
+
+
+def read_header(buf) -> CaptureHeader:
+    magic, version, record_size, capacity, write_seq, wall_ns, mono_ns = HEADER.unpack_from(buf, 0)
+    if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION or record_size != RECORD_SIZE:
+        raise ValueError("不是有效的原始寄存器抓取文件")
+    return CaptureHeader(capacity, write_seq, wall_ns, mono_ns)
+
+
+def iter_records(buf, header: Optional[CaptureHeader] = None) -> Iterator[CaptureRecord]:
+    """按写入顺序遍历环形缓冲中仍然保留的记录（buf 可以是 bytes 或 mmap）"""
+    if header is None:
+        header = read_header(buf)
+    retained = min(header.write_seq, header.capacity)
+    for seq in range(header.write_seq - retained, header.write_seq):
+        offset = HEADER_SIZE + (seq % header.capacity) * RECORD_SIZE
+        t_ns, function, slave, address, count, *registers = RECORD.unpack_from(buf, offset)
+        yield CaptureRecord(seq, t_ns, function, slave, address, registers[:count])
+
+
+def open_capture(path: str) -> mmap.mmap:
+    """以只读方式映射抓取文件，供离线工具使用"""
+    with open(path, "rb") as fp:
+        return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# 创建全局抓取日志实例（CAPTURE_ENABLED 时在启动阶段打开）
+raw_capture = RawCaptureLog(settings.CAPTURE_FILE, settings.CAPTURE_CAPACITY)
@@ -0,0 +1,169 @@
+"""
+控制命令邮箱（后写覆盖）
+UI 滑块每秒可能产生几十次 /set-parameters；如果每次都在请求线程里同步写总线，
+请求会排队等串口锁，驱动器执行的设定值远远落后于滑块。
+
+邮箱只保留一条待发送命令：新命令直接覆盖尚未发送的旧命令（旧命令标记为 superseded），
+专用的总线线程每次只发送最新的一条。HTTP 请求提交后立即返回命令 ID，
+之后可以通过 ID 等待执行结果
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.schemas.motor_schemas import ControlCommand
+from app.services.control_service import control_service
+from app.services.latency_service import CommandStamp, latency_tracker
+from app.utils.logger import get_logger
+
+logger = get_logger("command-mailbox")
+
+RECENT_TICKETS = 256
+
+
+class CommandTicket:
+    __slots__ = ("command_id", "command", "stamp", "state", "result", "superseded_by", "done", "_waiters")
+
+    def __init__(self, command: ControlCommand, stamp: CommandStamp) -> None:
+        self.command_id = stamp.command_id
+        self.command = command
+        self.stamp = stamp
+        self.state = "pending"            # pending / sending / applied / error / superseded
+        self.result: Optional[Dict[str, Any]] = None
+        self.superseded_by: Optional[int] = None
+        self.done = threading.Event()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "command_id": self.command_id,
+            "state": self.state,
+            "mode": self.command.mode,
+            "superseded_by": self.superseded_by,
+            "result": self.result,
+        }
+
+
+class CommandMailbox:
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._pending: Optional[CommandTicket] = None
+        self._sending: Optional[CommandTicket] = None
+        self._tickets: "OrderedDict[int, CommandTicket]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+        self.submitted = 0
+        self.sent = 0
+        self.superseded = 0
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="command-mailbox", daemon=True)
+            self._thread.start()
+
+    # ========== 提交 ==========
+
+    def submit(self, command: ControlCommand, received_mono: float) -> CommandTicket:
+        """放入邮箱并立即返回；覆盖尚未发送的旧命令"""
+        target = command.target_torque if command.mode == "torque" else command.target_rpm
+        ticket = CommandTicket(command, latency_tracker.begin(command.mode, target, received_mono))
+        with self._cond:
+            self._ensure_worker()
+            previous = self._pending
+            if previous is not None:
+                previous.state = "superseded"
+                previous.superseded_by = ticket.command_id
+                self.superseded += 1
+            self._pending = ticket
+            self._tickets[ticket.command_id] = ticket
+            while len(self._tickets) > RECENT_TICKETS:
+                self._tickets.popitem(last=False)
+            self.submitted += 1
+            self._cond.notify()
+        if previous is not None:
+            self._complete(previous)
+        return ticket
+
+    def get(self, command_id: int) -> Optional[CommandTicket]:
+        with self._cond:
+            return self._tickets.get(command_id)
+
+    def wait(self, ticket: CommandTicket, timeout: float) -> bool:
+        """同步等待命令完成（已发送或被覆盖）"""
+        return ticket.done.wait(timeout)
+
+    async def wait_async(self, ticket: CommandTicket, timeout: float) -> bool:
+        """在事件循环中等待命令完成，不占用线程池"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._cond:
+            if ticket.done.is_set():
+                return True
+            ticket._waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    # ========== 总线线程 ==========
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                ticket, self._pending = self._pending, None
+                ticket.state = "sending"
+                self._sending = ticket
+            latency_tracker.mark(ticket.stamp, "dequeued", time.monotonic())
+            try:
+                result = control_service.set_parameters(ticket.command)
+            except Exception as e:
+                logger.error(f"命令 {ticket.command_id} 发送失败: {e}", exc_info=True)
+                result = {"status": "error", "success": False, "message": str(e)}
+            # 只有驱动器确认写入的设定值才算 applied；NAK 或超时的写入标记为 error
+            success = bool(result.get("success"))
+            if success:
+                latency_tracker.mark(ticket.stamp, "written", time.monotonic())
+            with self._cond:
+                ticket.result = result
+                ticket.state = "applied" if success else "error"
+                self._sending = None
+                self.sent += 1
+            self._complete(ticket)
+
+    def _complete(self, ticket: CommandTicket) -> None:
+        with self._cond:
+            ticket.done.set()
+            waiters, ticket._waiters = ticket._waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # 等待方的事件循环已关闭
+                pass
+
+    def busy(self) -> bool:
+        """是否有待发送或正在发送的命令"""
+        with self._cond:
+            return self._pending is not None or self._sending is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "submitted": self.submitted,
+                "sent": self.sent,
+                "superseded": self.superseded,
+                "pending": self._pending.command_id if self._pending is not None else None,
+            }
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+# 创建全局命令邮箱实例
+command_mailbox = CommandMailbox()
@@ -38,10 +38,12 @@ class ControlService:
     def set_parameters(self, cmd: ControlCommand) -> Dict:
         """
         设置控制参数
-        如果启用 ModbusRTU，会实际发送到驱动器
+        如果启用 ModbusRTU，会实际发送到驱动器；返回值的 success 表示设定值是否已被驱动器接受
+        （未启用 ModbusRTU 时只记录，success 为 True）
         """
         from app.core.config import settings
         from app.services.modbus_service import modbus_service
+        from app.services.torque_model import torque_model
         
         with self._lock:
             self._last_control = cmd
@@ -84,15 +86,19 @@ class ControlService:
                         
                 elif cmd.mode == "torque" and cmd.target_torque is not None:
                     # 电流控制模式（模式0，恒扭矩）
-                    # 将转矩转换为电流
-                    # 电机参数：每安培 400 mN·m = 0.4 N·m/A
-                    # 所以：电流(A) = 转矩(Nm) / 0.4 = 转矩(Nm) × 2.5
-                    current_amps = cmd.target_torque * 2.5
+                    # 将转矩转换为电流：用当前电机温度反查转矩标定表（与读回使用同一模型）
+                    temperature = self.latest_temperature()
+                    current_amps, saturated = torque_model.current(cmd.target_torque, temperature)
+                    if saturated:
+                        logger.warning(
+                            f"目标转矩 {cmd.target_torque} Nm 超出标定范围（{temperature:.0f}℃），"
+                            f"电流限制为 {current_amps:.2f} A"
+                        )
                     success = modbus_service.set_current(current_amps)
                     if success:
                         modbus_service.set_mode(0, use_empty_mode=True)  # 切换到电流模式
                         applied["torque"] = cmd.target_torque
-                        logger.info(f"设置转矩: {cmd.target_torque} Nm (电流: {current_amps:.3f} A)")
+                        logger.info(f"设置转矩: {cmd.target_torque} Nm (电流: {current_amps:.3f} A, 温度: {temperature:.0f}℃)")
                     else:
                         logger.error("设置转矩失败")
                         
@@ -100,18 +106,50 @@ class ControlService:
                 logger.error(f"ModbusRTU 控制失败: {e}", exc_info=True)
                 return {
                     "status": "error",
+                    "success": False,
                     "message": f"控制失败: {str(e)}",
                     "mode": cmd.mode,
                     "applied_values": applied
                 }
+            
+            if applied["rpm"] is None and applied["torque"] is None:
+                return {
+                    "status": "error",
+                    "success": False,
+                    "message": "设定值写入驱动器失败",
+                    "mode": cmd.mode,
+                    "applied_values": applied
+                }
         
         return {
             "status": "received",
+            "success": True,
             "message": "Control parameters logged" if not settings.USE_MODBUS else "Control parameters sent to driver",
             "mode": cmd.mode,
             "applied_values": applied
         }
 
+    def record_command(self, cmd: ControlCommand) -> None:
+        """记录由后端自身（如运动曲线执行器）发出的设定值，不再发送到驱动器"""
+        with self._lock:
+            self._last_control = cmd
+
+    def latest_temperature(self) -> float:
+        """最近一次电机温度，尚未收到数据时为 TORQUE_REFERENCE_TEMPERATURE"""
+        from app.core.config import settings
+
+        with self._lock:
+            status = self._motor_status
+        return status.temperature if status is not None else settings.TORQUE_REFERENCE_TEMPERATURE
+
+    def target_rpm(self) -> Optional[float]:
+        """最近一次转速模式命令的目标转速，不在转速模式时为 None"""
+        with self._lock:
+            cmd = self._last_control
+        if cmd is None or cmd.mode != "speed":
+            return None
+        return cmd.target_rpm
+
     def latest(self) -> Optional[Dict]:
         with self._lock:
             if not (self._motor_status and self._vibration_metrics and self._timestamp):
@@ -0,0 +1,288 @@
+"""
+能耗与工况累计
+每个遥测样本 O(1) 更新以下累计量，按固定长度的时间桶（默认 15 分钟）记账：
+
+- 电能：功率（寄存器 5004，带符号）按真实采样时间做梯形积分，耗电与回馈分开累计
+- 运行时间：转速高于各个阈值的累计时长
+- 工况谱：转速 × 转矩二维驻留时间直方图（秒），用于电机选型和负载分析
+
+时间桶定期写入 SQLite，按桶起始时间建主键；查询时再把时间桶按自然日或班次
+（本地时间，班次起点见 ENERGY_SHIFTS）汇总，用于成本分摊
+"""
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.telemetry_pipeline import TelemetrySample
+from app.utils.logger import get_logger
+
+logger = get_logger("energy-service")
+
+WH_PER_JOULE = 1.0 / 3600.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS energy_buckets (
+    start_ms INTEGER PRIMARY KEY,
+    seconds REAL NOT NULL,
+    energy_wh REAL NOT NULL,
+    regen_wh REAL NOT NULL,
+    peak_power_w REAL NOT NULL,
+    run_seconds TEXT NOT NULL,
+    dwell BLOB NOT NULL
+);
+"""
+
+
+class _Bucket:
+    """一个时间桶内的累计量"""
+
+    __slots__ = ("start_ms", "seconds", "energy_wh", "regen_wh", "peak_power_w", "run_seconds", "dwell")
+
+    def __init__(self, start_ms: int, thresholds: int, shape: Tuple[int, int]) -> None:
+        self.start_ms = start_ms
+        self.seconds = 0.0
+        self.energy_wh = 0.0
+        self.regen_wh = 0.0
+        self.peak_power_w = 0.0
+        self.run_seconds = np.zeros(thresholds)
+        self.dwell = np.zeros(shape)
+
+    def row(self) -> tuple:
+        return (
+            self.start_ms, self.seconds, self.energy_wh, self.regen_wh, self.peak_power_w,
+            json.dumps(self.run_seconds.tolist()), self.dwell.astype(np.float32).tobytes(),
+        )
+
+
+class EnergyAccountant:
+    def __init__(self, db_file: Optional[str] = None) -> None:
+        self._lock = threading.Lock()
+        self._db_file = Path(db_file or settings.ENERGY_DB_FILE)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._bucket_ms = int(settings.ENERGY_BUCKET_MINUTES * 60_000)
+        self.thresholds = np.array(sorted(settings.ENERGY_RUN_RPM_THRESHOLDS), dtype=np.float64)
+        self.rpm_edges = np.linspace(0.0, settings.ENERGY_DWELL_RPM_MAX, settings.ENERGY_DWELL_RPM_BINS + 1)
+        self.torque_edges = np.linspace(0.0, settings.ENERGY_DWELL_TORQUE_MAX, settings.ENERGY_DWELL_TORQUE_BINS + 1)
+        self._shape = (settings.ENERGY_DWELL_RPM_BINS, settings.ENERGY_DWELL_TORQUE_BINS)
+        self._rpm_scale = settings.ENERGY_DWELL_RPM_BINS / settings.ENERGY_DWELL_RPM_MAX
+        self._torque_scale = settings.ENERGY_DWELL_TORQUE_BINS / settings.ENERGY_DWELL_TORQUE_MAX
+
+        self._buckets: Dict[int, _Bucket] = {}     # 尚未写入数据库的时间桶（当前桶 + 刚结束的桶）
+        self._last: Optional[Tuple[float, float, float, float]] = None   # 上一个样本 (t_mono, 功率, 转速, 转矩)
+        self._power_w = 0.0
+        self._last_save = time.monotonic()
+
+    # ========== 更新 ==========
+
+    def on_sample(self, sample: TelemetrySample) -> None:
+        """遥测管道消费者；回放样本不计入（避免重复记账）"""
+        if sample.replayed:
+            return
+        status = sample.motor_status
+        # 优先用寄存器原始功率（带符号，负值为回馈），模拟数据只有非负的 MotorStatus.power
+        power = status.power
+        if sample.registers is not None:
+            power = sample.registers.get("power", power)
+        self.update(sample.t_mono, sample.timestamp_ms, power, abs(status.rpm), abs(status.torque))
+
+    def update(self, t_mono: float, timestamp_ms: int, power: float, rpm: float, torque: float) -> None:
+        with self._lock:
+            last, self._last = self._last, (t_mono, power, rpm, torque)
+            self._power_w = power
+            if last is None:
+                return
+            dt = t_mono - last[0]
+            # 时间倒退或长时间中断（断线/暂停）时不积分，中断期间的状态未知
+            if dt <= 0 or dt > settings.ENERGY_MAX_GAP_SECONDS:
+                return
+
+            bucket = self._bucket(timestamp_ms)
+            bucket.seconds += dt
+            # 梯形积分；跨零时耗电/回馈按两端各自的正/负部分近似拆分
+            p0, p1 = last[1], power
+            bucket.energy_wh += 0.5 * (max(p0, 0.0) + max(p1, 0.0)) * dt * WH_PER_JOULE
+            bucket.regen_wh += 0.5 * (max(-p0, 0.0) + max(-p1, 0.0)) * dt * WH_PER_JOULE
+            bucket.peak_power_w = max(bucket.peak_power_w, p1)
+
+            # 区间内的工况取区间起点的状态（采样保持）
+            rpm0, torque0 = last[2], last[3]
+            above = int(np.searchsorted(self.thresholds, rpm0, side="right"))
+            if above:
+                bucket.run_seconds[:above] += dt
+            i = min(int(rpm0 * self._rpm_scale), self._shape[0] - 1)
+            j = min(int(torque0 * self._torque_scale), self._shape[1] - 1)
+            bucket.dwell[i, j] += dt
+
+            save = t_mono - self._last_save >= settings.ENERGY_SAVE_INTERVAL
+        if save:
+            self.save()
+
+    def _bucket(self, timestamp_ms: int) -> _Bucket:
+        start_ms = timestamp_ms - timestamp_ms % self._bucket_ms
+        bucket = self._buckets.get(start_ms)
+        if bucket is None:
+            bucket = self._load_bucket(start_ms) or _Bucket(start_ms, len(self.thresholds), self._shape)
+            self._buckets[start_ms] = bucket
+        return bucket
+
+    # ========== 持久化 ==========
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._db_file.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self._db_file), check_same_thread=False)
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def _load_bucket(self, start_ms: int) -> Optional[_Bucket]:
+        """重启后继续累计同一时间桶"""
+        try:
+            row = self._connection().execute(
+                "SELECT start_ms, seconds, energy_wh, regen_wh, peak_power_w, run_seconds, dwell "
+                "FROM energy_buckets WHERE start_ms = ?", (start_ms,),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"读取能耗记录失败: {e}")
+            return None
+        return self._decode(row) if row is not None else None
+
+    def _decode(self, row: tuple) -> Optional[_Bucket]:
+        bucket = _Bucket(row[0], len(self.thresholds), self._shape)
+        bucket.seconds, bucket.energy_wh, bucket.regen_wh, bucket.peak_power_w = row[1:5]
+        run_seconds = json.loads(row[5])
+        dwell = np.frombuffer(row[6], dtype=np.float32)
+        # 阈值或直方图分箱改过配置的旧记录：电能照常汇总，运行时间/工况谱不参与
+        if len(run_seconds) == len(self.thresholds):
+            bucket.run_seconds[:] = run_seconds
+        if dwell.size == bucket.dwell.size:
+            bucket.dwell[:] = dwell.reshape(self._shape)
+        return bucket
+
+    def save(self) -> None:
+        """写入未保存的时间桶，已结束的桶写入后从内存移除"""
+        with self._lock:
+            if not self._buckets:
+                self._last_save = time.monotonic()
+                return
+            current = max(self._buckets)
+            rows = [bucket.row() for bucket in self._buckets.values()]
+            try:
+                conn = self._connection()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO energy_buckets "
+                    "(start_ms, seconds, energy_wh, regen_wh, peak_power_w, run_seconds, dwell) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.commit()
+                self._buckets = {current: self._buckets[current]}
+            except sqlite3.Error as e:
+                logger.error(f"保存能耗记录失败: {e}")
+            self._last_save = time.monotonic()
+
+    def close(self) -> None:
+        self.save()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ========== 查询 ==========
+
+    def query(
+        self,
+        start_ms: int,
+        end_ms: int,
+        period: str = "day",
+        include_dwell: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        按自然日（day）、班次（shift）或时间桶（bucket）汇总 [start_ms, end_ms) 内的时间桶
+        日和班次按本地时间划分；跨零点的班次归属于开始的那一天
+        """
+        self.save()
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT start_ms, seconds, energy_wh, regen_wh, peak_power_w, run_seconds, dwell "
+                "FROM energy_buckets WHERE start_ms >= ? AND start_ms < ? ORDER BY start_ms",
+                (start_ms - start_ms % self._bucket_ms, end_ms),
+            ).fetchall()
+
+        groups: Dict[Tuple[datetime, str], List[_Bucket]] = {}
+        for row in rows:
+            bucket = self._decode(row)
+            groups.setdefault(self._period_of(bucket.start_ms, period), []).append(bucket)
+        return [self._summarize(start, label, buckets, include_dwell) for (start, label), buckets in groups.items()]
+
+    def _period_of(self, start_ms: int, period: str) -> Tuple[datetime, str]:
+        local = datetime.fromtimestamp(start_ms / 1000.0).astimezone()
+        if period == "bucket":
+            return local, local.strftime("%Y-%m-%d %H:%M")
+        if period == "day":
+            day = local.replace(hour=0, minute=0, second=0, microsecond=0)
+            return day, day.strftime("%Y-%m-%d")
+        shifts = _shift_starts()
+        minutes = local.hour * 60 + local.minute
+        day = local.replace(hour=0, minute=0, second=0, microsecond=0)
+        started = [(m, name) for m, name in shifts if m <= minutes]
+        if started:
+            m, name = started[-1]
+        else:
+            # 零点之后、第一个班次之前：属于前一天的最后一个班次
+            m, name = shifts[-1]
+            day -= timedelta(days=1)
+        start = day + timedelta(minutes=m)
+        return start, f"{day:%Y-%m-%d} {name}"
+
+    def _summarize(self, start: datetime, label: str, buckets: List[_Bucket], include_dwell: bool) -> Dict[str, Any]:
+        seconds = sum(b.seconds for b in buckets)
+        energy_wh = sum(b.energy_wh for b in buckets)
+        run_seconds = np.sum([b.run_seconds for b in buckets], axis=0)
+        result: Dict[str, Any] = {
+            "period": label,
+            "start": start.isoformat(),
+            "recorded_hours": seconds / 3600.0,
+            "energy_kwh": energy_wh / 1000.0,
+            "regen_kwh": sum(b.regen_wh for b in buckets) / 1000.0,
+            "avg_power_w": energy_wh * 3600.0 / seconds if seconds > 0 else 0.0,
+            "peak_power_w": max(b.peak_power_w for b in buckets),
+            "run_hours": {f"{t:g}": float(s) / 3600.0 for t, s in zip(self.thresholds, run_seconds)},
+        }
+        if include_dwell:
+            result["dwell_hours"] = (np.sum([b.dwell for b in buckets], axis=0) / 3600.0).tolist()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """实时状态：当前功率和当前时间桶的累计量"""
+        with self._lock:
+            current = self._buckets[max(self._buckets)] if self._buckets else None
+            return {
+                "power_w": self._power_w,
+                "bucket_start_ms": current.start_ms if current else None,
+                "bucket_energy_kwh": current.energy_wh / 1000.0 if current else 0.0,
+                "bucket_regen_kwh": current.regen_wh / 1000.0 if current else 0.0,
+                "bucket_minutes": settings.ENERGY_BUCKET_MINUTES,
+                "run_rpm_thresholds": self.thresholds.tolist(),
+                "dwell_rpm_edges": self.rpm_edges.tolist(),
+                "dwell_torque_edges": self.torque_edges.tolist(),
+            }
+
+
+def _shift_starts() -> List[Tuple[int, str]]:
+    """班次起点（当天分钟数，升序）"""
+    starts = []
+    for name, hhmm in settings.ENERGY_SHIFTS.items():
+        hours, minutes = hhmm.split(":")
+        starts.append((int(hours) * 60 + int(minutes), name))
+    return sorted(starts) or [(0, "day")]
+
+
+# 创建全局能耗累计实例
+energy_accountant = EnergyAccountant()
@@ -0,0 +1,149 @@
+"""
+事件服务
+异常检测等模块产生的事件写入 SQLite 事件日志（按时间、通道建索引），
+同时推送给所有 SSE 订阅者（每个订阅者一个有界 asyncio 队列，满时丢弃最旧事件）
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("event-service")
+
+SUBSCRIBER_QUEUE_SIZE = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts_ms INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    value REAL,
+    score REAL,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts_ms);
+CREATE INDEX IF NOT EXISTS idx_events_channel_ts ON events (channel, ts_ms);
+"""
+
+
+class Event(NamedTuple):
+    ts_ms: int
+    source: str          # 产生事件的模块，如 anomaly
+    channel: str         # 通道名，如 motor_current
+    kind: str            # 事件类型，如 zscore / cusum_up / cusum_down
+    value: float
+    score: float
+    message: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+class EventService:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Queue[Event]"]] = []
+
+    # ========== 事件日志 ==========
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            path = Path(settings.EVENT_DB_FILE)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path), check_same_thread=False)
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def record(self, events: List[Event]) -> None:
+        """写入事件日志并推送给订阅者（可在任意线程调用）"""
+        if not events:
+            return
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.executemany(
+                    "INSERT INTO events (ts_ms, source, channel, kind, value, score, message) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    events,
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"写入事件日志失败: {e}")
+            subscribers = list(self._subscribers)
+        for event in events:
+            logger.warning(f"事件 [{event.source}/{event.channel}] {event.kind}: {event.message}")
+        for loop, queue in subscribers:
+            for event in events:
+                try:
+                    loop.call_soon_threadsafe(_offer, queue, event)
+                except RuntimeError:
+                    # 订阅者所在事件循环已关闭
+                    pass
+
+    def query(
+        self,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+        channel: Optional[str] = None,
+        limit: int = 500,
+    ) -> List[Dict[str, Any]]:
+        clauses, params = [], []
+        if start_ms is not None:
+            clauses.append("ts_ms >= ?")
+            params.append(start_ms)
+        if end_ms is not None:
+            clauses.append("ts_ms < ?")
+            params.append(end_ms)
+        if channel is not None:
+            clauses.append("channel = ?")
+            params.append(channel)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = (
+            "SELECT id, ts_ms, source, channel, kind, value, score, message FROM events "
+            f"{where} ORDER BY ts_ms DESC LIMIT ?"
+        )
+        params.append(limit)
+        with self._lock:
+            rows = self._connection().execute(sql, params).fetchall()
+        columns = ("id",) + Event._fields
+        return [dict(zip(columns, row)) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ========== 订阅 ==========
+
+    def subscribe(self) -> "asyncio.Queue[Event]":
+        """在事件循环中调用，返回接收新事件的队列"""
+        queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue: "asyncio.Queue[Event]") -> None:
+        with self._lock:
+            self._subscribers = [(loop, q) for loop, q in self._subscribers if q is not queue]
+
+
+def _offer(queue: "asyncio.Queue[Event]", event: Event) -> None:
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+def format_sse(event: Event) -> str:
+    return f"event: {event.source}\ndata: {json.dumps(event.to_dict(), ensure_ascii=False)}\n\n"
+
+
+# 创建全局事件服务实例
+event_service = EventService()
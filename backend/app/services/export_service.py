@@ -0,0 +1,101 @@
+"""
+历史数据导出
+逐块读取历史存储并编码为 CSV 或 Arrow IPC 流，内存占用只与单个块大小有关
+"""
+import csv
+import io
+from datetime import datetime, timezone
+from typing import Iterator, List
+
+from app.services.history_service import CHANNELS, history_store
+from app.utils.logger import get_logger
+
+try:
+    import pyarrow as pa
+except ImportError:  # 可选依赖，仅 Arrow 导出需要
+    pa = None
+
+logger = get_logger("export-service")
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def _iso(timestamp_ms: int) -> str:
+    return datetime.fromtimestamp(timestamp_ms / 1000.0, tz=timezone.utc).isoformat(timespec="milliseconds")
+
+
+def iter_csv(start_ms: int, end_ms: int) -> Iterator[bytes]:
+    """每个历史块输出一个 CSV 片段"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(["timestamp", "timestamp_ms", *CHANNELS])
+    yield buffer.getvalue().encode("utf-8")
+
+    for timestamps, columns in history_store.iter_blocks(start_ms, end_ms):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            (_iso(ts), ts, *values) for ts, values in zip(timestamps, zip(*columns))
+        )
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """供 pyarrow 写入的文件对象，收集写出的字节以便逐批取走"""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema():
+    fields = [pa.field("timestamp", pa.timestamp("ms", tz="UTC"))]
+    fields.extend(pa.field(name, pa.float64()) for name in CHANNELS)
+    return pa.schema(fields)
+
+
+def iter_arrow(start_ms: int, end_ms: int) -> Iterator[bytes]:
+    """每个历史块编码为一个 Arrow RecordBatch，按 IPC 流格式输出"""
+    if pa is None:
+        raise RuntimeError("pyarrow 未安装，无法导出 Arrow 格式")
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+    yield sink.drain()
+
+    for timestamps, columns in history_store.iter_blocks(start_ms, end_ms):
+        arrays = [pa.array(timestamps, type=pa.timestamp("ms", tz="UTC"))]
+        arrays.extend(pa.array(col, type=pa.float64()) for col in columns)
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+
+def iter_export(fmt: str, start_ms: int, end_ms: int) -> Iterator[bytes]:
+    if fmt == "arrow":
+        return iter_arrow(start_ms, end_ms)
+    return iter_csv(start_ms, end_ms)
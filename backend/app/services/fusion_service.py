@@ -0,0 +1,167 @@
+"""
+驱动器与 SensorCore 数据时间对齐融合
+驱动器样本（≥10Hz，Modbus 轮询）和 SensorCore 帧（2Hz，独立串口）都用 time.monotonic 打时间戳，
+各自存入短环形缓冲；每个 SensorCore 帧在驱动器数据覆盖其时刻之后，
+按帧时刻对驱动器数据做线性插值（或 as-of 取前值），批量向量化计算，
+得到一致的 (rpm, torque, 振动) 融合记录
+"""
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.sensorcore_protocol import STATUS_NOT_READY, SensorCoreFrame
+from app.services.telemetry_pipeline import TelemetrySample
+from app.utils.logger import get_logger
+from app.utils.ring_buffer import RingBuffer
+
+logger = get_logger("fusion-service")
+
+DRIVE_FIELDS = ("t", "rpm", "torque", "current", "power")
+SENSOR_FIELDS = ("t", "vib_freq", "vib_peak", "vib_rms", "vib_ratio", "vib_impulse", "temperature")
+FUSED_FIELDS = DRIVE_FIELDS + SENSOR_FIELDS[1:]
+
+FusedListener = Callable[[np.ndarray], None]
+
+
+class FusionService:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._drive = RingBuffer(settings.FUSION_DRIVE_BUFFER, DRIVE_FIELDS)
+        self._sensor = RingBuffer(settings.FUSION_SENSOR_BUFFER, SENSOR_FIELDS)
+        self._fused = RingBuffer(settings.FUSION_OUTPUT_BUFFER, FUSED_FIELDS)
+        self._sensor_fused_seq = 0   # 已融合（或丢弃）的 SensorCore 帧序号
+        self._dropped = 0
+        self._not_ready = 0          # 跳过的数据未就绪帧
+        self._listeners: List[FusedListener] = []
+
+    def add_listener(self, listener: FusedListener) -> None:
+        """注册融合结果回调，参数为本批新融合记录（列顺序同 FUSED_FIELDS）"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    # ========== 输入 ==========
+
+    def on_drive_sample(self, sample: TelemetrySample) -> None:
+        """遥测管道消费者"""
+        status = sample.motor_status
+        current = np.nan
+        if sample.registers is not None:
+            current = sample.registers.get("motor_current", np.nan)
+        with self._lock:
+            self._drive.append((sample.t_mono, status.rpm, status.torque, current, status.power))
+        self.process()
+
+    def on_sensor_frame(self, frame: SensorCoreFrame, t_recv: float) -> None:
+        """
+        SensorCore 帧回调（读线程）
+        帧描述的是接收前一段 FFT 窗口内的振动，时间戳按 SENSORCORE_LATENCY 前移到窗口中心；
+        传感器报告数据未就绪的帧振动字段是占位值，不参与融合
+        """
+        if frame.status == STATUS_NOT_READY:
+            with self._lock:
+                self._not_ready += 1
+            return
+        with self._lock:
+            self._sensor.append((
+                t_recv - settings.SENSORCORE_LATENCY,
+                frame.vib_freq,
+                frame.peak,
+                frame.rms,
+                frame.vib_ratio,
+                frame.vib_impulse,
+                frame.temperature,
+            ))
+
+    # ========== 融合 ==========
+
+    def process(self) -> int:
+        """融合所有已被驱动器数据覆盖的待处理帧，返回新融合的记录数"""
+        with self._lock:
+            fused = self._fuse_pending_locked()
+        if fused is not None and len(fused):
+            for listener in self._listeners:
+                try:
+                    listener(fused)
+                except Exception as e:
+                    logger.error(f"融合结果回调失败: {e}", exc_info=True)
+            return len(fused)
+        return 0
+
+    def _fuse_pending_locked(self) -> Optional[np.ndarray]:
+        if len(self._drive) < 2:
+            return None
+        # 环形缓冲溢出时未处理的帧已被覆盖
+        start_seq = max(self._sensor_fused_seq, self._sensor.total - len(self._sensor))
+        self._dropped += start_seq - self._sensor_fused_seq
+        self._sensor_fused_seq = start_seq
+        pending = self._sensor.since(start_seq)
+        if len(pending) == 0:
+            return None
+
+        drive = self._drive.latest()
+        drive_t = drive[:, 0]
+        frame_t = pending[:, 0]
+
+        # 只处理驱动器数据已覆盖到的帧，其余等待后续样本
+        ready = int(np.searchsorted(frame_t, drive_t[-1], side="right"))
+        if ready == 0:
+            return None
+        self._sensor_fused_seq = start_seq + ready
+        pending = pending[:ready]
+        frame_t = frame_t[:ready]
+
+        right = np.searchsorted(drive_t, frame_t, side="right")
+        left = np.clip(right - 1, 0, len(drive_t) - 1)
+        right = np.clip(right, 0, len(drive_t) - 1)
+        gap = drive_t[right] - drive_t[left]
+        # 早于驱动器缓冲或两侧样本间隔过大（通信中断）的帧无法可靠对齐
+        valid = (frame_t >= drive_t[0]) & (gap <= settings.FUSION_MAX_GAP)
+        self._dropped += int(np.count_nonzero(~valid))
+        if not np.any(valid):
+            return None
+        pending = pending[valid]
+        frame_t = frame_t[valid]
+
+        out = np.empty((len(pending), len(FUSED_FIELDS)), dtype=np.float64)
+        out[:, 0] = frame_t
+        if settings.FUSION_MODE == "asof":
+            idx = left[valid]
+            out[:, 1:len(DRIVE_FIELDS)] = drive[idx, 1:]
+        else:
+            for col in range(1, len(DRIVE_FIELDS)):
+                out[:, col] = np.interp(frame_t, drive_t, drive[:, col])
+        out[:, len(DRIVE_FIELDS):] = pending[:, 1:]
+        self._fused.extend(out)
+        return out
+
+    # ========== 查询 ==========
+
+    def window(self, seconds: float) -> Dict[str, Any]:
+        """最近 seconds 秒的融合记录，按列返回"""
+        with self._lock:
+            fused = self._fused.latest()
+            dropped = self._dropped
+            not_ready = self._not_ready
+        if len(fused):
+            fused = fused[fused[:, 0] >= fused[-1, 0] - seconds]
+        # 模拟数据没有电流寄存器，NaN 在 JSON 中输出为 null
+        records = [[None if v != v else v for v in row] for row in fused.tolist()]
+        return {
+            "fields": list(FUSED_FIELDS),
+            "records": records,
+            "dropped": dropped,
+            "not_ready": not_ready,
+        }
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        with self._lock:
+            if len(self._fused) == 0:
+                return None
+            row = self._fused.latest(1)[0]
+        return dict(zip(FUSED_FIELDS, row.tolist()))
+
+
+# 创建全局融合服务实例
+fusion_service = FusionService()
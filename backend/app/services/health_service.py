@@ -0,0 +1,214 @@
+"""
+健康指数与刀具磨损在线估计
+每个样本 O(1) 更新，不回扫历史：
+
+- 健康指数：振动 RMS、冲击次数、电流/转矩比三个指标各维护一快一慢两条 EWMA，
+  慢速 EWMA 作为正常工况基线（启动初期按累计平均快速建立），快速 EWMA 与基线之比
+  超出 1 的部分按权重计入劣化量，health_index = 100 × exp(-劣化量)
+- 刀具磨损：运行时按 (负载/100)^指数 对时间积分，累计到 TOOL_LIFE_HOURS 满负载小时记为 100%
+
+状态定期写入 JSON 文件，重启后继续累计
+"""
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("health-service")
+
+INDICATORS = ("rms", "impulse", "current_ratio")
+MAX_STEP_SECONDS = 1.0          # 两次更新间隔超过该值（暂停/断线）时按该值计
+BASELINE_FREEZE_RATIO = 1.5     # 快速值超过基线该倍数时暂停学习基线，避免把劣化学进基线
+
+
+class _Ewma:
+    """按时间常数加权的指数滑动平均（支持不等间隔采样）"""
+
+    __slots__ = ("tau", "value")
+
+    def __init__(self, tau: float, value: Optional[float] = None) -> None:
+        self.tau = tau
+        self.value = value
+
+    def update(self, x: float, dt: float, min_alpha: float = 0.0) -> float:
+        if self.value is None:
+            self.value = x
+        else:
+            alpha = max(1.0 - math.exp(-dt / self.tau), min_alpha)
+            self.value += alpha * (x - self.value)
+        return self.value
+
+
+class HealthEstimator:
+    def __init__(self, state_file: Optional[str] = None) -> None:
+        self._lock = threading.Lock()
+        self._state_file = Path(state_file or settings.HEALTH_STATE_FILE)
+        self._fast = {name: _Ewma(settings.HEALTH_FAST_TAU) for name in INDICATORS}
+        self._baseline = {name: _Ewma(settings.HEALTH_BASELINE_TAU) for name in INDICATORS}
+        self._weights = {
+            "rms": settings.HEALTH_RMS_WEIGHT,
+            "impulse": settings.HEALTH_IMPULSE_WEIGHT,
+            "current_ratio": settings.HEALTH_CURRENT_WEIGHT,
+        }
+        self._learned_seconds = 0.0     # 基线已学习的运行时间
+        self._run_seconds = 0.0         # 累计运行时间（转速高于 HEALTH_MIN_RPM）
+        self._wear_seconds = 0.0        # 累计等效满负载时间
+        self._health_index = 100.0
+        self._last_t: Optional[float] = None
+        self._last_save = time.monotonic()
+        self._load_state()
+
+    # ========== 更新 ==========
+
+    def update(
+        self,
+        rpm: float,
+        rms: Optional[float] = None,
+        impulse_count: Optional[float] = None,
+        load: Optional[float] = None,
+        power: Optional[float] = None,
+        motor_current: Optional[float] = None,
+        t_mono: Optional[float] = None,
+    ) -> Dict[str, float]:
+        """
+        输入一个样本，返回 {health_index, tool_wear}
+        没有实测振动数据时 rms/impulse_count 传 None，对应指标不更新（避免把 0 学进基线）
+        """
+        if t_mono is None:
+            t_mono = time.monotonic()
+        with self._lock:
+            dt = 0.0 if self._last_t is None else min(max(t_mono - self._last_t, 0.0), MAX_STEP_SECONDS)
+            self._last_t = t_mono
+            running = abs(rpm) >= settings.HEALTH_MIN_RPM
+
+            if running and dt > 0:
+                values: Dict[str, float] = {}
+                if rms is not None:
+                    values["rms"] = rms
+                if impulse_count is not None:
+                    values["impulse"] = float(impulse_count)
+                # 电流/转矩比：转矩由功率和转速推算（T = P·60 / 2πn），与由电流换算的转矩相互独立
+                if motor_current is not None and power is not None and power > 0:
+                    shaft_torque = power * 60.0 / (2.0 * math.pi * abs(rpm))
+                    values["current_ratio"] = abs(motor_current) / shaft_torque
+                if values:
+                    self._update_indicators(values, dt)
+                self._run_seconds += dt
+                if load is not None:
+                    self._wear_seconds += dt * (max(0.0, min(load, 100.0)) / 100.0) ** settings.TOOL_WEAR_LOAD_EXPONENT
+
+            result = {"health_index": self._health_index, "tool_wear": self._tool_wear()}
+            save = t_mono - self._last_save >= settings.HEALTH_SAVE_INTERVAL
+        if save:
+            self.save()
+        return result
+
+    def _update_indicators(self, values: Dict[str, float], dt: float) -> None:
+        # 启动初期基线按累计平均学习（alpha 下限 dt/已学习时间），之后退化为慢速 EWMA
+        warmup_alpha = dt / (self._learned_seconds + dt)
+        learning = False
+        for name, x in values.items():
+            fast = self._fast[name].update(x, dt)
+            baseline = self._baseline[name]
+            if baseline.value is None or self._learned_seconds < settings.HEALTH_WARMUP_SECONDS \
+                    or fast <= baseline.value * BASELINE_FREEZE_RATIO:
+                baseline.update(x, dt, min_alpha=warmup_alpha)
+                learning = True
+        if learning:
+            self._learned_seconds += dt
+        if self._learned_seconds < settings.HEALTH_WARMUP_SECONDS:
+            return
+
+        degradation = 0.0
+        for name in INDICATORS:
+            fast = self._fast[name].value
+            baseline = self._baseline[name].value
+            if fast is None or baseline is None or baseline <= 1e-9:
+                continue
+            ratio = fast / baseline
+            # 电流/转矩比双向漂移都算劣化；振动和冲击只计升高
+            deviation = abs(ratio - 1.0) if name == "current_ratio" else max(0.0, ratio - 1.0)
+            degradation += self._weights[name] * deviation
+        self._health_index = 100.0 * math.exp(-degradation)
+
+    def _tool_wear(self) -> float:
+        life_seconds = settings.TOOL_LIFE_HOURS * 3600.0
+        return min(100.0, 100.0 * self._wear_seconds / life_seconds) if life_seconds > 0 else 0.0
+
+    def reset_tool_wear(self) -> None:
+        """换刀后清零磨损"""
+        with self._lock:
+            self._wear_seconds = 0.0
+        self.save()
+        logger.info("刀具磨损已清零")
+
+    def reset_baseline(self) -> None:
+        """维修后重新学习正常工况基线"""
+        with self._lock:
+            for name in INDICATORS:
+                self._fast[name].value = None
+                self._baseline[name].value = None
+            self._learned_seconds = 0.0
+            self._health_index = 100.0
+        self.save()
+        logger.info("健康基线已重置，重新学习")
+
+    # ========== 持久化 ==========
+
+    def _load_state(self) -> None:
+        if not self._state_file.exists():
+            return
+        try:
+            state = json.loads(self._state_file.read_text(encoding="utf-8"))
+            for name in INDICATORS:
+                self._fast[name].value = state["fast"].get(name)
+                self._baseline[name].value = state["baseline"].get(name)
+            self._learned_seconds = float(state["learned_seconds"])
+            self._run_seconds = float(state["run_seconds"])
+            self._wear_seconds = float(state["wear_seconds"])
+            self._health_index = float(state["health_index"])
+            logger.info(f"已加载健康估计状态: {self._state_file}")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"健康估计状态文件无效，重新开始: {e}")
+
+    def save(self) -> None:
+        """原子写入状态文件（先写临时文件再替换）"""
+        with self._lock:
+            state = {
+                "fast": {name: e.value for name, e in self._fast.items()},
+                "baseline": {name: e.value for name, e in self._baseline.items()},
+                "learned_seconds": self._learned_seconds,
+                "run_seconds": self._run_seconds,
+                "wear_seconds": self._wear_seconds,
+                "health_index": self._health_index,
+            }
+            self._last_save = time.monotonic()
+        try:
+            self._state_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self._state_file.with_suffix(".tmp")
+            tmp.write_text(json.dumps(state), encoding="utf-8")
+            os.replace(tmp, self._state_file)
+        except OSError as e:
+            logger.error(f"保存健康估计状态失败: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "health_index": self._health_index,
+                "tool_wear": self._tool_wear(),
+                "run_hours": self._run_seconds / 3600.0,
+                "wear_hours": self._wear_seconds / 3600.0,
+                "baseline_learned": self._learned_seconds >= settings.HEALTH_WARMUP_SECONDS,
+                "fast": {name: e.value for name, e in self._fast.items()},
+                "baseline": {name: e.value for name, e in self._baseline.items()},
+            }
+
+
+# 创建全局健康估计实例
+health_estimator = HealthEstimator()
@@ -0,0 +1,221 @@
+"""
+遥测历史存储
+按天分段写入压缩后的数据块（见 app/utils/gorilla.py），读取时逐块流式解码
+
+append 在遥测管道中（事件循环上）调用；块满后的编码和写盘交给单线程的写入器，
+不阻塞事件循环。写入中的块对读取方仍然可见，读取方只扫描文件中已确认写完的部分，不会重复或遗漏
+"""
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.schemas.motor_schemas import MotorStatus
+from app.utils.gorilla import decode_payload, encode_block, iter_block_headers
+from app.utils.logger import get_logger
+
+logger = get_logger("history-service")
+
+# 持久化的通道（顺序即块内列顺序，修改需要兼容旧文件）
+CHANNELS: Tuple[str, ...] = ("rpm", "torque", "load", "temperature", "power")
+
+SEGMENT_PREFIX = "telemetry-"
+SEGMENT_SUFFIX = ".gts"
+
+Block = Tuple[List[int], List[List[float]]]
+
+# datetime 可表示的最大时刻（9999-12-31），更大的区间终点按此截断
+MAX_TIMESTAMP_MS = 253_402_214_400_000
+
+
+def _day_of(timestamp_ms: int) -> str:
+    return datetime.fromtimestamp(timestamp_ms / 1000.0, tz=timezone.utc).strftime("%Y%m%d")
+
+
+class HistoryStore:
+    """
+    遥测历史存储
+    样本先在内存中累积，满 HISTORY_BLOCK_SIZE 个后交给写入线程编码并追加到当天的分段文件
+    """
+
+    def __init__(self, directory: Optional[str] = None, block_size: Optional[int] = None) -> None:
+        self._lock = Lock()
+        self._directory = directory or settings.HISTORY_DIR
+        self._block_size = block_size or settings.HISTORY_BLOCK_SIZE
+        self._timestamps: List[int] = []
+        self._columns: List[List[float]] = [[] for _ in CHANNELS]
+        self._writing: List[Block] = []                 # 已交给写入线程、尚未写完的块
+        self._committed: Dict[str, int] = {}            # 本进程写过的分段文件 → 已写完的字节数
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._blocks_written = 0
+        self._bytes_written = 0
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    def segment_path(self, day: str) -> str:
+        return os.path.join(self._directory, f"{SEGMENT_PREFIX}{day}{SEGMENT_SUFFIX}")
+
+    def append(self, timestamp_ms: int, values: Sequence[float]) -> None:
+        """追加一个样本，values 顺序与 CHANNELS 一致"""
+        with self._lock:
+            self._timestamps.append(int(timestamp_ms))
+            for column, value in zip(self._columns, values):
+                column.append(float(value))
+            if len(self._timestamps) >= self._block_size:
+                self._submit_locked()
+
+    def append_status(self, status: MotorStatus, timestamp_ms: Optional[int] = None) -> None:
+        if timestamp_ms is None:
+            timestamp_ms = int(time.time() * 1000)
+        self.append(timestamp_ms, [getattr(status, name) for name in CHANNELS])
+
+    def flush(self) -> None:
+        """把未满的缓冲块写盘并等待写入线程写完（关闭服务时调用）"""
+        with self._lock:
+            future = self._submit_locked()
+            writer = self._writer
+        if future is None and writer is not None:
+            # 没有新块也要等已提交的块写完（单线程写入器按提交顺序执行）
+            future = writer.submit(lambda: None)
+        if future is not None:
+            future.result()
+
+    def _submit_locked(self) -> Optional[Future]:
+        if not self._timestamps:
+            return None
+        block: Block = (self._timestamps, self._columns)
+        self._timestamps = []
+        self._columns = [[] for _ in CHANNELS]
+        self._writing.append(block)
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-writer")
+        return self._writer.submit(self._write_block, block)
+
+    def _write_block(self, block: Block) -> None:
+        """写入线程：编码并追加一个块"""
+        timestamps, columns = block
+        path = self.segment_path(_day_of(timestamps[0]))
+        try:
+            data = encode_block(timestamps, columns)
+            os.makedirs(self._directory, exist_ok=True)
+            with self._lock:
+                if path not in self._committed:
+                    self._committed[path] = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(path, "ab") as fp:
+                fp.write(data)
+                size = fp.tell()
+            with self._lock:
+                self._committed[path] = size
+                self._blocks_written += 1
+                self._bytes_written += len(data)
+        except (OSError, ValueError) as e:
+            logger.error(f"写入历史数据块失败 - 文件: {path}, 错误: {e}")
+        finally:
+            with self._lock:
+                self._writing = [b for b in self._writing if b is not block]
+
+    def _segment_days(self) -> List[str]:
+        """目录中已有分段文件的日期（YYYYMMDD），按时间排序"""
+        try:
+            names = os.listdir(self._directory)
+        except OSError:
+            return []
+        days = [
+            name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+            for name in names
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        ]
+        return sorted(day for day in days if len(day) == 8 and day.isdigit())
+
+    def time_range(self) -> Optional[Tuple[int, int]]:
+        """
+        历史数据覆盖的大致时间范围（毫秒）：最早分段当天零点（UTC）到当前时刻；
+        没有任何数据时返回 None
+        """
+        days = self._segment_days()
+        with self._lock:
+            pending = self._writing[0][0] if self._writing else self._timestamps
+            pending_first = pending[0] if pending else None
+        if days:
+            first = datetime.strptime(days[0], "%Y%m%d").replace(tzinfo=timezone.utc)
+            start_ms = int(first.timestamp() * 1000)
+        elif pending_first is not None:
+            start_ms = pending_first
+        else:
+            return None
+        return start_ms, int(time.time() * 1000)
+
+    def _segments_between(self, start_ms: int, end_ms: int) -> List[str]:
+        # 块按首个样本所在日期归档，跨零点的块会落在前一天的文件中；
+        # 只比较已有文件的日期，不逐日探测，也不构造超出 datetime 范围的日期
+        first = _day_of(max(start_ms - 86_400_000, 0))
+        last = _day_of(min(end_ms, MAX_TIMESTAMP_MS))
+        return [self.segment_path(day) for day in self._segment_days() if first <= day <= last]
+
+    def iter_blocks(self, start_ms: int, end_ms: int) -> Iterator[Block]:
+        """
+        按时间顺序逐块返回 [start_ms, end_ms] 区间内的数据
+        与区间不相交的块只读块头即跳过；每次只有一个块驻留内存
+        """
+        # 同一时刻取快照：文件只读到快照时已写完的位置，写入中的块和缓冲样本从内存返回
+        paths = self._segments_between(start_ms, end_ms)
+        with self._lock:
+            limits = {
+                path: self._committed[path] if path in self._committed else os.path.getsize(path)
+                for path in paths
+            }
+            memory = [(list(ts), [list(col) for col in cols]) for ts, cols in self._writing]
+            memory.append((list(self._timestamps), [list(col) for col in self._columns]))
+        for path in paths:
+            with open(path, "rb") as fp:
+                for header, offset in iter_block_headers(fp, limits[path]):
+                    if header.t_last < start_ms or header.t_first > end_ms:
+                        continue
+                    resume = fp.tell()
+                    fp.seek(offset)
+                    payload = fp.read(header.payload_len)
+                    fp.seek(resume)
+                    block = _clip(decode_payload(header, payload), start_ms, end_ms)
+                    if block[0]:
+                        yield block
+
+        # 写入中的块和尚未写盘的缓冲样本
+        for pending in memory:
+            block = _clip(pending, start_ms, end_ms)
+            if block[0]:
+                yield block
+
+    def iter_samples(self, start_ms: int, end_ms: int) -> Iterator[Tuple[int, Tuple[float, ...]]]:
+        for timestamps, columns in self.iter_blocks(start_ms, end_ms):
+            yield from zip(timestamps, zip(*columns))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "directory": self._directory,
+                "channels": list(CHANNELS),
+                "pending_samples": len(self._timestamps),
+                "writing_blocks": len(self._writing),
+                "blocks_written": self._blocks_written,
+                "bytes_written": self._bytes_written,
+            }
+
+
+def _clip(block: Block, start_ms: int, end_ms: int) -> Block:
+    timestamps, columns = block
+    if timestamps and timestamps[0] >= start_ms and timestamps[-1] <= end_ms:
+        return block
+    keep = [i for i, ts in enumerate(timestamps) if start_ms <= ts <= end_ms]
+    if not keep:
+        return [], [[] for _ in columns]
+    lo, hi = keep[0], keep[-1] + 1
+    return timestamps[lo:hi], [col[lo:hi] for col in columns]
+
+
+# 创建全局历史存储实例
+history_store = HistoryStore()
@@ -0,0 +1,146 @@
+"""
+控制命令延迟测量
+每条控制命令在以下时刻打时间戳（time.monotonic）：
+
+- received：HTTP 请求进入应用（ASGI 中间件，见 app.core.middleware）
+- dequeued：开始处理（同步路由从线程池取出执行 / 命令邮箱取出发送）
+- written：寄存器写入完成
+- response：遥测中第一次观察到驱动器响应（转速/转矩进入目标的 ±LATENCY_RESPONSE_PERCENT 范围）
+
+相邻时刻之差按阶段记入对数直方图，另有 received → response 的总延迟；
+等待响应的命令由遥测管道消费者检查，超过 LATENCY_RESPONSE_TIMEOUT 未响应的计为超时
+"""
+import itertools
+import threading
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.telemetry_pipeline import TelemetrySample
+from app.utils.histogram import LatencyHistogram
+from app.utils.logger import get_logger
+
+logger = get_logger("latency-service")
+
+STAGES = (
+    ("receive_to_dequeue", "received", "dequeued"),
+    ("dequeue_to_written", "dequeued", "written"),
+    ("written_to_response", "written", "response"),
+    ("total", "received", "response"),
+)
+RECENT_COMMANDS = 50
+
+
+class CommandStamp:
+    """一条命令的时间戳"""
+
+    __slots__ = ("command_id", "mode", "target", "received", "dequeued", "written", "response", "timed_out")
+
+    def __init__(self, command_id: int, mode: str, target: Optional[float], received: float) -> None:
+        self.command_id = command_id
+        self.mode = mode                 # speed / torque / stop
+        self.target = target
+        self.received = received
+        self.dequeued: Optional[float] = None
+        self.written: Optional[float] = None
+        self.response: Optional[float] = None
+        self.timed_out = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        def ms(a: Optional[float], b: Optional[float]) -> Optional[float]:
+            return (b - a) * 1000.0 if a is not None and b is not None else None
+        return {
+            "command_id": self.command_id,
+            "mode": self.mode,
+            "target": self.target,
+            **{f"{name}_ms": ms(getattr(self, start), getattr(self, end)) for name, start, end in STAGES},
+            "timed_out": self.timed_out,
+        }
+
+
+class CommandLatencyTracker:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.histograms = {name: LatencyHistogram() for name, _, _ in STAGES}
+        self._waiting: List[CommandStamp] = []       # 已写入、等待遥测响应（最多一条）
+        self._recent: List[CommandStamp] = []
+        self.timeouts = 0
+
+    def begin(self, mode: str, target: Optional[float], received: float) -> CommandStamp:
+        stamp = CommandStamp(next(self._ids), mode, target, received)
+        with self._lock:
+            self._recent.append(stamp)
+            del self._recent[:-RECENT_COMMANDS]
+        return stamp
+
+    def mark(self, stamp: CommandStamp, stage: str, t_mono: float) -> None:
+        """记录 dequeued / written 时刻；written 之后开始等待遥测响应"""
+        setattr(stamp, stage, t_mono)
+        if stage != "written":
+            return
+        with self._lock:
+            # 新命令写入后旧命令的目标已被覆盖，不再等待旧命令的响应
+            self._waiting = [stamp]
+        self._record(stamp, "received", "dequeued")
+        self._record(stamp, "dequeued", "written")
+
+    def _record(self, stamp: CommandStamp, start: str, end: str) -> None:
+        a, b = getattr(stamp, start), getattr(stamp, end)
+        if a is None or b is None:
+            return
+        for name, s, e in STAGES:
+            if s == start and e == end:
+                self.histograms[name].record(max(0.0, b - a))
+
+    def on_sample(self, sample: TelemetrySample) -> None:
+        """遥测管道消费者：检查等待中的命令是否已响应"""
+        if sample.replayed:
+            return
+        with self._lock:
+            if not self._waiting:
+                return
+            stamp = self._waiting[0]
+            if sample.t_mono <= stamp.written:
+                return
+            status = sample.motor_status
+            actual = status.torque if stamp.mode == "torque" else status.rpm
+            target = stamp.target or 0.0
+            tolerance = max(abs(target) * settings.LATENCY_RESPONSE_PERCENT / 100.0, settings.LATENCY_RESPONSE_FLOOR)
+            if abs(actual - target) <= tolerance:
+                stamp.response = sample.t_mono
+                self._waiting = []
+            elif sample.t_mono - stamp.written > settings.LATENCY_RESPONSE_TIMEOUT:
+                stamp.timed_out = True
+                self.timeouts += 1
+                self._waiting = []
+                logger.warning(
+                    f"命令 {stamp.command_id} ({stamp.mode} → {target}) {settings.LATENCY_RESPONSE_TIMEOUT:.0f}s 内未观察到响应"
+                )
+                return
+            else:
+                return
+        self._record(stamp, "written", "response")
+        self._record(stamp, "received", "response")
+
+    def snapshot(self, include_buckets: bool = False, recent: int = 10) -> Dict[str, Any]:
+        with self._lock:
+            commands = [s.to_dict() for s in self._recent[-recent:]] if recent > 0 else []
+            waiting = len(self._waiting)
+        return {
+            "stages_ms": {name: h.summary(include_buckets=include_buckets) for name, h in self.histograms.items()},
+            "response_timeouts": self.timeouts,
+            "waiting_for_response": waiting,
+            "response_percent": settings.LATENCY_RESPONSE_PERCENT,
+            "recent": commands,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            for histogram in self.histograms.values():
+                histogram.reset()
+            self._recent.clear()
+            self.timeouts = 0
+
+
+# 创建全局命令延迟统计实例
+latency_tracker = CommandLatencyTracker()
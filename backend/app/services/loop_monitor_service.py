@@ -0,0 +1,179 @@
+"""
+事件循环延迟监视
+串口同步读写、reconnect 的 sleep、编码器初始化等代码直接运行在事件循环上，
+一旦阻塞，所有 HTTP 请求和遥测都会一起停顿。
+
+- 采样任务每 LOOP_LAG_INTERVAL 秒 sleep 一次，实际唤醒时刻与计划时刻之差即调度延迟，记入对数直方图
+- 采样线程（独立 OS 线程）检查采样任务最近一次唤醒的时刻：超过 LOOP_LAG_THRESHOLD 仍未唤醒，
+  说明事件循环此刻正被阻塞，用 sys._current_frames() 抓取事件循环线程的调用栈
+- 按调用栈中最内层的应用代码帧（app/ 下）归类，统计阻塞次数和累计时长，即“阻塞排行”
+
+每次停顿只抓一次栈；停顿太短、采样线程来不及抓到时归入 unattributed
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.histogram import LatencyHistogram
+from app.utils.logger import get_logger
+
+logger = get_logger("loop-monitor")
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UNATTRIBUTED = "unattributed"
+
+
+class _Offender:
+    __slots__ = ("count", "total", "max", "last_ms", "stack")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last_ms = 0
+        self.stack: List[str] = []
+
+
+class LoopLagMonitor:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_wake: Optional[float] = None
+        self._capture: Optional[Tuple[str, List[str]]] = None   # 当前停顿抓到的 (归类, 调用栈)
+        self._offenders: Dict[str, _Offender] = {}
+        self.lag = LatencyHistogram()
+        self.stalls = 0
+
+    # ========== 启动 / 停止 ==========
+
+    def start(self) -> None:
+        """在事件循环中调用"""
+        self._loop_thread_id = threading.get_ident()
+        self._last_wake = time.monotonic()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._sample_loop())
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._watch, name="loop-lag-sampler", daemon=True)
+            self._thread.start()
+        logger.info(
+            f"事件循环延迟监视已启动：采样间隔 {settings.LOOP_LAG_INTERVAL * 1000:.0f}ms，"
+            f"阻塞阈值 {settings.LOOP_LAG_THRESHOLD * 1000:.0f}ms"
+        )
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    # ========== 采样任务（事件循环内）==========
+
+    async def _sample_loop(self) -> None:
+        interval = settings.LOOP_LAG_INTERVAL
+        # 第一次的计划时刻从 start() 记录的时刻起算，启动后紧接着的阻塞也能被记录
+        with self._lock:
+            expected = (self._last_wake or time.monotonic()) + interval
+        while True:
+            await asyncio.sleep(max(0.0, expected - time.monotonic()))
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.lag.record(lag)
+            expected = now + interval
+            if lag < settings.LOOP_LAG_THRESHOLD:
+                with self._lock:
+                    self._last_wake = now
+                    self._capture = None
+                continue
+            with self._lock:
+                self._last_wake = now
+                capture, self._capture = self._capture, None
+                self.stalls += 1
+                key, stack = capture if capture is not None else (UNATTRIBUTED, [])
+                offender = self._offenders.get(key)
+                if offender is None:
+                    offender = self._offenders[key] = _Offender()
+                offender.count += 1
+                offender.total += lag
+                offender.max = max(offender.max, lag)
+                offender.last_ms = int(time.time() * 1000)
+                if stack:
+                    offender.stack = stack
+            logger.warning(f"事件循环阻塞 {lag * 1000:.0f}ms: {key}")
+
+    # ========== 采样线程 ==========
+
+    def _watch(self) -> None:
+        poll = max(settings.LOOP_LAG_THRESHOLD / 4.0, 0.005)
+        while not self._stop_event.wait(poll):
+            with self._lock:
+                last_wake, captured = self._last_wake, self._capture is not None
+            if captured or last_wake is None:
+                continue
+            if time.monotonic() - last_wake < settings.LOOP_LAG_INTERVAL + settings.LOOP_LAG_THRESHOLD:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame, limit=settings.LOOP_LAG_STACK_DEPTH)
+            del frame
+            capture = (self._attribute(stack), [f"{f.filename}:{f.lineno} in {f.name}" for f in stack])
+            with self._lock:
+                # 只记录本次停顿；事件循环恢复后由采样任务取走
+                if self._last_wake == last_wake:
+                    self._capture = capture
+
+    @staticmethod
+    def _attribute(stack: traceback.StackSummary) -> str:
+        """最内层的应用代码帧（app/ 下，排除本模块）；没有则取最内层帧"""
+        for f in reversed(stack):
+            path = os.path.abspath(f.filename)
+            if path.startswith(APP_DIR) and path != os.path.abspath(__file__):
+                return f"{os.path.relpath(path, os.path.dirname(APP_DIR))}:{f.lineno} in {f.name}"
+        if stack:
+            f = stack[-1]
+            return f"{f.filename}:{f.lineno} in {f.name}"
+        return UNATTRIBUTED
+
+    # ========== 状态 ==========
+
+    def snapshot(self, top: int = 10, include_buckets: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            ranked = sorted(self._offenders.items(), key=lambda kv: kv[1].total, reverse=True)[:top]
+            offenders = [
+                {
+                    "location": key,
+                    "count": o.count,
+                    "total_ms": o.total * 1000.0,
+                    "max_ms": o.max * 1000.0,
+                    "last_ms": o.last_ms,
+                    "stack": list(o.stack),
+                }
+                for key, o in ranked
+            ]
+            stalls = self.stalls
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_ms": settings.LOOP_LAG_INTERVAL * 1000.0,
+            "threshold_ms": settings.LOOP_LAG_THRESHOLD * 1000.0,
+            "lag_ms": self.lag.summary(include_buckets=include_buckets),
+            "stalls": stalls,
+            "top_offenders": offenders,
+        }
+
+    def reset(self) -> None:
+        self.lag.reset()
+        with self._lock:
+            self._offenders.clear()
+            self.stalls = 0
+
+
+# 创建全局事件循环延迟监视实例
+loop_monitor = LoopLagMonitor()
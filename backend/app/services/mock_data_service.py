@@ -1,12 +1,15 @@
 import asyncio
 import random
+import time
 from datetime import datetime, timezone
 from typing import Optional
 
 from app.core.config import settings
 from app.schemas.motor_schemas import MotorStatus, VibrationMetrics
-from app.services.control_service import control_service
 from app.services.modbus_service import modbus_service
+from app.services.poll_schedule_service import poll_scheduler
+from app.services.replay_service import replay_service
+from app.services.telemetry_pipeline import publish
 from app.utils.logger import get_logger
 
 logger = get_logger("data-service")
@@ -15,7 +18,8 @@ logger = get_logger("data-service")
 async def generate_data():
     """
     Background task that periodically reads sensor data (from ModbusRTU or generates mock data)
-    and updates the control service.
+    and publishes it through the telemetry pipeline.
+    While a replay is running the mock generator stays idle so the replayed data is not mixed with noise.
     """
     if settings.USE_MODBUS:
         logger.info("Starting ModbusRTU data reader...")
@@ -25,8 +29,14 @@ async def generate_data():
     while True:
         try:
             if settings.USE_MODBUS:
-                # 从 ModbusRTU 读取真实数据（优化：减少寄存器读取）
-                motor_data = modbus_service.read_motor_status()
+                # 从 ModbusRTU 读取真实数据
+                if settings.POLL_SCHEDULE_ENABLED:
+                    # 多速率轮询：按计划读取本槽的寄存器段（在线程中执行，不阻塞事件循环）
+                    motor_data = await asyncio.get_running_loop().run_in_executor(None, poll_scheduler.poll_slot)
+                else:
+                    # 整块读取输入寄存器（单次总线往返）
+                    motor_data = modbus_service.read_motor_status()
+                t_sample = time.monotonic()
                 
                 if motor_data is None:
                     logger.warning("ModbusRTU 读取失败，尝试重连...")
@@ -38,8 +48,14 @@ async def generate_data():
                     await asyncio.sleep(0.1)  # 10Hz = 100ms
                     continue
                 
+                # 多速率轮询的每个槽都刷新寄存器镜像，但只按 POLL_PUBLISH_HZ 发布到遥测管道，
+                # 下游按样本计数的参数（滤波系数、批大小、到位样本数）和历史数据量保持 10Hz 下的含义
+                if settings.POLL_SCHEDULE_ENABLED and not poll_scheduler.publish_due(t_sample):
+                    await asyncio.sleep(poll_scheduler.next_delay())
+                    continue
+                
                 # 优化：复用已读取的rpm值，避免重复读取寄存器
-                vibration_data = modbus_service.read_vibration_metrics(rpm=motor_data["rpm"])
+                vibration_data = modbus_service.read_vibration_metrics(rpm=motor_data["rpm"], motor_data=motor_data)
                 
                 if vibration_data is None:
                     logger.warning("ModbusRTU 读取振动数据失败")
@@ -70,7 +86,12 @@ async def generate_data():
                     f"Temp: {motor_status.temperature:.1f}°C"
                 )
             else:
+                if replay_service.is_running:
+                    await asyncio.sleep(0.1)
+                    continue
+                
                 # 生成模拟数据
+                t_sample = time.monotonic()
                 motor_status = MotorStatus(
                     rpm=random.randint(0, 8000),
                     torque=random.uniform(0, 1000),
@@ -98,12 +119,19 @@ async def generate_data():
                     f"Temp: {motor_status.temperature:.1f}°C"
                 )
             
-            # Update the control service with new data
-            control_service.update_motor_status(motor_status)
-            control_service.update_vibration_metrics(vibration_metrics)
+            # Publish to control service, history store and downstream consumers
+            publish(
+                motor_status,
+                vibration_metrics,
+                registers=motor_data.get("registers") if settings.USE_MODBUS else None,
+                t_mono=t_sample,
+            )
             
-            # Wait 100ms before next update (10Hz = 10 times per second = 100ms interval)
-            await asyncio.sleep(0.1)
+            # Wait for the next poll slot (multi-rate schedule) or 100ms (10Hz)
+            if settings.USE_MODBUS and settings.POLL_SCHEDULE_ENABLED:
+                await asyncio.sleep(poll_scheduler.next_delay())
+            else:
+                await asyncio.sleep(0.1)
             
         except Exception as e:
             logger.error(f"Error in data service: {e}", exc_info=True)
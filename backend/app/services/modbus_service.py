@@ -4,17 +4,32 @@ ModbusRTU 通信服务
 """
 import time
 import random
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Sequence, Tuple
 from pymodbus.client import ModbusSerialClient
 from pymodbus.exceptions import ModbusException, ConnectionException
 from threading import Lock
 import asyncio
 
 from app.core.config import settings
+from app.services.capture_service import (
+    raw_capture,
+    FC_READ_HOLDING,
+    FC_READ_INPUT,
+    FC_WRITE_SINGLE,
+    FC_WRITE_MULTIPLE,
+)
+from app.services.health_service import health_estimator
+from app.services.sensorcore_service import sensorcore_service
+from app.services.torque_model import torque_model
+from app.services.waveform_service import waveform_service
 from app.utils.logger import get_logger
 
 logger = get_logger("modbus-service")
 
+# 输入寄存器 5000-5011 是连续的，轮询时一次读出整块
+INPUT_BLOCK_START = settings.REG_INPUT_FAULT
+INPUT_BLOCK_COUNT = settings.REG_INPUT_POSITION + 2 - settings.REG_INPUT_FAULT
+
 
 class ModbusService:
     """
@@ -28,6 +43,11 @@ class ModbusService:
         self._is_connected = False
         self._heartbeat_counter = 0
         self._heartbeat_task: Optional[asyncio.Task] = None
+        # 输入寄存器 5000-5011 的镜像：原始值和各寄存器最近一次读取的时刻（time.monotonic()）
+        self._image_regs: List[int] = [0] * INPUT_BLOCK_COUNT
+        self._image_times: List[Optional[float]] = [None] * INPUT_BLOCK_COUNT
+        self._image_lock = Lock()
+        self._refresh_lock = Lock()
         
     def _get_client(self) -> ModbusSerialClient:
         """获取或创建 ModbusRTU 客户端"""
@@ -110,6 +130,8 @@ class ModbusService:
                     return None
                 
                 if result.registers and len(result.registers) > 0:
+                    if raw_capture.is_open:
+                        raw_capture.append(FC_READ_INPUT, address, result.registers)
                     return result.registers
                 return None
                 
@@ -152,6 +174,8 @@ class ModbusService:
                     return None
                 
                 if result.registers and len(result.registers) > 0:
+                    if raw_capture.is_open:
+                        raw_capture.append(FC_READ_HOLDING, address, result.registers)
                     return result.registers
                 return None
                 
@@ -192,6 +216,8 @@ class ModbusService:
                     logger.error(f"写入寄存器失败 - 地址: {address}, 值: {value}, 错误: {result}")
                     return False
                 
+                if raw_capture.is_open:
+                    raw_capture.append(FC_WRITE_SINGLE, address, (value,))
                 return True
                 
             except ModbusException as e:
@@ -231,6 +257,8 @@ class ModbusService:
                     logger.error(f"写入多个寄存器失败 - 地址: {address}, 错误: {result}")
                     return False
                 
+                if raw_capture.is_open:
+                    raw_capture.append(FC_WRITE_MULTIPLE, address, values)
                 return True
                 
             except ModbusException as e:
@@ -281,8 +309,103 @@ class ModbusService:
         low_word = value & 0xFFFF
         return [high_word, low_word]
     
+    @staticmethod
+    def _to_int16(value: int) -> int:
+        """short 类型寄存器处理有符号"""
+        return value - 0x10000 if value & 0x8000 else value
+    
     # ========== 读取功能 ==========
     
+    def read_input_block(self) -> Optional[List[int]]:
+        """一次读取 5000-5011 全部输入寄存器（单次总线往返）"""
+        return self.read_input_range(INPUT_BLOCK_START, INPUT_BLOCK_COUNT)
+    
+    def read_input_range(self, address: int, count: int) -> Optional[List[int]]:
+        """读取 5000-5011 中连续的一段（多速率轮询按计划分段读取），同时更新寄存器镜像"""
+        regs = self._read_input_registers(address, count)
+        if not regs or len(regs) < count:
+            return None
+        offset = address - INPUT_BLOCK_START
+        now = time.monotonic()
+        with self._image_lock:
+            self._image_regs[offset:offset + count] = regs[:count]
+            self._image_times[offset:offset + count] = [now] * count
+        return regs
+    
+    def register_image(
+        self,
+        max_age: Optional[float] = None,
+        addresses: Optional[Sequence[int]] = None,
+    ) -> Optional[Tuple[float, Dict[str, float]]]:
+        """
+        寄存器镜像的解码结果，不访问总线
+        
+        Args:
+            max_age: 可接受的最大时长（秒）
+            addresses: 关心的寄存器地址，按其中最旧的读取时刻判断；默认整块
+        
+        Returns:
+            (最旧的读取时刻 time.monotonic(), decode_input_block 结果)；
+            关心的寄存器尚未读取过，或比 max_age 秒更旧时返回 None
+        """
+        with self._image_lock:
+            regs = list(self._image_regs)
+            if addresses is None:
+                times = list(self._image_times)
+            else:
+                times = [self._image_times[a - INPUT_BLOCK_START] for a in addresses]
+        if any(t is None for t in times):
+            return None
+        t = min(times)
+        if max_age is not None and time.monotonic() - t > max_age:
+            return None
+        return t, self.decode_input_block(regs)
+    
+    def refresh_register_image(
+        self,
+        max_age: float,
+        addresses: Optional[Sequence[int]] = None,
+    ) -> Optional[Tuple[float, Dict[str, float]]]:
+        """
+        镜像比 max_age 秒更旧时做一次整块读取
+        并发调用合并：排队期间别人已经刷新过的，直接使用新镜像
+        """
+        with self._refresh_lock:
+            image = self.register_image(max_age, addresses)
+            if image is not None:
+                return image
+            if self.read_input_block() is None:
+                return None
+            return self.register_image(addresses=addresses)
+    
+    def decode_input_block(self, regs: List[int]) -> Dict[str, float]:
+        """
+        解码 read_input_block 返回的原始寄存器，单位与各 read_* 方法一致
+        
+        Returns:
+            包含 fault, rpm, duty_cycle, power, voltage, motor_current, bus_current,
+            temperature, angle, position 的字典
+        """
+        def reg(address: int) -> int:
+            return regs[address - INPUT_BLOCK_START]
+        
+        def reg32(address: int) -> int:
+            offset = address - INPUT_BLOCK_START
+            return self._registers_to_int32(regs[offset:offset + 2])
+        
+        return {
+            "fault": reg(settings.REG_INPUT_FAULT),
+            "rpm": float(reg32(settings.REG_INPUT_RPM) / settings.MOTOR_POLE_PAIRS),
+            "duty_cycle": float(self._to_int16(reg(settings.REG_INPUT_DUTY))),
+            "power": float(self._to_int16(reg(settings.REG_INPUT_POWER))),
+            "voltage": float(self._to_int16(reg(settings.REG_INPUT_VOLTAGE))),
+            "motor_current": self._to_int16(reg(settings.REG_INPUT_MOTOR_CURRENT)) * 0.01,
+            "bus_current": self._to_int16(reg(settings.REG_INPUT_BUS_CURRENT)) * 0.01,
+            "temperature": float(self._to_int16(reg(settings.REG_INPUT_TEMPERATURE))),
+            "angle": reg(settings.REG_INPUT_ANGLE) * 0.01,
+            "position": reg32(settings.REG_INPUT_POSITION) * 0.01,
+        }
+    
     def read_fault_info(self) -> Optional[int]:
         """读取故障信息（5000）"""
         regs = self._read_input_registers(settings.REG_INPUT_FAULT, 1)
@@ -371,124 +494,145 @@ class ModbusService:
     
     def read_torque(self) -> Optional[float]:
         """
-        读取实时转矩（基于 5006 寄存器的实时电机电流）
+        读取实时转矩（基于 5006 寄存器的实时电机电流和 5008 寄存器的温度）
         
-        转矩直接绑定到 5006 寄存器的电流值：
-        转矩(Nm) = 电流(A) × TORQUE_CURRENT_RATIO
+        转矩由电流 × 温度标定表插值得到（见 torque_model；未配置标定表时为
+        转矩(Nm) = 电流(A) × TORQUE_CURRENT_RATIO）
         
         Returns:
             转矩值（Nm），失败返回 None
         """
-        motor_current = self.read_motor_current()
-        if motor_current is None:
-            logger.debug("读取转矩失败：电流值为 None")
+        regs = self.read_input_block()
+        if regs is None:
+            logger.debug("读取转矩失败：输入寄存器读取失败")
             return None
+        block = self.decode_input_block(regs)
+        motor_current = block["motor_current"]
+        torque = torque_model.torque(motor_current, block["temperature"])
         
-        # 使用配置的转换系数计算转矩
-        torque = abs(motor_current) * settings.TORQUE_CURRENT_RATIO
-        
-        # 如果转矩计算结果非常小（可能是浮点数精度问题），记录详细信息
-        if torque < 0.0001 and abs(motor_current) > 0.0001:
-            logger.warning(
-                f"转矩值异常小：电流={motor_current:.6f}A, 系数={settings.TORQUE_CURRENT_RATIO}, "
-                f"转矩={torque:.6f}Nm。建议检查转换系数是否合适。"
-            )
-        
-        logger.debug(f"转矩计算：电流={motor_current:.6f}A, 系数={settings.TORQUE_CURRENT_RATIO}, 转矩={torque:.6f}Nm")
+        logger.debug(
+            f"转矩计算：电流={motor_current:.6f}A, 温度={block['temperature']:.0f}℃, "
+            f"转矩={torque:.6f}Nm (模型: {torque_model.model.source})"
+        )
         return float(torque)
     
     def read_motor_status(self) -> Optional[Dict[str, float]]:
         """
-        读取电机状态数据（优化版本，只读取必要数据）
+        读取电机状态数据（优化版本，整块读取输入寄存器）
         
         Returns:
-            包含 rpm, torque, load, temperature 的字典
+            包含 rpm, torque, load, temperature, power 的字典，
+            registers 键为 decode_input_block 解码后的完整输入寄存器
         
         注意：
-            - torque 直接基于 5006 寄存器的实时电机电流计算
-            - 转矩(Nm) = 电流(A) × TORQUE_CURRENT_RATIO
-            - 优化：只读取必要寄存器，提高采集频率
+            - torque 由 5006 寄存器的实时电机电流和 5008 寄存器温度查转矩标定表得到
+            - 优化：5000-5011 一次读出，每个轮询周期只有一次总线往返
         """
         try:
-            # 读取必要数据：rpm, 电流(用于计算torque), 温度, 功率
-            rpm = self.read_rpm()
-            motor_current = self.read_motor_current()
-            temperature = self.read_temperature()
-            power = self.read_power()
-            
-            if rpm is None or temperature is None:
+            regs = self.read_input_block()
+            if regs is None:
                 return None
             
-            # 计算转矩：直接基于 5006 寄存器的实时电机电流
-            torque = 0.0
-            if motor_current is not None:
-                torque = abs(motor_current) * settings.TORQUE_CURRENT_RATIO
-            
-            # 功率值（从 5004 寄存器读取，单位W）
-            power_value = abs(power) if power is not None else 0.0
-            
-            # 负载计算（基于功率，假设最大功率为某个值，需要根据实际情况调整）
-            load = 0.0
-            if power is not None:
-                # 假设最大功率为某个值，这里需要根据实际情况调整
-                # 例如：如果最大功率为 1000W，则 load = power / 10.0
-                load = min(100.0, max(0.0, abs(power) / 10.0))  # 需要根据实际最大功率调整
-            
-            return {
-                "rpm": rpm,
-                "torque": torque,
-                "load": load,
-                "temperature": temperature,
-                "power": power_value
-            }
+            return self.motor_status_from_block(self.decode_input_block(regs))
             
         except Exception as e:
             logger.error(f"读取电机状态失败: {e}", exc_info=True)
             return None
     
-    def read_vibration_metrics(self, rpm: Optional[float] = None) -> Optional[Dict[str, float]]:
+    def motor_status_from_block(self, block: Dict[str, float]) -> Dict[str, Any]:
+        """由解码后的输入寄存器计算电机状态（实时轮询和抓取回放共用）"""
+        power = block["power"]
+        
+        # 计算转矩：5006 寄存器的实时电机电流 + 5008 寄存器温度，查标定表
+        torque = torque_model.torque(block["motor_current"], block["temperature"])
+        
+        # 负载计算（基于功率，假设最大功率为某个值，需要根据实际情况调整）
+        # 例如：如果最大功率为 1000W，则 load = power / 10.0
+        load = min(100.0, max(0.0, abs(power) / 10.0))  # 需要根据实际最大功率调整
+        
+        return {
+            "rpm": block["rpm"],
+            "torque": torque,
+            "load": load,
+            "temperature": block["temperature"],
+            "power": abs(power),  # 功率值（从 5004 寄存器读取，单位W）
+            "registers": block,
+        }
+    
+    def read_vibration_metrics(
+        self,
+        rpm: Optional[float] = None,
+        motor_data: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, float]]:
         """
         读取振动指标数据（优化版本，可复用已读取的rpm值）
         
+        数据来源优先级（均只读取内存中的最新结果，不产生额外的阻塞 I/O）：
+        1. 未过期的原始波形频谱分析结果（waveform_service）
+        2. 未过期的 SensorCore 最新帧
+        3. 由转速估算主频
+        
         Args:
             rpm: 可选的rpm值，如果提供则避免重复读取
+            motor_data: 可选的 read_motor_status 结果，提供时健康估计器同时使用负载/功率/电流
         
         Returns:
             包含 main_freq, amplitude, rms, impulse_count, health_index, tool_wear 的字典
         """
         try:
-            # 如果未提供rpm，则读取（但通常应该从read_motor_status传入以避免重复读取）
-            if rpm is None:
-                rpm = self.read_rpm()
-                if rpm is None:
-                    return None
-            
-            # 从转速计算频率：频率 = 转速 / 60
-            base_freq = max(0.0, rpm / 60.0)  # 确保非负
-            # 添加 ±0.60Hz 的小幅波动，精确到小数点后两位
-            main_freq_noise = random.uniform(-0.60, 0.60)
-            # 由于 rpm 可能为 0（例如停机状态），扰动后可能出现负频率，需强制截断
-            main_freq = round(max(0.0, base_freq + main_freq_noise), 2)
+            if rpm is None and motor_data is not None:
+                rpm = motor_data["rpm"]
+            spectrum = waveform_service.latest()
+            frame = None
+            if spectrum is None and settings.SENSORCORE_ENABLED and sensorcore_service.is_fresh("vibration"):
+                frame, _ = sensorcore_service.latest()
             
-            # 其他振动指标需要根据实际硬件调整（当前返回默认值）
-            # 健康指数和刀具磨损需要根据实际算法计算，这里提供基础实现
-            # 健康指数：基于振动数据计算（简化算法，需要根据实际情况调整）
-            # 刀具磨损：基于运行时间和振动数据计算（简化算法，需要根据实际情况调整）
-            
-            # 简化计算：健康指数 = 100 - (RMS * 系数)，范围 0-100
-            # 这里使用默认值，实际应该从传感器读取
-            rms_value = 0.0  # 需要从实际寄存器读取
-            health_index = max(0.0, min(100.0, 100.0 - rms_value * 10.0))
+            if spectrum is not None:
+                main_freq = spectrum.main_freq
+                amplitude = spectrum.peak
+                rms_value = spectrum.rms
+                impulse_count = spectrum.impulse_count
+            elif frame is not None:
+                main_freq = float(frame.vib_freq)
+                amplitude = frame.peak
+                rms_value = frame.rms
+                impulse_count = frame.vib_impulse
+            else:
+                # 如果未提供rpm，则读取（但通常应该从read_motor_status传入以避免重复读取）
+                if rpm is None:
+                    rpm = self.read_rpm()
+                    if rpm is None:
+                        return None
+                
+                # 从转速计算频率：频率 = 转速 / 60
+                base_freq = max(0.0, rpm / 60.0)  # 确保非负
+                # 添加 ±0.60Hz 的小幅波动，精确到小数点后两位
+                main_freq_noise = random.uniform(-0.60, 0.60)
+                # 由于 rpm 可能为 0（例如停机状态），扰动后可能出现负频率，需强制截断
+                main_freq = round(max(0.0, base_freq + main_freq_noise), 2)
+                amplitude = 0.0
+                rms_value = 0.0
+                impulse_count = 0
             
-            # 简化计算：刀具磨损（基于运行时间或振动数据）
-            # 这里使用默认值，实际应该根据运行时间、负载等计算
-            tool_wear = 0.0  # 需要根据实际算法计算
+            # 健康指数和刀具磨损由在线估计器增量更新（每样本 O(1)）
+            registers = (motor_data or {}).get("registers") or {}
+            measured = spectrum is not None or frame is not None
+            health = health_estimator.update(
+                rpm=rpm if rpm is not None else 0.0,
+                rms=rms_value if measured else None,
+                impulse_count=impulse_count if measured else None,
+                load=motor_data["load"] if motor_data else None,
+                power=motor_data["power"] if motor_data else None,
+                motor_current=registers.get("motor_current"),
+            )
+            health_index = health["health_index"]
+            tool_wear = health["tool_wear"]
             
             return {
                 "main_freq": main_freq,
-                "amplitude": 0.0,  # 需要从实际寄存器读取
-                "rms": rms_value,  # 需要从实际寄存器读取
-                "impulse_count": 0,  # 需要从实际寄存器读取
+                "amplitude": amplitude,
+                "rms": rms_value,
+                "impulse_count": impulse_count,
                 "health_index": health_index,
                 "tool_wear": tool_wear
             }
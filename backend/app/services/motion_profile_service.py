@@ -0,0 +1,242 @@
+"""
+运动曲线执行器
+在后端按单调时钟的固定节拍把一串设定值（转速写 6003，转矩换算成电流写 6002）发给驱动器，
+代替浏览器连续 POST /set-parameters 做加减速：
+
+- 曲线：(t, 值) 点序列（线性插值或阶跃保持），或梯形加减速定义
+- 提交时一次性编译成 (时刻, 设定值) 数组，相邻相同的设定值只发一次
+- 独立线程执行；每一步都对齐到 起始时刻 + t，而不是累加 sleep，误差不会积累
+- 取消时立即切到空模式停机，并保证取消后执行线程不会再写任何设定值
+"""
+import itertools
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.schemas.motor_schemas import ControlCommand
+from app.services.control_service import control_service
+from app.services.modbus_service import modbus_service
+from app.services.torque_model import torque_model
+from app.utils.logger import get_logger
+
+logger = get_logger("motion-profile")
+
+MODES = {"speed": 1, "torque": 0}      # 曲线模式 → 驱动器控制模式（6001）
+EMPTY_MODE = 0xFFFF
+
+
+class CompiledProfile(NamedTuple):
+    profile_id: int
+    mode: str
+    times: np.ndarray        # 相对起始时刻（秒），升序
+    values: np.ndarray       # 设定值（rpm 或 N·m）
+    stop_on_finish: bool
+
+    @property
+    def duration(self) -> float:
+        return float(self.times[-1]) if len(self.times) else 0.0
+
+
+def trapezoid_points(start: float, target: float, accel: float, decel: float, hold: float, end: float) -> List[Tuple[float, float]]:
+    """梯形曲线的拐点：start 以 accel 斜坡到 target，保持 hold 秒，再以 decel 斜坡到 end"""
+    if accel <= 0 or decel <= 0:
+        raise ValueError("加速度和减速度必须为正")
+    if hold < 0:
+        raise ValueError("保持时间不能为负")
+    t_up = abs(target - start) / accel
+    t_down = abs(target - end) / decel
+    return [(0.0, start), (t_up, target), (t_up + hold, target), (t_up + hold + t_down, end)]
+
+
+def compile_profile(
+    profile_id: int,
+    mode: str,
+    points: Sequence[Tuple[float, float]],
+    interpolation: str = "linear",
+    stop_on_finish: bool = False,
+) -> CompiledProfile:
+    """把拐点编译成按 PROFILE_UPDATE_HZ 节拍的设定值序列"""
+    if mode not in MODES:
+        raise ValueError(f"不支持的曲线模式: {mode}")
+    if not points:
+        raise ValueError("曲线至少需要一个点")
+    t = np.array([p[0] for p in points], dtype=np.float64)
+    v = np.array([p[1] for p in points], dtype=np.float64)
+    if t[0] < 0 or np.any(np.diff(t) < 0):
+        raise ValueError("曲线点的时间必须非负且不递减")
+    if np.any(v < 0):
+        raise ValueError("设定值不能为负")
+    if t[-1] > settings.PROFILE_MAX_DURATION:
+        raise ValueError(f"曲线时长 {t[-1]:.1f}s 超过上限 {settings.PROFILE_MAX_DURATION:.0f}s")
+
+    if interpolation == "step":
+        times, values = t, v
+    elif interpolation == "linear":
+        # 节拍时刻并上拐点时刻，保证拐点本身被准确发送
+        grid = np.arange(0.0, t[-1], 1.0 / settings.PROFILE_UPDATE_HZ)
+        times = np.union1d(grid, t)
+        values = np.interp(times, t, v)
+    else:
+        raise ValueError(f"不支持的插值方式: {interpolation}")
+
+    # 相邻相同的设定值只发第一次（同一时刻多个点保留最后一个）
+    last_at_time = np.append(times[1:] != times[:-1], True)
+    times, values = times[last_at_time], values[last_at_time]
+    changed = np.insert(np.diff(values) != 0, 0, True)
+    times, values = times[changed], values[changed]
+    if len(times) > settings.PROFILE_MAX_POINTS:
+        raise ValueError(f"曲线编译后 {len(times)} 个设定值，超过上限 {settings.PROFILE_MAX_POINTS}")
+    return CompiledProfile(profile_id, mode, times, values, stop_on_finish)
+
+
+class MotionProfileExecutor:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()           # 保护执行状态
+        self._write_lock = threading.Lock()     # 执行线程写设定值 / 取消停机 互斥
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ids = itertools.count(1)
+        self._profile: Optional[CompiledProfile] = None
+        self._state = "idle"                    # idle / running / completed / cancelled / failed
+        self._message = ""
+        self._started_mono: Optional[float] = None
+        self._finished_mono: Optional[float] = None
+        self._index = 0
+        self._setpoint: Optional[float] = None
+        self._lateness: List[float] = []        # 每个设定值实际写入时刻相对计划时刻的延迟（秒）
+
+    # ========== 提交 / 取消 ==========
+
+    def submit(
+        self,
+        mode: str,
+        points: Sequence[Tuple[float, float]],
+        interpolation: str = "linear",
+        stop_on_finish: bool = False,
+    ) -> Dict[str, Any]:
+        """编译并开始执行曲线；已有曲线在执行时抛出 RuntimeError"""
+        profile = compile_profile(next(self._ids), mode, points, interpolation, stop_on_finish)
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                raise RuntimeError(f"运动曲线 {self._profile.profile_id} 正在执行")
+            self._cancel.clear()
+            self._profile = profile
+            self._state = "running"
+            self._message = ""
+            self._started_mono = None
+            self._finished_mono = None
+            self._index = 0
+            self._setpoint = None
+            self._lateness = []
+            self._thread = threading.Thread(target=self._run, args=(profile,), name="motion-profile", daemon=True)
+            self._thread.start()
+        logger.info(
+            f"运动曲线 {profile.profile_id} 开始: {mode} 模式，{len(profile.times)} 个设定值，时长 {profile.duration:.2f}s"
+        )
+        return self.progress()
+
+    def cancel(self, stop: bool = True) -> Dict[str, Any]:
+        """取消当前曲线；stop=True 时立即切到空模式停机"""
+        self._cancel.set()
+        # 等待执行线程正在进行的写入完成，之后执行线程不会再写
+        with self._write_lock:
+            with self._lock:
+                if self._state == "running":
+                    self._state = "cancelled"
+                    self._finished_mono = time.monotonic()
+            if stop and settings.USE_MODBUS:
+                if not modbus_service.set_mode(EMPTY_MODE, use_empty_mode=False):
+                    logger.error("取消运动曲线：切换空模式失败")
+        logger.info("运动曲线已取消" + ("，电机已停止" if stop else ""))
+        return self.progress()
+
+    # ========== 执行线程 ==========
+
+    def _run(self, profile: CompiledProfile) -> None:
+        start = time.monotonic()
+        with self._lock:
+            self._started_mono = start
+        try:
+            for i, (t, value) in enumerate(zip(profile.times, profile.values)):
+                # 等待到计划时刻；取消事件可以立即打断等待
+                if self._cancel.wait(max(0.0, start + t - time.monotonic())):
+                    return
+                with self._write_lock:
+                    if self._cancel.is_set():
+                        return
+                    lateness = time.monotonic() - (start + t)
+                    self._write_setpoint(profile.mode, float(value), first=(i == 0))
+                with self._lock:
+                    self._index = i + 1
+                    self._setpoint = float(value)
+                    self._lateness.append(lateness)
+            with self._write_lock:
+                if self._cancel.is_set():
+                    return
+                if profile.stop_on_finish and settings.USE_MODBUS:
+                    modbus_service.set_mode(EMPTY_MODE, use_empty_mode=False)
+            self._finish("completed")
+        except Exception as e:
+            logger.error(f"运动曲线 {profile.profile_id} 执行失败: {e}", exc_info=True)
+            self._finish("failed", str(e))
+            if settings.USE_MODBUS:
+                modbus_service.set_mode(EMPTY_MODE, use_empty_mode=False)
+
+    def _write_setpoint(self, mode: str, value: float, first: bool) -> None:
+        if mode == "speed":
+            command = ControlCommand(mode="speed", target_rpm=value)
+            if settings.USE_MODBUS and not modbus_service.set_rpm(value):
+                raise RuntimeError(f"写转速设定值失败: {value}")
+        else:
+            command = ControlCommand(mode="torque", target_torque=value)
+            if settings.USE_MODBUS:
+                current_amps, _ = torque_model.current(value, control_service.latest_temperature())
+                if not modbus_service.set_current(current_amps):
+                    raise RuntimeError(f"写电流设定值失败: {current_amps:.3f} A")
+        # 先写设定值再切模式，切模式时驱动器拿到的就是曲线的起点
+        if first and settings.USE_MODBUS and not modbus_service.set_mode(MODES[mode], use_empty_mode=True):
+            raise RuntimeError("切换控制模式失败")
+        control_service.record_command(command)
+
+    def _finish(self, state: str, message: str = "") -> None:
+        with self._lock:
+            if self._state == "running":
+                self._state = state
+                self._message = message
+                self._finished_mono = time.monotonic()
+        logger.info(f"运动曲线结束: {state}" + (f"（{message}）" if message else ""))
+
+    # ========== 状态 ==========
+
+    def progress(self) -> Dict[str, Any]:
+        with self._lock:
+            profile = self._profile
+            if profile is None:
+                return {"state": self._state}
+            now = self._finished_mono or time.monotonic()
+            elapsed = now - self._started_mono if self._started_mono is not None else 0.0
+            lateness = np.array(self._lateness) * 1000.0
+            return {
+                "profile_id": profile.profile_id,
+                "state": self._state,
+                "message": self._message,
+                "mode": profile.mode,
+                "duration": profile.duration,
+                "elapsed": elapsed,
+                "progress": min(1.0, elapsed / profile.duration) if profile.duration > 0 else float(self._index > 0),
+                "setpoints_sent": self._index,
+                "setpoints_total": len(profile.times),
+                "current_setpoint": self._setpoint,
+                "timing_ms": {
+                    "mean_lateness": float(lateness.mean()) if len(lateness) else None,
+                    "p99_lateness": float(np.percentile(lateness, 99)) if len(lateness) else None,
+                    "max_lateness": float(lateness.max()) if len(lateness) else None,
+                },
+            }
+
+
+# 创建全局运动曲线执行器实例
+motion_profile_executor = MotionProfileExecutor()
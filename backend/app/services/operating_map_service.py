@@ -0,0 +1,244 @@
+"""
+转速 × 转矩 运行点 / 效率图
+固定网格累加器：每个样本按 (转速, 转矩) 落入一个格子，格子内累计样本数、电功率和与机械功率和，
+不保存原始样本、不回扫历史。累加量都是求和，同一网格的图可以直接相加，
+因此可以跨天、跨驱动器合并（导出原始累加量 → 合并 → 生成热力图）
+
+热力图输出：每格样本数、平均电功率、效率（机械功率和 / 电功率和）
+
+每天一张图，按本地日期保存为 npz 文件（OPERATING_MAP_DIR/YYYY-MM-DD.npz）
+"""
+import math
+import os
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.telemetry_pipeline import TelemetrySample
+from app.utils.logger import get_logger
+
+logger = get_logger("operating-map-service")
+
+RPM_TO_RAD_S = 2.0 * math.pi / 60.0
+
+
+class OperatingMap:
+    """可合并的固定网格运行点累加器"""
+
+    def __init__(
+        self,
+        rpm_edges: np.ndarray,
+        torque_edges: np.ndarray,
+        count: Optional[np.ndarray] = None,
+        power_sum: Optional[np.ndarray] = None,
+        mech_power_sum: Optional[np.ndarray] = None,
+        sources: Iterable[str] = (),
+    ) -> None:
+        self.rpm_edges = np.asarray(rpm_edges, dtype=np.float64)
+        self.torque_edges = np.asarray(torque_edges, dtype=np.float64)
+        shape = (len(self.rpm_edges) - 1, len(self.torque_edges) - 1)
+        if shape[0] < 1 or shape[1] < 1:
+            raise ValueError("运行点图至少需要一个转速格和一个转矩格")
+        self.count = np.zeros(shape, dtype=np.int64) if count is None else np.asarray(count, dtype=np.int64)
+        self.power_sum = np.zeros(shape) if power_sum is None else np.asarray(power_sum, dtype=np.float64)
+        self.mech_power_sum = np.zeros(shape) if mech_power_sum is None else np.asarray(mech_power_sum, dtype=np.float64)
+        if not (self.count.shape == self.power_sum.shape == self.mech_power_sum.shape == shape):
+            raise ValueError(f"运行点图累加量形状与网格 {shape} 不一致")
+        self.sources = sorted(set(sources))     # 参与合并的 驱动器/日期 标识
+
+    @classmethod
+    def from_settings(cls, source: str = "") -> "OperatingMap":
+        return cls(
+            np.linspace(0.0, settings.OPERATING_MAP_RPM_MAX, settings.OPERATING_MAP_RPM_BINS + 1),
+            np.linspace(0.0, settings.OPERATING_MAP_TORQUE_MAX, settings.OPERATING_MAP_TORQUE_BINS + 1),
+            sources=[source] if source else (),
+        )
+
+    # ========== 累加 ==========
+
+    def _cells(self, rpm: np.ndarray, torque: np.ndarray):
+        """所在格子下标，超出上限的计入最后一格"""
+        i = np.clip(np.searchsorted(self.rpm_edges, rpm, side="right") - 1, 0, self.count.shape[0] - 1)
+        j = np.clip(np.searchsorted(self.torque_edges, torque, side="right") - 1, 0, self.count.shape[1] - 1)
+        return i, j
+
+    def add(self, rpm: float, torque: float, power: float) -> None:
+        i, j = self._cells(abs(rpm), abs(torque))
+        self.count[i, j] += 1
+        self.power_sum[i, j] += power
+        self.mech_power_sum[i, j] += abs(rpm) * RPM_TO_RAD_S * abs(torque)
+
+    def add_batch(self, rpm: np.ndarray, torque: np.ndarray, power: np.ndarray) -> None:
+        rpm, torque = np.abs(np.asarray(rpm, dtype=np.float64)), np.abs(np.asarray(torque, dtype=np.float64))
+        i, j = self._cells(rpm, torque)
+        np.add.at(self.count, (i, j), 1)
+        np.add.at(self.power_sum, (i, j), np.asarray(power, dtype=np.float64))
+        np.add.at(self.mech_power_sum, (i, j), rpm * RPM_TO_RAD_S * torque)
+
+    def same_grid(self, other: "OperatingMap") -> bool:
+        return np.array_equal(self.rpm_edges, other.rpm_edges) and np.array_equal(self.torque_edges, other.torque_edges)
+
+    def merge(self, other: "OperatingMap") -> "OperatingMap":
+        """原地合并另一张同网格的图"""
+        if not self.same_grid(other):
+            raise ValueError("只能合并网格相同的运行点图")
+        self.count += other.count
+        self.power_sum += other.power_sum
+        self.mech_power_sum += other.mech_power_sum
+        self.sources = sorted(set(self.sources) | set(other.sources))
+        return self
+
+    # ========== 输出 ==========
+
+    def heatmap(self) -> Dict[str, Any]:
+        """热力图数组（行为转速格，列为转矩格），无样本的格子为 null"""
+        occupied = self.count > 0
+        mean_power = np.divide(self.power_sum, self.count, out=np.zeros_like(self.power_sum), where=occupied)
+        powered = self.power_sum > 0
+        efficiency = np.divide(self.mech_power_sum, self.power_sum, out=np.zeros_like(self.power_sum), where=powered)
+        return {
+            "sources": self.sources,
+            "samples": int(self.count.sum()),
+            "rpm_edges": self.rpm_edges.tolist(),
+            "torque_edges": self.torque_edges.tolist(),
+            "count": self.count.tolist(),
+            "mean_power_w": np.where(occupied, mean_power, None).tolist(),
+            "efficiency": np.where(powered, efficiency, None).tolist(),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """原始累加量（用于跨驱动器合并）"""
+        return {
+            "sources": self.sources,
+            "rpm_edges": self.rpm_edges.tolist(),
+            "torque_edges": self.torque_edges.tolist(),
+            "count": self.count.tolist(),
+            "power_sum": self.power_sum.tolist(),
+            "mech_power_sum": self.mech_power_sum.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OperatingMap":
+        return cls(
+            data["rpm_edges"], data["torque_edges"],
+            data["count"], data["power_sum"], data["mech_power_sum"], data.get("sources", ()),
+        )
+
+    def save(self, path: Path) -> None:
+        """原子写入 npz（先写临时文件再替换）"""
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez(
+            tmp, rpm_edges=self.rpm_edges, torque_edges=self.torque_edges, count=self.count,
+            power_sum=self.power_sum, mech_power_sum=self.mech_power_sum, sources=np.array(self.sources, dtype=str),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "OperatingMap":
+        with np.load(path) as data:
+            return cls(
+                data["rpm_edges"], data["torque_edges"],
+                data["count"], data["power_sum"], data["mech_power_sum"], data["sources"].tolist(),
+            )
+
+
+class OperatingMapService:
+    """遥测管道消费者：当天的运行点图常驻内存，定期落盘；历史日期从文件加载"""
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self._lock = threading.Lock()
+        self._dir = Path(directory or settings.OPERATING_MAP_DIR)
+        self._day: Optional[date] = None
+        self._map: Optional[OperatingMap] = None
+        self._last_save = time.monotonic()
+
+    def _source(self, day: date) -> str:
+        return f"{settings.OPERATING_MAP_DRIVE}/{day.isoformat()}"
+
+    def _path(self, day: date) -> Path:
+        return self._dir / f"{day.isoformat()}.npz"
+
+    def on_sample(self, sample: TelemetrySample) -> None:
+        if sample.replayed:
+            return
+        status = sample.motor_status
+        day = datetime.fromtimestamp(sample.timestamp_ms / 1000.0).date()
+        with self._lock:
+            if day != self._day:
+                self._roll_over(day)
+            self._map.add(status.rpm, status.torque, status.power)
+            save = sample.t_mono - self._last_save >= settings.OPERATING_MAP_SAVE_INTERVAL
+        if save:
+            self.save()
+
+    def _roll_over(self, day: date) -> None:
+        """切换到新的一天：保存前一天，加载（重启后继续）或新建当天的图"""
+        if self._map is not None:
+            self._write(self._day, self._map)
+        fresh = OperatingMap.from_settings(self._source(day))
+        loaded = self._load_day(day)
+        if loaded is not None and not fresh.same_grid(loaded):
+            logger.warning(f"运行点图 {day} 的网格与当前配置不同，当天重新累计")
+            loaded = None
+        self._day, self._map = day, loaded or fresh
+
+    def _load_day(self, day: date) -> Optional[OperatingMap]:
+        path = self._path(day)
+        if not path.exists():
+            return None
+        try:
+            return OperatingMap.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"运行点图文件无效 {path}: {e}")
+            return None
+
+    def _write(self, day: date, operating_map: OperatingMap) -> None:
+        try:
+            self._dir.mkdir(parents=True, exist_ok=True)
+            operating_map.save(self._path(day))
+        except OSError as e:
+            logger.error(f"保存运行点图失败: {e}")
+
+    def save(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                self._write(self._day, self._map)
+            self._last_save = time.monotonic()
+
+    def query(self, start: date, end: date) -> OperatingMap:
+        """合并 [start, end] 日期范围内各天的图（网格与当前配置不同的文件跳过）"""
+        merged = OperatingMap.from_settings()
+        days = set()
+        if self._dir.exists():
+            for path in self._dir.glob("*.npz"):
+                try:
+                    days.add(date.fromisoformat(path.stem))
+                except ValueError:
+                    continue
+        with self._lock:
+            if self._day is not None:
+                days.add(self._day)
+        for day in sorted(d for d in days if start <= d <= end):
+            with self._lock:
+                # 当天的图以内存为准（文件可能落后一个保存周期）
+                operating_map = self._map if day == self._day else None
+                if operating_map is not None:
+                    merged.merge(operating_map)
+                    continue
+            operating_map = self._load_day(day)
+            if operating_map is None:
+                continue
+            try:
+                merged.merge(operating_map)
+            except ValueError:
+                logger.warning(f"运行点图 {day} 的网格与当前配置不同，已跳过")
+        return merged
+
+
+# 创建全局运行点图实例
+operating_map_service = OperatingMapService()
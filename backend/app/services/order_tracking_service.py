@@ -0,0 +1,189 @@
+"""
+阶次跟踪
+以驱动器转速（read_rpm：erpm / MOTOR_POLE_PAIRS）作为转速计，把原始振动波形从时间域
+重采样到等角度域，再做 FFT 得到阶次谱；转速变化时各阶次仍落在固定谱线上，不会像定频分析那样拖尾。
+
+增量处理：每来一个波形块，只计算这一块的转角并重采样，累积到等角度缓冲；
+缓冲凑满 ORDER_REVOLUTIONS 转就输出一帧阶次谱，余下的样本留到下一块，
+相邻块在时间上连续时转角也连续
+"""
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.spectrum_engine import SpectrumResult, WINDOWS
+from app.services.telemetry_pipeline import TelemetrySample
+from app.services.waveform_service import WaveformBlock
+from app.utils.logger import get_logger
+from app.utils.ring_buffer import RingBuffer
+
+logger = get_logger("order-tracking")
+
+RPM_BUFFER_SIZE = 600            # 10Hz 下约 60 秒
+RPM_HOLD_MS = 500.0              # 波形块超出转速数据范围时，最多沿用边界转速的毫秒数
+BLOCK_GAP_TOLERANCE_MS = 5.0     # 相邻波形块间隔小于该值时视为连续
+SHAFT_ORDERS = (1.0, 2.0, 3.0)
+
+
+class OrderSpectrum(NamedTuple):
+    timestamp_ms: int            # 本帧最后一个样本的时间
+    rpm: float                   # 本帧平均转速
+    orders: np.ndarray           # 阶次轴
+    amplitude: np.ndarray        # 各阶次峰值幅值
+    tracked: Dict[str, float]    # 1×/2×/3× 及轴承故障阶次的幅值
+
+
+class OrderTracker:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._rpm = RingBuffer(RPM_BUFFER_SIZE, ("t_ms", "rpm"))
+        self.samples_per_rev = settings.ORDER_SAMPLES_PER_REV
+        self.revolutions = settings.ORDER_REVOLUTIONS
+        self._frame_len = self.samples_per_rev * self.revolutions
+        self._window = WINDOWS[settings.SPECTRUM_WINDOW](self._frame_len)
+        self._amplitude_scale = 2.0 / float(np.sum(self._window))
+        self._orders = np.fft.rfftfreq(self._frame_len, d=1.0 / self.samples_per_rev)
+        self._targets = self._build_targets()
+
+        # 跨块状态
+        self._angle_buffer = np.empty(0, dtype=np.float64)   # 已重采样、尚未凑满一帧的样本
+        self._rpm_buffer = np.empty(0, dtype=np.float64)     # 与上面逐点对应的转速（求帧平均转速）
+        self._next_angle = 0.0                               # 下一个等角度采样点的转角（转）
+        self._last_end_ms: Optional[float] = None
+        self._last_angle = 0.0
+        self._last_sample = 0.0
+
+        self._latest: Optional[OrderSpectrum] = None
+        self._frames = 0
+        self._resets = 0
+
+    def _build_targets(self) -> Dict[str, float]:
+        targets = {f"{order:g}x": order for order in SHAFT_ORDERS}
+        targets.update({name: float(order) for name, order in settings.ORDER_BEARING_ORDERS.items()})
+        return targets
+
+    # ========== 输入 ==========
+
+    def on_drive_sample(self, sample: TelemetrySample) -> None:
+        """遥测管道消费者：记录转速（墙钟时间，与波形块时间戳一致）"""
+        with self._lock:
+            self._rpm.append((sample.timestamp_ms, abs(sample.motor_status.rpm)))
+
+    def on_waveform_block(self, block: WaveformBlock, result: SpectrumResult) -> None:
+        """波形服务回调"""
+        spectra = self.process_block(block)
+        if spectra:
+            with self._lock:
+                self._latest = spectra[-1]
+
+    # ========== 处理 ==========
+
+    def _reset_locked(self) -> None:
+        self._angle_buffer = np.empty(0, dtype=np.float64)
+        self._rpm_buffer = np.empty(0, dtype=np.float64)
+        self._next_angle = 0.0
+        if self._last_end_ms is not None:
+            self._resets += 1
+        self._last_end_ms = None
+
+    def process_block(self, block: WaveformBlock) -> List[OrderSpectrum]:
+        """处理一个波形块，返回本块凑满的阶次谱帧（可能为空）"""
+        n = len(block.samples)
+        if n < 2:
+            return []
+        dt_ms = 1000.0 / block.sample_rate
+        t_ms = block.timestamp_ms + np.arange(n) * dt_ms
+
+        with self._lock:
+            drive = self._rpm.latest()
+            if (
+                len(drive) < 2
+                or drive[0, 0] > t_ms[0] + RPM_HOLD_MS
+                or drive[-1, 0] < t_ms[-1] - RPM_HOLD_MS
+            ):
+                # 没有覆盖该块的转速数据，无法换算转角
+                self._reset_locked()
+                return []
+
+            rpm = np.interp(t_ms, drive[:, 0], drive[:, 1])
+            if rpm.min() < settings.ORDER_MIN_RPM:
+                # 低速/停机时转角几乎不增长，等角度重采样没有意义
+                self._reset_locked()
+                return []
+
+            x = block.samples.astype(np.float64)
+            rev_per_sample = rpm / 60.0 / block.sample_rate
+            contiguous = (
+                self._last_end_ms is not None
+                and abs(block.timestamp_ms - (self._last_end_ms + dt_ms)) <= BLOCK_GAP_TOLERANCE_MS
+            )
+            if contiguous:
+                # 把上一块最后一个样本接在前面，转角和插值都跨块连续
+                start_angle = self._last_angle
+                angle = start_angle + np.concatenate(([0.0], np.cumsum(rev_per_sample)))
+                x = np.concatenate(([self._last_sample], x))
+                rpm = np.concatenate(([rpm[0]], rpm))
+            else:
+                self._reset_locked()
+                angle = np.concatenate(([0.0], np.cumsum(rev_per_sample[1:])))
+
+            step = 1.0 / self.samples_per_rev
+            count = int(np.floor((angle[-1] - self._next_angle) / step)) + 1
+            if count > 0:
+                grid = self._next_angle + np.arange(count) * step
+                resampled = np.interp(grid, angle, x)
+                self._angle_buffer = np.concatenate((self._angle_buffer, resampled))
+                self._rpm_buffer = np.concatenate((self._rpm_buffer, np.interp(grid, angle, rpm)))
+                self._next_angle = grid[-1] + step
+
+            self._last_end_ms = float(t_ms[-1])
+            self._last_angle = float(angle[-1])
+            self._last_sample = float(x[-1])
+
+            spectra = []
+            while len(self._angle_buffer) >= self._frame_len:
+                frame = self._angle_buffer[:self._frame_len]
+                mean_rpm = float(self._rpm_buffer[:self._frame_len].mean())
+                spectra.append(self._order_spectrum(frame, t_ms[-1], mean_rpm))
+                self._angle_buffer = self._angle_buffer[self._frame_len:]
+                self._rpm_buffer = self._rpm_buffer[self._frame_len:]
+            self._frames += len(spectra)
+        return spectra
+
+    def _order_spectrum(self, frame: np.ndarray, timestamp_ms: float, rpm: float) -> OrderSpectrum:
+        centered = frame - frame.mean()
+        amplitude = np.abs(np.fft.rfft(centered * self._window)) * self._amplitude_scale
+        resolution = 1.0 / self.revolutions
+        tracked = {}
+        for name, order in self._targets.items():
+            # 非整数阶次（轴承故障阶次）取最近谱线 ±1 根内的最大值
+            k = int(round(order / resolution))
+            lo, hi = max(0, k - 1), min(len(amplitude), k + 2)
+            tracked[name] = float(amplitude[lo:hi].max()) if lo < hi else 0.0
+        return OrderSpectrum(int(timestamp_ms), rpm, self._orders, amplitude, tracked)
+
+    # ========== 查询 ==========
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            latest = self._latest
+            frames = self._frames
+            resets = self._resets
+        if latest is None:
+            return None
+        return {
+            "timestamp_ms": latest.timestamp_ms,
+            "rpm": latest.rpm,
+            "tracked": latest.tracked,
+            "order_resolution": 1.0 / self.revolutions,
+            "orders": latest.orders.tolist(),
+            "amplitude": latest.amplitude.tolist(),
+            "frames": frames,
+            "resets": resets,
+        }
+
+
+# 创建全局阶次跟踪实例
+order_tracker = OrderTracker()
@@ -0,0 +1,306 @@
+"""
+多速率轮询计划
+转速、电流、位置需要尽可能高的采样率，温度、电压、故障码变化很慢，没必要每个周期都读。
+
+POLL_RATES 给出各通道的目标频率（Hz），0 表示“快通道”：总线预算内尽可能快。
+规划器把它编译成一个重复的周期（若干个槽）：
+
+- 每个槽都读快通道；慢通道按 2 的幂次抽取（实际频率不低于目标），相位错开，避免集中在同一个槽
+- 每个槽内要读的寄存器按 RTU 帧时间模型合并成连续段：中间空隙的寄存器比多一次往返便宜就合并
+- 槽时长 = 估计总线时间 / POLL_BUS_BUDGET（给控制写入和心跳留出余量），不短于 1 / POLL_MAX_RATE
+
+RTU 帧时间模型：请求 8 字节，响应 5 + 2n 字节，每字节 1 + 数据位 + 校验位 + 停止位 个比特，
+每帧前后各 3.5 字节静默，另加驱动器响应时间 POLL_TURNAROUND_MS。
+
+输入寄存器 5000-5011 是连续的，按默认参数合并后每个槽通常只有一次读取，
+收益主要来自快通道不再受固定 10Hz 限制；各通道实际达到的频率在运行中统计。
+
+每个槽的读取都会刷新寄存器镜像（/status/detailed 等直接使用），但发布到遥测管道的样本
+按 POLL_PUBLISH_HZ（默认 10Hz）抽取，下游按样本计数调好的参数不受轮询频率影响
+"""
+import math
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.services.modbus_service import modbus_service
+from app.utils.logger import get_logger
+
+logger = get_logger("poll-schedule")
+
+# 通道 → (起始寄存器, 寄存器数)，名称与 decode_input_block 一致
+CHANNELS: Dict[str, Tuple[int, int]] = {
+    "fault": (settings.REG_INPUT_FAULT, 1),
+    "rpm": (settings.REG_INPUT_RPM, 2),
+    "duty_cycle": (settings.REG_INPUT_DUTY, 1),
+    "power": (settings.REG_INPUT_POWER, 1),
+    "voltage": (settings.REG_INPUT_VOLTAGE, 1),
+    "motor_current": (settings.REG_INPUT_MOTOR_CURRENT, 1),
+    "bus_current": (settings.REG_INPUT_BUS_CURRENT, 1),
+    "temperature": (settings.REG_INPUT_TEMPERATURE, 1),
+    "angle": (settings.REG_INPUT_ANGLE, 1),
+    "position": (settings.REG_INPUT_POSITION, 2),
+}
+
+
+def channel_addresses(names: Sequence[str]) -> List[int]:
+    """通道对应的全部寄存器地址"""
+    addresses: List[int] = []
+    for name in names:
+        start, count = CHANNELS[name]
+        addresses.extend(range(start, start + count))
+    return addresses
+
+
+# ========== RTU 帧时间模型 ==========
+
+def char_seconds() -> float:
+    bits = 1 + settings.MODBUS_BYTESIZE + (0 if settings.MODBUS_PARITY.upper() == "N" else 1) + settings.MODBUS_STOPBITS
+    return bits / settings.MODBUS_BAUDRATE
+
+
+def transaction_seconds(count: int) -> float:
+    """读取 count 个输入寄存器的一次往返时间（估计）"""
+    chars = 8 + 5 + 2 * count + 2 * 3.5
+    return chars * char_seconds() + settings.POLL_TURNAROUND_MS / 1000.0
+
+
+def coalesce(addresses: Sequence[int]) -> List[Tuple[int, int]]:
+    """把寄存器地址合并成 (起始地址, 数量) 段；空隙比多一次往返便宜时合并"""
+    regs = sorted(set(addresses))
+    if not regs:
+        return []
+    overhead = transaction_seconds(0)
+    gap_cost = 2 * char_seconds()
+    ranges: List[List[int]] = [[regs[0], regs[0]]]
+    for address in regs[1:]:
+        gap = address - ranges[-1][1] - 1
+        if gap * gap_cost < overhead:
+            ranges[-1][1] = address
+        else:
+            ranges.append([address, address])
+    return [(start, end - start + 1) for start, end in ranges]
+
+
+# ========== 规划 ==========
+
+class PollSlot(NamedTuple):
+    channels: Tuple[str, ...]
+    ranges: Tuple[Tuple[int, int], ...]     # (起始地址, 寄存器数)
+    bus_seconds: float                      # 估计总线占用时间
+    duration: float                         # 槽时长
+
+
+class PollPlan(NamedTuple):
+    slots: Tuple[PollSlot, ...]
+    cycle_seconds: float
+    requested: Dict[str, float]             # 目标频率，0 表示快通道
+    planned: Dict[str, float]               # 按计划应达到的频率
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "cycle_seconds": self.cycle_seconds,
+            "slots": [
+                {
+                    "channels": list(slot.channels),
+                    "ranges": [{"start": start, "count": count} for start, count in slot.ranges],
+                    "bus_ms": slot.bus_seconds * 1000.0,
+                    "duration_ms": slot.duration * 1000.0,
+                }
+                for slot in self.slots
+            ],
+            "bus_utilization": sum(s.bus_seconds for s in self.slots) / self.cycle_seconds,
+        }
+
+
+def compile_plan(
+    rates: Dict[str, float],
+    budget: float,
+    max_rate: float,
+    default_rate: float,
+) -> PollPlan:
+    """
+    Args:
+        rates: 通道 → 目标频率（Hz），0 表示快通道；未列出的通道使用 default_rate
+        budget: 轮询可占用的总线时间比例（0-1]
+        max_rate: 槽频率上限（Hz）
+    """
+    unknown = set(rates) - set(CHANNELS)
+    if unknown:
+        raise ValueError(f"未知的轮询通道: {', '.join(sorted(unknown))}")
+    if not 0 < budget <= 1:
+        raise ValueError("总线预算比例必须在 (0, 1] 范围内")
+    requested = {name: float(rates.get(name, default_rate)) for name in CHANNELS}
+    if any(r < 0 for r in requested.values()):
+        raise ValueError("轮询频率不能为负")
+    fast = [name for name, r in requested.items() if r == 0]
+    slow = {name: r for name, r in requested.items() if r > 0}
+
+    # 有快通道时槽频率受总线预算和 max_rate 限制；全是慢通道时按最快的慢通道
+    floor_period = 1.0 / max_rate if fast else 1.0 / min(max(slow.values()), max_rate)
+    fast_ranges = coalesce(channel_addresses(fast))
+    period = max(sum(transaction_seconds(c) for _, c in fast_ranges) / budget, floor_period)
+
+    slots: List[PollSlot] = []
+    for _ in range(4):
+        # 抽取比取 2 的幂，周期长度 = 最大抽取比，实际频率不低于目标
+        decimation = {
+            name: 2 ** max(0, int(math.floor(math.log2(max(1.0, 1.0 / (r * period))))))
+            for name, r in slow.items()
+        }
+        n = max(decimation.values(), default=1)
+        # 相位错开：按抽取比从小到大，选择使所经槽最大附加寄存器数最小的相位
+        load = [0] * n
+        phase: Dict[str, int] = {}
+        for name in sorted(slow, key=lambda c: decimation[c]):
+            d = decimation[name]
+            best = min(range(d), key=lambda p: (max(load[p::d]), p))
+            phase[name] = best
+            for i in range(best, n, d):
+                load[i] += CHANNELS[name][1]
+
+        slots = []
+        for i in range(n):
+            due = fast + [name for name in slow if i % decimation[name] == phase[name]]
+            due.sort(key=lambda c: CHANNELS[c][0])
+            ranges = coalesce(channel_addresses(due))
+            bus = sum(transaction_seconds(c) for _, c in ranges)
+            slots.append(PollSlot(tuple(due), tuple(ranges), bus, max(bus / budget, floor_period)))
+        average = sum(s.duration for s in slots) / n
+        if abs(average - period) <= 1e-6:
+            break
+        period = average
+
+    cycle = sum(s.duration for s in slots)
+    planned = {name: sum(name in s.channels for s in slots) / cycle for name in CHANNELS}
+    return PollPlan(tuple(slots), cycle, requested, planned)
+
+
+# ========== 执行 ==========
+
+class PublishDecimator:
+    """按 POLL_PUBLISH_HZ 抽取样本的绝对节拍（实时轮询和回放抓取文件共用）"""
+
+    def __init__(self) -> None:
+        self._next: Optional[float] = None
+
+    def due(self, t: float) -> bool:
+        """时刻 t（秒）的样本是否需要发布；落后超过一个周期时重新对齐"""
+        period = 1.0 / settings.POLL_PUBLISH_HZ
+        if self._next is not None and t < self._next:
+            return False
+        if self._next is None or t - self._next > period:
+            self._next = t
+        self._next += period
+        return True
+
+
+class PollScheduler:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._plan: Optional[PollPlan] = None
+        self._index = 0
+        self._deadline: Optional[float] = None
+        self._publish = PublishDecimator()
+        self._window_start: Optional[float] = None
+        self._window_reads: Dict[str, int] = {name: 0 for name in CHANNELS}
+        self._window_bus = 0.0
+        self._achieved: Dict[str, Optional[float]] = {name: None for name in CHANNELS}
+        self._achieved_bus: Optional[float] = None
+        self.failures = 0
+
+    @property
+    def plan(self) -> PollPlan:
+        if self._plan is None:
+            self._plan = compile_plan(
+                settings.POLL_RATES, settings.POLL_BUS_BUDGET, settings.POLL_MAX_RATE, settings.POLL_DEFAULT_RATE
+            )
+            logger.info(
+                f"轮询计划：{len(self._plan.slots)} 个槽，周期 {self._plan.cycle_seconds * 1000:.1f}ms，"
+                + "，".join(f"{name} {rate:.1f}Hz" for name, rate in self._plan.planned.items())
+            )
+        return self._plan
+
+    def poll_slot(self) -> Optional[Dict[str, Any]]:
+        """
+        读取当前槽的寄存器段（阻塞，在线程中调用）
+
+        Returns:
+            由寄存器镜像计算的电机状态（同 read_motor_status）；任一段读取失败返回 None
+        """
+        plan = self.plan
+        with self._lock:
+            slot = plan.slots[self._index]
+            self._index = (self._index + 1) % len(plan.slots)
+        started = time.monotonic()
+        for start, count in slot.ranges:
+            if modbus_service.read_input_range(start, count) is None:
+                self.failures += 1
+                return None
+        self._account(slot, started, time.monotonic())
+        image = modbus_service.register_image()
+        if image is None:
+            # 慢通道尚未轮到过：补一次整块读取
+            image = modbus_service.refresh_register_image(0.0)
+            if image is None:
+                return None
+        return modbus_service.motor_status_from_block(image[1])
+
+    def _account(self, slot: PollSlot, started: float, finished: float) -> None:
+        with self._lock:
+            if self._window_start is None:
+                self._window_start = started
+            for name in slot.channels:
+                self._window_reads[name] += 1
+            self._window_bus += finished - started
+            elapsed = finished - self._window_start
+            if elapsed >= settings.POLL_RATE_WINDOW:
+                self._achieved = {name: count / elapsed for name, count in self._window_reads.items()}
+                self._achieved_bus = self._window_bus / elapsed
+                self._window_reads = {name: 0 for name in CHANNELS}
+                self._window_bus = 0.0
+                self._window_start = finished
+
+    def publish_due(self, t_mono: float) -> bool:
+        """本次读取是否需要发布到遥测管道（按 POLL_PUBLISH_HZ 抽取，落后时重新对齐）"""
+        with self._lock:
+            return self._publish.due(t_mono)
+
+    def next_delay(self) -> float:
+        """距下一个槽开始的秒数；按绝对节拍推进，落后超过一个周期时重新对齐"""
+        plan = self.plan
+        now = time.monotonic()
+        with self._lock:
+            duration = plan.slots[(self._index - 1) % len(plan.slots)].duration
+            if self._deadline is None or now - self._deadline > plan.cycle_seconds:
+                self._deadline = now
+            self._deadline += duration
+            return max(0.0, self._deadline - now)
+
+    def stats(self) -> Dict[str, Any]:
+        plan = self.plan
+        with self._lock:
+            achieved = dict(self._achieved)
+            bus = self._achieved_bus
+        return {
+            "enabled": settings.POLL_SCHEDULE_ENABLED,
+            "channels": {
+                name: {
+                    "requested_hz": plan.requested[name] or None,
+                    "fast": plan.requested[name] == 0,
+                    "planned_hz": plan.planned[name],
+                    "achieved_hz": achieved[name],
+                }
+                for name in CHANNELS
+            },
+            "achieved_bus_utilization": bus,
+            "publish_hz": settings.POLL_PUBLISH_HZ,
+            "failures": self.failures,
+            "rate_window_seconds": settings.POLL_RATE_WINDOW,
+            "plan": plan.to_dict(),
+        }
+
+
+# 创建全局轮询计划实例
+poll_scheduler = PollScheduler()
@@ -0,0 +1,269 @@
+"""
+遥测回放服务
+把原始寄存器抓取文件或历史存储中的数据按原始采样间隔（可加速）重新送入遥测管道，
+驱动 control_service 和所有下游消费者，用于故障复现和可重复的性能测试
+"""
+import asyncio
+import struct
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.schemas.motor_schemas import MotorStatus, VibrationMetrics
+from app.services.capture_service import FC_READ_INPUT, iter_records, open_capture, read_header
+from app.services.health_service import health_estimator
+from app.services.history_service import CHANNELS, history_store
+from app.services.modbus_service import INPUT_BLOCK_COUNT, INPUT_BLOCK_START, modbus_service
+from app.services.poll_schedule_service import PublishDecimator
+from app.services.telemetry_pipeline import publish
+from app.utils.logger import get_logger
+
+logger = get_logger("replay-service")
+
+HISTORY_SOURCE = "history"
+
+
+class ReplayFrame(NamedTuple):
+    t: float                                # 原始采样时刻（秒，同一数据源内单调）
+    timestamp_ms: int                       # 原始墙钟时间（毫秒）
+    motor_data: Dict[str, Any]              # rpm, torque, load, temperature, power
+    registers: Optional[Dict[str, float]]
+
+
+def iter_capture_frames(path: str) -> Iterator[ReplayFrame]:
+    """
+    从抓取文件中提取轮询读取的输入寄存器记录，用与实时轮询相同的代码解码。
+    多速率轮询按段读取，各段叠加到寄存器镜像上；整块寄存器都出现过之后，
+    按记录时间以与实时轮询相同的 POLL_PUBLISH_HZ 抽取产生帧，下游看到的样本率与实时运行一致
+    """
+    buf = open_capture(path)
+    image: List[Optional[int]] = [None] * INPUT_BLOCK_COUNT
+    decimator = PublishDecimator()
+    try:
+        header = read_header(buf)
+        for record in iter_records(buf, header):
+            offset = record.address - INPUT_BLOCK_START
+            if (record.function != FC_READ_INPUT or offset < 0
+                    or offset + len(record.registers) > INPUT_BLOCK_COUNT):
+                continue
+            image[offset:offset + len(record.registers)] = record.registers
+            if any(v is None for v in image) or not decimator.due(record.t_mono_ns / 1e9):
+                continue
+            motor_data = modbus_service.motor_status_from_block(
+                modbus_service.decode_input_block(image)
+            )
+            yield ReplayFrame(
+                t=record.t_mono_ns / 1e9,
+                timestamp_ms=header.to_wall_ns(record.t_mono_ns) // 1_000_000,
+                motor_data=motor_data,
+                registers=motor_data["registers"],
+            )
+    finally:
+        buf.close()
+
+
+def replay_vibration(rpm: float) -> Dict[str, float]:
+    """
+    回放样本的振动指标：录制数据不含振动测量，主频由转速换算（不加随机扰动），其余为 0；
+    健康指数和刀具磨损取估计器当前值（不更新）。不读取实时波形/SensorCore，同一数据源每次回放结果相同
+    """
+    health = health_estimator.snapshot()
+    return {
+        "main_freq": round(max(0.0, rpm / 60.0), 2),
+        "amplitude": 0.0,
+        "rms": 0.0,
+        "impulse_count": 0,
+        "health_index": health["health_index"],
+        "tool_wear": health["tool_wear"],
+    }
+
+
+def iter_history_frames(start_ms: int, end_ms: int) -> Iterator[ReplayFrame]:
+    for timestamp_ms, values in history_store.iter_samples(start_ms, end_ms):
+        yield ReplayFrame(
+            t=timestamp_ms / 1000.0,
+            timestamp_ms=timestamp_ms,
+            motor_data=dict(zip(CHANNELS, values)),
+            registers=None,
+        )
+
+
+def iter_frames(source: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Iterator[ReplayFrame]:
+    """
+    Args:
+        source: 抓取文件路径，或 "history" 表示历史存储
+        start_ms, end_ms: 历史存储的时间范围（墙钟毫秒）；抓取文件按时间范围过滤
+    """
+    start_ms = 0 if start_ms is None else start_ms
+    end_ms = 2 ** 62 if end_ms is None else end_ms
+    if source == HISTORY_SOURCE:
+        yield from iter_history_frames(start_ms, end_ms)
+        return
+    for frame in iter_capture_frames(source):
+        if start_ms <= frame.timestamp_ms <= end_ms:
+            yield frame
+
+
+def resolve_range(source: str, start_ms: Optional[int], end_ms: Optional[int]) -> Tuple[Optional[int], Optional[int]]:
+    """
+    补全并检查回放数据源和区间：历史存储未给出起止时默认为已有数据的范围；
+    抓取文件无法打开或头部无效、没有数据、区间为空或起点晚于终点时抛出 ValueError
+    """
+    if source == HISTORY_SOURCE:
+        if start_ms is None or end_ms is None:
+            available = history_store.time_range()
+            if available is None:
+                raise ValueError("历史存储中没有数据")
+            start_ms = available[0] if start_ms is None else start_ms
+            end_ms = available[1] if end_ms is None else end_ms
+    else:
+        try:
+            buf = open_capture(source)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"无法打开抓取文件 {source}: {e}") from e
+        try:
+            header = read_header(buf)
+        except (struct.error, ValueError) as e:
+            raise ValueError(f"不是有效的原始寄存器抓取文件: {source}") from e
+        finally:
+            buf.close()
+        if header.write_seq == 0:
+            raise ValueError(f"抓取文件中没有记录: {source}")
+    if start_ms is not None and end_ms is not None and start_ms >= end_ms:
+        raise ValueError("回放区间为空：起始时间必须早于结束时间")
+    return start_ms, end_ms
+
+
+class ReplayService:
+    """
+    按原始时间轴回放
+    每个样本的发布时刻按绝对截止时间计算（起点 + 相对时间 / 倍速），睡眠误差不会累积；
+    speed=0 表示不等待、尽快回放。发布给下游的 t_mono 使用录制时间轴，
+    因此无论倍速多少，下游基于时间差的计算结果都与原始运行一致
+    """
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+        self._stop_requested = False
+        self._status: Dict[str, Any] = {}
+        self._reset_status(None, 0.0)
+
+    def _reset_status(self, source: Optional[str], speed: float) -> None:
+        self._status = {
+            "running": False,
+            "source": source,
+            "speed": speed,
+            "samples": 0,
+            "skipped": 0,
+            "position_ms": None,
+            "max_lateness_ms": 0.0,
+            "mean_lateness_ms": 0.0,
+            "started_at": None,
+            "finished_at": None,
+        }
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def status(self) -> Dict[str, Any]:
+        return dict(self._status)
+
+    def start(
+        self,
+        source: str,
+        speed: float = 1.0,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+        loop: bool = False,
+    ) -> None:
+        """启动后台回放任务（需在事件循环中调用）；区间无效时抛出 ValueError"""
+        if self.is_running:
+            raise RuntimeError("已有回放任务在运行")
+        start_ms, end_ms = resolve_range(source, start_ms, end_ms)
+        self._stop_requested = False
+        self._reset_status(source, speed)
+        self._task = asyncio.create_task(self.run(source, speed, start_ms, end_ms, loop))
+
+    def stop(self) -> None:
+        self._stop_requested = True
+        if self.is_running:
+            self._task.cancel()
+
+    async def run(
+        self,
+        source: str,
+        speed: float = 1.0,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+        loop: bool = False,
+    ) -> None:
+        self._status.update(running=True, source=source, speed=speed, started_at=time.time())
+        logger.info(f"开始回放 - 数据源: {source}, 倍速: {speed or '最快'}")
+        try:
+            while True:
+                await self._replay_once(source, speed, start_ms, end_ms)
+                if not loop or self._stop_requested:
+                    break
+        except asyncio.CancelledError:
+            logger.info("回放已停止")
+        except Exception as e:
+            logger.error(f"回放失败: {e}", exc_info=True)
+        finally:
+            self._status.update(running=False, finished_at=time.time())
+            logger.info(f"回放结束 - 样本: {self._status['samples']}, 跳过: {self._status['skipped']}")
+
+    async def _replay_once(self, source: str, speed: float, start_ms: Optional[int], end_ms: Optional[int]) -> None:
+        aio_loop = asyncio.get_running_loop()
+        base_wall = aio_loop.time()
+        base_mono = time.monotonic()
+        t0: Optional[float] = None
+        lateness_total = 0.0
+
+        for frame in iter_frames(source, start_ms, end_ms):
+            if self._stop_requested:
+                return
+            if t0 is None:
+                t0 = frame.t
+            offset = frame.t - t0
+
+            if speed > 0:
+                due = base_wall + offset / speed
+                delay = due - aio_loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                lateness = max(0.0, aio_loop.time() - due) * 1000.0
+                lateness_total += lateness
+                if lateness > self._status["max_lateness_ms"]:
+                    self._status["max_lateness_ms"] = lateness
+            elif self._status["samples"] % 256 == 0:
+                # 最快回放时定期让出事件循环，避免阻塞 HTTP 请求
+                await asyncio.sleep(0)
+
+            try:
+                motor_status = MotorStatus(**{name: frame.motor_data[name] for name in CHANNELS})
+                # 录制数据不参与健康估计，避免改写持久化的基线和刀具磨损
+                vibration_metrics = VibrationMetrics(**replay_vibration(motor_status.rpm))
+            except (ValidationError, TypeError) as e:
+                # 与实时轮询一致：无法构成合法状态的样本被丢弃
+                self._status["skipped"] += 1
+                logger.debug(f"回放样本无效，已跳过: {e}")
+                continue
+
+            publish(
+                motor_status,
+                vibration_metrics,
+                registers=frame.registers,
+                t_mono=base_mono + offset,
+                timestamp_ms=frame.timestamp_ms,
+                replayed=True,
+            )
+            self._status["samples"] += 1
+            self._status["position_ms"] = frame.timestamp_ms
+            if speed > 0:
+                self._status["mean_lateness_ms"] = lateness_total / self._status["samples"]
+
+
+# 创建全局回放服务实例
+replay_service = ReplayService()
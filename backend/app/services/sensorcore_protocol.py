@@ -0,0 +1,184 @@
+"""
+SensorCore RS485 帧解析
+根据 docs/RS485通信协议说明_SensorCore.md 实现
+
+帧格式（33 字节）：
+    0xAA | 长度 0x1C | 命令 0xA1 | 数据 28 字节（14 个小端 16 位字段） | XOR 校验 | 0x55
+校验和为帧头、长度、命令和全部数据字节的异或
+"""
+import struct
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Sequence
+
+FRAME_HEADER = 0xAA
+FRAME_LENGTH = 0x1C
+FRAME_COMMAND = 0xA1
+FRAME_FOOTER = 0x55
+FRAME_SIZE = 33
+CHECKSUM_SPAN = 3 + FRAME_LENGTH            # 参与校验的字节数（帧头到数据末尾）
+_HEADER_BYTE = bytes([FRAME_HEADER])
+
+# speed, reserved1, att_u, att_v, att_w, reserved2, vib_freq, vib_mag, vib_rms,
+# vib_ratio, vib_impulse, temp, reserved3, reserved4
+PAYLOAD = struct.Struct("<HHhhhHHHHHHhHH")
+
+# reserved1 调试状态码
+STATUS_UNINITIALIZED = 0x0000
+STATUS_CALIBRATING = 0x0001
+STATUS_CALIBRATED = 0x0002
+STATUS_NOT_READY = 0x0003
+
+
+class SensorCoreFrame(NamedTuple):
+    """一帧原始载荷（寄存器原值，未缩放）"""
+    speed: int
+    status: int
+    att_u: int
+    att_v: int
+    att_w: int
+    progress: int
+    vib_freq: int
+    vib_mag: int
+    vib_rms: int
+    vib_ratio: int
+    vib_impulse: int
+    temp: int
+    reserved3: int
+    reserved4: int
+
+    @property
+    def peak(self) -> float:
+        """振动峰值（协议放大 1000 倍，这里还原）"""
+        return self.vib_mag / 1000.0
+
+    @property
+    def rms(self) -> float:
+        """振动 RMS（协议放大 1000 倍，这里还原）"""
+        return self.vib_rms / 1000.0
+
+    @property
+    def temperature(self) -> float:
+        """温度 ℃（协议放大 10 倍）"""
+        return self.temp / 10.0
+
+
+def xor_checksum(data) -> int:
+    """
+    计算不超过 32 字节数据的异或和
+    先整体转成整数再折半异或，避免逐字节的 Python 循环
+    """
+    value = int.from_bytes(data, "little")
+    value ^= value >> 128
+    value ^= value >> 64
+    value ^= value >> 32
+    value ^= value >> 16
+    value ^= value >> 8
+    return value & 0xFF
+
+
+def build_frame(payload: Sequence[int]) -> bytes:
+    """按协议打包一帧（用于模拟器和测试数据生成）"""
+    head = bytes([FRAME_HEADER, FRAME_LENGTH, FRAME_COMMAND]) + PAYLOAD.pack(*payload)
+    return head + bytes([xor_checksum(head), FRAME_FOOTER])
+
+
+class SensorCoreParser:
+    """
+    增量帧解析器
+    接收的字节追加到内部 bytearray，解析时在 memoryview 上就地校验和解包，
+    每次 feed 只在末尾做一次缓冲区前移
+
+    错误处理（对应协议文档第六节）：
+        - 帧头前的杂散字节被丢弃
+        - 长度/命令不符、帧尾错误、校验和错误时丢弃当前帧头，从下一个字节重新搜索
+        - 每次失步到重新对齐到有效帧记一次重同步
+    """
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._lost = False  # 上一个帧头无效，正在重新同步（跨 feed 调用保持）
+        self.frames = 0
+        self.resyncs = 0
+        self.length_errors = 0
+        self.footer_errors = 0
+        self.checksum_errors = 0
+        self.bytes_received = 0
+        self.bytes_discarded = 0
+
+    def feed(self, data) -> List[SensorCoreFrame]:
+        """追加接收到的字节，返回其中完整且校验通过的帧"""
+        self._buf += data
+        self.bytes_received += len(data)
+        frames: List[SensorCoreFrame] = []
+        buf = self._buf
+        end = len(buf)
+        pos = 0
+        lost = self._lost
+        with memoryview(buf) as view:
+            while True:
+                start = buf.find(_HEADER_BYTE, pos, end)
+                if start < 0:
+                    start = end
+                if start > pos:
+                    self.bytes_discarded += start - pos
+                    if not lost:
+                        self.resyncs += 1
+                    lost = True
+                pos = start
+                if end - pos < FRAME_SIZE:
+                    break
+
+                if buf[pos + 1] != FRAME_LENGTH or buf[pos + 2] != FRAME_COMMAND:
+                    self.length_errors += 1
+                elif buf[pos + FRAME_SIZE - 1] != FRAME_FOOTER:
+                    self.footer_errors += 1
+                elif xor_checksum(view[pos:pos + CHECKSUM_SPAN]) != buf[pos + CHECKSUM_SPAN]:
+                    self.checksum_errors += 1
+                else:
+                    frames.append(SensorCoreFrame._make(PAYLOAD.unpack_from(buf, pos + 3)))
+                    pos += FRAME_SIZE
+                    lost = False
+                    continue
+                # 无效帧：丢弃这个帧头，从下一个字节重新搜索
+                if not lost:
+                    self.resyncs += 1
+                lost = True
+                self.bytes_discarded += 1
+                pos += 1
+
+        # 循环结束时剩余数据不足一帧，缓冲区不会无限增长
+        if pos:
+            del buf[:pos]
+        self._lost = lost
+        self.frames += len(frames)
+        return frames
+
+    def reset(self) -> None:
+        self._buf.clear()
+        self._lost = False
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "resyncs": self.resyncs,
+            "length_errors": self.length_errors,
+            "footer_errors": self.footer_errors,
+            "checksum_errors": self.checksum_errors,
+            "bytes_received": self.bytes_received,
+            "bytes_discarded": self.bytes_discarded,
+            "buffered": len(self._buf),
+        }
+
+
+def iter_frames_from_stream(
+    fp: BinaryIO,
+    parser: Optional[SensorCoreParser] = None,
+    chunk_size: int = 64 * 1024,
+) -> Iterator[SensorCoreFrame]:
+    """批量解析录制的原始字节日志，传入 parser 可在结束后读取错误计数"""
+    if parser is None:
+        parser = SensorCoreParser()
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            return
+        yield from parser.feed(chunk)
@@ -0,0 +1,191 @@
+"""
+SensorCore 采集服务
+独立串口 + 独立读线程持续接收 SensorCore 帧，只保留最新一帧及各字段的更新时刻，
+供 read_vibration_metrics 等调用方无阻塞地读取
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import serial
+
+from app.core.config import settings
+from app.services.sensorcore_protocol import (
+    SensorCoreFrame,
+    SensorCoreParser,
+    STATUS_CALIBRATED,
+    STATUS_NOT_READY,
+)
+from app.utils.logger import get_logger
+
+logger = get_logger("sensorcore-service")
+
+# 按传感器分组的字段，每组独立记录更新时刻
+FIELD_GROUPS: Dict[str, Tuple[str, ...]] = {
+    "speed": ("speed",),
+    "attitude": ("att_u", "att_v", "att_w"),
+    "vibration": ("vib_freq", "vib_mag", "vib_rms", "vib_ratio", "vib_impulse"),
+    "temperature": ("temp",),
+}
+
+FrameListener = Callable[[SensorCoreFrame, float], None]
+
+
+class SensorCoreService:
+    """
+    SensorCore 采集服务
+    读线程是唯一访问串口的线程；读者只在锁内拷贝最新帧引用，不会等待串口 I/O
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._parser = SensorCoreParser()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._serial: Optional[serial.Serial] = None
+        self._is_connected = False
+        self._latest: Optional[SensorCoreFrame] = None
+        self._latest_t: Optional[float] = None
+        self._field_updated: Dict[str, Optional[float]] = {name: None for name in FIELD_GROUPS}
+        self._listeners: List[FrameListener] = []
+
+    # ========== 生命周期 ==========
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="sensorcore-reader", daemon=True)
+        self._thread.start()
+        logger.info(f"SensorCore 采集线程已启动 - 串口: {settings.SENSORCORE_PORT}")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self._close_serial()
+        logger.info("SensorCore 采集线程已停止")
+
+    def add_listener(self, listener: FrameListener) -> None:
+        """注册新帧回调 (frame, t_mono)，在读线程中调用，需自行保证线程安全且足够快"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def _open_serial(self) -> bool:
+        try:
+            self._serial = serial.Serial(
+                port=settings.SENSORCORE_PORT,
+                baudrate=settings.SENSORCORE_BAUDRATE,
+                timeout=0.1,
+            )
+            self._is_connected = True
+            self._parser.reset()
+            logger.info(f"SensorCore 串口连接成功 - 串口: {settings.SENSORCORE_PORT}, 波特率: {settings.SENSORCORE_BAUDRATE}")
+            return True
+        except (serial.SerialException, OSError) as e:
+            logger.error(f"SensorCore 串口连接失败 - 串口: {settings.SENSORCORE_PORT}, 错误: {e}")
+            self._serial = None
+            self._is_connected = False
+            return False
+
+    def _close_serial(self) -> None:
+        if self._serial is not None:
+            try:
+                self._serial.close()
+            except Exception:
+                pass
+            self._serial = None
+        self._is_connected = False
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            if self._serial is None and not self._open_serial():
+                self._stop_event.wait(settings.SENSORCORE_RECONNECT_INTERVAL)
+                continue
+            try:
+                # 有数据时一次取完，无数据时最多阻塞 timeout（0.1s）等一个字节
+                data = self._serial.read(self._serial.in_waiting or 1)
+            except (serial.SerialException, OSError) as e:
+                logger.error(f"SensorCore 串口读取失败: {e}")
+                self._close_serial()
+                continue
+            if data:
+                for frame in self._parser.feed(data):
+                    self.ingest(frame)
+
+    # ========== 数据 ==========
+
+    def ingest(self, frame: SensorCoreFrame, t_mono: Optional[float] = None) -> None:
+        """
+        更新最新帧（读线程调用，也可直接注入录制的帧）
+        振动/姿态字段在传感器报告数据未就绪时不刷新（保留上一次有效值），以便通过更新时刻判断数据是否陈旧；
+        帧回调收到的是原始帧
+        """
+        if t_mono is None:
+            t_mono = time.monotonic()
+        with self._lock:
+            self._latest_t = t_mono
+            self._field_updated["speed"] = t_mono
+            self._field_updated["temperature"] = t_mono
+            if frame.status != STATUS_NOT_READY:
+                self._field_updated["vibration"] = t_mono
+            if frame.status == STATUS_CALIBRATED:
+                self._field_updated["attitude"] = t_mono
+            # 未就绪的字段组沿用上一次有效帧的值，最新帧与更新时刻保持一致
+            merged = frame
+            previous = self._latest
+            if previous is not None:
+                for group in ("vibration", "attitude"):
+                    if self._field_updated[group] != t_mono:
+                        merged = merged._replace(**{name: getattr(previous, name) for name in FIELD_GROUPS[group]})
+            self._latest = merged
+        for listener in self._listeners:
+            try:
+                listener(frame, t_mono)
+            except Exception as e:
+                logger.error(f"SensorCore 帧回调失败: {e}", exc_info=True)
+
+    def latest(self) -> Tuple[Optional[SensorCoreFrame], Dict[str, Optional[float]]]:
+        """返回 (最新帧, 各字段组的更新时刻 time.monotonic)，不做任何 I/O"""
+        with self._lock:
+            return self._latest, dict(self._field_updated)
+
+    def field_ages(self) -> Dict[str, Optional[float]]:
+        """各字段组距上次更新的秒数，从未更新为 None"""
+        now = time.monotonic()
+        _, updated = self.latest()
+        return {name: (None if t is None else now - t) for name, t in updated.items()}
+
+    def is_fresh(self, group: str) -> bool:
+        _, updated = self.latest()
+        t = updated.get(group)
+        return t is not None and time.monotonic() - t <= settings.SENSORCORE_STALE_TIMEOUT
+
+    def snapshot(self) -> Dict[str, Any]:
+        frame, _ = self.latest()
+        values = None
+        if frame is not None:
+            values = {
+                "speed": frame.speed,
+                "status": frame.status,
+                "attitude": {"u": frame.att_u, "v": frame.att_v, "w": frame.att_w},
+                "vib_freq": frame.vib_freq,
+                "vib_peak": frame.peak,
+                "vib_rms": frame.rms,
+                "vib_ratio": frame.vib_ratio,
+                "vib_impulse": frame.vib_impulse,
+                "temperature": frame.temperature,
+            }
+        return {
+            "enabled": settings.SENSORCORE_ENABLED,
+            "connected": self._is_connected,
+            "values": values,
+            "field_age_s": self.field_ages(),
+            "stale_timeout_s": settings.SENSORCORE_STALE_TIMEOUT,
+            "parser": self._parser.stats(),
+        }
+
+
+# 创建全局 SensorCore 服务实例
+sensorcore_service = SensorCoreService()
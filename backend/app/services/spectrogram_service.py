@@ -0,0 +1,192 @@
+"""
+时频图（瀑布图）服务
+把缓存中的原始振动波形按固定网格切成瓦片：每个瓦片覆盖 SPECTROGRAM_TILE_COLUMNS 列，
+每列宽 column_ms，列内各段 STFT 功率取平均后转为 dB。
+瓦片按 (瓦片序号, 列宽, FFT 点数) 缓存并做 LRU 淘汰，平移/缩放时只拼接已有瓦片，
+输出时再按请求的 dB 范围量化为 uint8（0 表示该列没有数据）
+
+原始波形只在内存中保留 WAVEFORM_BUFFER_SECONDS。瓦片时间段完全落在保留的数据内时才算完成（之后不再重算）；
+起点早于最早保留数据的瓦片只能算出部分列，波形淘汰后的时间段无法重建，只能返回缓存中已有的瓦片
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.spectrum_engine import SpectrumEngine
+from app.services.waveform_service import waveform_service
+from app.utils.logger import get_logger
+
+logger = get_logger("spectrogram-service")
+
+NPERSEG_CHOICES = (256, 512, 1024, 2048, 4096, 8192)
+
+TileKey = Tuple[int, int, int]   # (瓦片序号, 列宽 ms, FFT 点数)
+
+
+class _Tile(NamedTuple):
+    db: np.ndarray              # float32 [列, 频点]，无数据的列为 NaN
+    sample_rate: float
+    complete: bool              # 瓦片时间段完全落在计算时保留的波形内（结果不会再变）
+    version: int                # 计算时的波形块计数，用于判断未完成瓦片是否需要重算
+
+
+class Spectrogram(NamedTuple):
+    start_ms: int
+    column_ms: int
+    sample_rate: float
+    nperseg: int
+    intensity: np.ndarray       # uint8 [列, 频点]
+
+
+class SpectrogramService:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tiles: "OrderedDict[TileKey, _Tile]" = OrderedDict()
+        self._cache_bytes = 0
+        self._engines: Dict[int, SpectrumEngine] = {}
+        self._hits = 0
+        self._misses = 0
+
+    def _engine(self, nperseg: int) -> SpectrumEngine:
+        engine = self._engines.get(nperseg)
+        if engine is None:
+            engine = SpectrumEngine(
+                nperseg=nperseg,
+                overlap=settings.SPECTRUM_OVERLAP,
+                window=settings.SPECTRUM_WINDOW,
+                bands=[],
+                impulse_threshold=settings.SPECTRUM_IMPULSE_THRESHOLD,
+            )
+            self._engines[nperseg] = engine
+        return engine
+
+    # ========== 瓦片 ==========
+
+    def _compute_tile(self, index: int, column_ms: int, nperseg: int) -> Optional[_Tile]:
+        columns = settings.SPECTROGRAM_TILE_COLUMNS
+        tile_ms = columns * column_ms
+        start_ms = index * tile_ms
+        end_ms = start_ms + tile_ms
+        version = waveform_service.blocks_processed
+        blocks = waveform_service.blocks_between(start_ms, end_ms)
+        if not blocks:
+            return None
+
+        engine = self._engine(nperseg)
+        sample_rate = blocks[0].sample_rate
+        bins = nperseg // 2 + 1
+        acc = np.zeros((columns, bins), dtype=np.float64)
+        counts = np.zeros(columns, dtype=np.int64)
+
+        # 列宽较大时按步长抽取段，每列最多 SPECTROGRAM_MAX_SEGMENTS_PER_COLUMN 段
+        column_samples = column_ms * sample_rate / 1000.0
+        step = max(nperseg // 2, int(column_samples / settings.SPECTROGRAM_MAX_SEGMENTS_PER_COLUMN))
+
+        for block in blocks:
+            if block.sample_rate != sample_rate:
+                continue
+            offsets, psd = engine.segment_psd(block.samples, sample_rate, step)
+            if len(psd) == 0:
+                continue
+            # 以段中心时刻归列
+            centers_ms = block.timestamp_ms + (offsets + nperseg / 2) * 1000.0 / sample_rate
+            cols = np.floor((centers_ms - start_ms) / column_ms).astype(np.int64)
+            inside = (cols >= 0) & (cols < columns)
+            if not np.any(inside):
+                continue
+            cols = cols[inside]
+            np.add.at(acc, cols, psd[inside])
+            counts += np.bincount(cols, minlength=columns)
+
+        db = np.full((columns, bins), np.nan, dtype=np.float32)
+        filled = counts > 0
+        if np.any(filled):
+            mean_psd = acc[filled] / counts[filled, None]
+            db[filled] = 10.0 * np.log10(np.maximum(mean_psd, 1e-30))
+
+        # 只有时间段两端都被保留的数据覆盖时才算完成；起点已被淘汰的瓦片是残缺的，不能当作最终结果
+        retained = waveform_service.retained_range()
+        complete = retained is not None and retained[0] <= start_ms and retained[1] >= end_ms
+        return _Tile(db, sample_rate, complete, version)
+
+    def _get_tile(self, index: int, column_ms: int, nperseg: int) -> Optional[_Tile]:
+        key = (index, column_ms, nperseg)
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None and (tile.complete or tile.version == waveform_service.blocks_processed):
+                self._tiles.move_to_end(key)
+                self._hits += 1
+                return tile
+
+        tile = self._compute_tile(index, column_ms, nperseg)
+        with self._lock:
+            self._misses += 1
+            old = self._tiles.pop(key, None)
+            if old is not None:
+                self._cache_bytes -= old.db.nbytes
+            if tile is not None:
+                self._tiles[key] = tile
+                self._cache_bytes += tile.db.nbytes
+                limit = settings.SPECTROGRAM_CACHE_MB * 1024 * 1024
+                while self._cache_bytes > limit and len(self._tiles) > 1:
+                    _, evicted = self._tiles.popitem(last=False)
+                    self._cache_bytes -= evicted.db.nbytes
+        return tile
+
+    # ========== 查询 ==========
+
+    def render(
+        self,
+        start_ms: int,
+        end_ms: int,
+        column_ms: int,
+        nperseg: int,
+        db_min: float,
+        db_max: float,
+    ) -> Optional[Spectrogram]:
+        """拼接覆盖 [start_ms, end_ms) 的瓦片并量化为 uint8，没有任何波形数据时返回 None"""
+        columns = settings.SPECTROGRAM_TILE_COLUMNS
+        tile_ms = columns * column_ms
+        first = start_ms // tile_ms
+        last = (end_ms - 1) // tile_ms
+        bins = nperseg // 2 + 1
+
+        db = np.full(((last - first + 1) * columns, bins), np.nan, dtype=np.float32)
+        sample_rate = None
+        for i, index in enumerate(range(first, last + 1)):
+            tile = self._get_tile(index, column_ms, nperseg)
+            if tile is None:
+                continue
+            if sample_rate is None:
+                sample_rate = tile.sample_rate
+            if tile.sample_rate == sample_rate:
+                db[i * columns:(i + 1) * columns] = tile.db
+        if sample_rate is None:
+            return None
+
+        # 裁剪到请求范围（列对齐）
+        offset = (start_ms - first * tile_ms) // column_ms
+        count = -(-(end_ms - start_ms) // column_ms)
+        db = db[offset:offset + count]
+
+        scaled = (db - db_min) * (254.0 / (db_max - db_min))
+        intensity = np.zeros(db.shape, dtype=np.uint8)
+        valid = ~np.isnan(db)
+        intensity[valid] = (np.clip(scaled[valid], 0, 254) + 1).astype(np.uint8)
+        return Spectrogram(first * tile_ms + offset * column_ms, column_ms, sample_rate, nperseg, intensity)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "tiles": len(self._tiles),
+                "cache_bytes": self._cache_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+# 创建全局时频图服务实例
+spectrogram_service = SpectrogramService()
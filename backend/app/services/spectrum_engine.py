@@ -0,0 +1,158 @@
+"""
+振动频谱引擎
+对原始振动波形做加窗 FFT + Welch 平均，计算主频、RMS、峰值、冲击次数和频带能量
+
+分段使用 sliding_window_view（不拷贝），加窗写入预分配的分段缓冲；
+窗函数、频率轴和频带索引按 (采样率) 缓存，重复处理同规格的数据块时不再重新计算
+
+采样率由客户端给出，缓存按最近使用保留 MAX_PLANS 个；分段缓冲不超过 SEGMENT_BUFFER_BYTES，
+段数更多的数据块分批处理，不会把一次大块的峰值内存一直占着
+"""
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+WINDOWS = {
+    # 周期窗（去掉对称窗最后一点），适合频谱分析
+    "hann": lambda n: np.hanning(n + 1)[:-1],
+    "hamming": lambda n: np.hamming(n + 1)[:-1],
+    "blackman": lambda n: np.blackman(n + 1)[:-1],
+    "rect": lambda n: np.ones(n),
+}
+
+MAX_PLANS = 8
+SEGMENT_BUFFER_BYTES = 4 * 1024 * 1024
+
+
+class SpectrumResult(NamedTuple):
+    sample_rate: float
+    freqs: np.ndarray           # 频率轴 (Hz)
+    psd: np.ndarray             # 功率谱密度 (单位²/Hz)
+    main_freq: float            # 主频 (Hz，不含直流)
+    rms: float                  # 时域 RMS（去均值）
+    peak: float                 # 时域峰值（去均值后的最大绝对值）
+    impulse_count: int          # 超过 冲击阈值×RMS 的冲击次数
+    band_energy: List[float]    # 各频带能量（均方值，单位²）
+
+
+class _Plan(NamedTuple):
+    freqs: np.ndarray
+    band_slices: List[Tuple[int, int]]
+    scale: np.ndarray           # 每个频点的单边 PSD 缩放系数
+
+
+class SpectrumEngine:
+    def __init__(
+        self,
+        nperseg: int,
+        overlap: float,
+        window: str,
+        bands: Sequence[Sequence[float]],
+        impulse_threshold: float,
+    ) -> None:
+        if window not in WINDOWS:
+            raise ValueError(f"不支持的窗函数: {window}")
+        self.nperseg = nperseg
+        self.step = max(1, int(round(nperseg * (1.0 - overlap))))
+        self.bands = [(float(lo), float(hi)) for lo, hi in bands]
+        self.impulse_threshold = impulse_threshold
+        self._window = WINDOWS[window](nperseg).astype(np.float64)
+        self._window_power = float(np.sum(self._window ** 2))
+        self._plans: "OrderedDict[float, _Plan]" = OrderedDict()
+        self._max_segments = max(1, SEGMENT_BUFFER_BYTES // (nperseg * 8))
+        self._segments = np.empty((0, nperseg), dtype=np.float64)
+        self._lock = threading.Lock()
+
+    def _plan(self, sample_rate: float) -> _Plan:
+        plan = self._plans.get(sample_rate)
+        if plan is not None:
+            self._plans.move_to_end(sample_rate)
+        else:
+            freqs = np.fft.rfftfreq(self.nperseg, d=1.0 / sample_rate)
+            band_slices = [
+                (int(np.searchsorted(freqs, lo, side="left")), int(np.searchsorted(freqs, hi, side="left")))
+                for lo, hi in self.bands
+            ]
+            scale = np.full(len(freqs), 2.0 / (sample_rate * self._window_power))
+            scale[0] /= 2.0
+            if self.nperseg % 2 == 0:
+                scale[-1] /= 2.0
+            plan = _Plan(freqs, band_slices, scale)
+            self._plans[sample_rate] = plan
+            while len(self._plans) > MAX_PLANS:
+                self._plans.popitem(last=False)
+        return plan
+
+    def _segment_buffer(self, count: int) -> np.ndarray:
+        """count 不超过 self._max_segments"""
+        if self._segments.shape[0] < count:
+            self._segments = np.empty((count, self.nperseg), dtype=np.float64)
+        return self._segments[:count]
+
+    def freqs(self, sample_rate: float) -> np.ndarray:
+        with self._lock:
+            return self._plan(sample_rate).freqs
+
+    def welch(self, samples: np.ndarray, sample_rate: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Welch 平均功率谱密度（单边）"""
+        with self._lock:
+            return self._welch_locked(np.asarray(samples, dtype=np.float64), sample_rate)
+
+    def segment_psd(self, samples: np.ndarray, sample_rate: float, step: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        逐段功率谱密度（不平均），用于时频图
+        返回 (各段起始样本下标, psd[段, 频点])；样本不足一段时返回空数组
+        """
+        x = np.asarray(samples, dtype=np.float64)
+        if len(x) < self.nperseg:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.nperseg // 2 + 1))
+        with self._lock:
+            power = self._segment_power_locked(x, step)
+            psd = power * self._plan(sample_rate).scale
+        return np.arange(len(psd), dtype=np.int64) * step, psd
+
+    def _segment_power_locked(self, x: np.ndarray, step: int) -> np.ndarray:
+        views = sliding_window_view(x, self.nperseg)[::step]
+        power = np.empty((len(views), self.nperseg // 2 + 1), dtype=np.float64)
+        for start in range(0, len(views), self._max_segments):
+            batch = views[start:start + self._max_segments]
+            segments = self._segment_buffer(len(batch))
+            # 每段去均值后加窗，结果写入预分配缓冲
+            np.subtract(batch, batch.mean(axis=1, keepdims=True), out=segments)
+            segments *= self._window
+            spectrum = np.fft.rfft(segments, axis=1)
+            np.add(spectrum.real ** 2, spectrum.imag ** 2, out=power[start:start + len(batch)])
+        return power
+
+    def _welch_locked(self, x: np.ndarray, sample_rate: float) -> Tuple[np.ndarray, np.ndarray]:
+        plan = self._plan(sample_rate)
+        if len(x) < self.nperseg:
+            x = np.pad(x, (0, self.nperseg - len(x)))
+        psd = self._segment_power_locked(x, self.step).mean(axis=0) * plan.scale
+        return plan.freqs, psd
+
+    def analyze(self, samples: np.ndarray, sample_rate: float) -> SpectrumResult:
+        x = np.asarray(samples, dtype=np.float64)
+        with self._lock:
+            freqs, psd = self._welch_locked(x, sample_rate)
+            band_slices = self._plan(sample_rate).band_slices
+
+        centered = x - x.mean()
+        rms = float(np.sqrt(np.mean(centered ** 2)))
+        magnitude = np.abs(centered)
+        peak = float(magnitude.max()) if len(magnitude) else 0.0
+
+        # 冲击：|x| 上穿 阈值×RMS 的次数
+        impulse_count = 0
+        if rms > 0:
+            above = magnitude > self.impulse_threshold * rms
+            impulse_count = int(np.count_nonzero(above[1:] & ~above[:-1]) + int(above[0]))
+
+        main_freq = float(freqs[1 + int(np.argmax(psd[1:]))]) if len(psd) > 1 else 0.0
+        df = freqs[1] - freqs[0]
+        band_energy = [float(psd[lo:hi].sum() * df) for lo, hi in band_slices]
+
+        return SpectrumResult(sample_rate, freqs, psd, main_freq, rms, peak, impulse_count, band_energy)
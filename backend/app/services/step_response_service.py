@@ -0,0 +1,377 @@
+"""
+阶跃响应 / 系统辨识实验
+对驱动器施加一次转速（6003）或电流（6002）阶跃，实验期间由专用线程以 STEP_TEST_SAMPLE_HZ
+直接读取输入寄存器块，写入环形缓冲；结束后：
+
+- 阶跃指标：上升时间（10%→90%）、超调量、调节时间（±STEP_TEST_SETTLING_BAND）、纯滞后、稳态值
+- 模型拟合：一阶加纯滞后（K, τ, θ）和二阶加纯滞后（K, ωn, ζ, θ）。增益是线性参数，
+  对整批候选 (θ, τ) / (θ, ωn, ζ) 的解析阶跃响应一次性求最小二乘增益和残差（矩阵运算，不逐个拟合），
+  网格先粗后细两轮；直接拟合阶跃响应曲线（输出误差），不受 ARX 方程误差的噪声偏置影响
+
+结果追加写入 JSON Lines 文件，便于调整加减速（6016/6025）后重复实验对比。
+simulate=true 时不访问总线，用内置的二阶加滞后模型产生响应（验证拟合流程、离线演示）
+"""
+import json
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.modbus_service import modbus_service
+from app.utils.logger import get_logger
+from app.utils.ring_buffer import RingBuffer
+
+logger = get_logger("step-response")
+
+EMPTY_MODE = 0xFFFF
+CHANNELS = {"speed": "rpm", "current": "motor_current"}
+
+
+# ========== 指标与拟合 ==========
+
+def step_metrics(t: np.ndarray, y: np.ndarray, t_step: float, y0: float, target: float) -> Dict[str, Optional[float]]:
+    """阶跃指标，t 为秒，阶跃发生在 t_step；y0 为阶跃前稳态值"""
+    after = t >= t_step
+    t, y = t[after] - t_step, y[after] - y0
+    tail = max(1, len(y) // 10)
+    final = float(np.mean(y[-tail:]))
+    result: Dict[str, Optional[float]] = {
+        "initial": y0,
+        "final": final + y0,
+        "steady_state_error": target - (final + y0),
+        "dead_time": None, "rise_time": None, "overshoot_percent": None, "settling_time": None,
+    }
+    if abs(final) < 1e-9 or len(y) < 3:
+        return result
+    # 统一成正向阶跃
+    r = y / final
+
+    def first_crossing(level: float) -> Optional[float]:
+        idx = np.flatnonzero(r >= level)
+        if len(idx) == 0:
+            return None
+        i = idx[0]
+        if i == 0:
+            return float(t[0])
+        # 相邻两点线性插值
+        return float(t[i - 1] + (level - r[i - 1]) / (r[i] - r[i - 1]) * (t[i] - t[i - 1]))
+
+    t10, t90 = first_crossing(0.1), first_crossing(0.9)
+    result["dead_time"] = first_crossing(0.02)
+    result["rise_time"] = t90 - t10 if t10 is not None and t90 is not None else None
+    result["overshoot_percent"] = max(0.0, float(r.max()) - 1.0) * 100.0
+    outside = np.flatnonzero(np.abs(r - 1.0) > settings.STEP_TEST_SETTLING_BAND)
+    if len(outside) == 0:
+        result["settling_time"] = 0.0
+    elif outside[-1] < len(r) - 1:
+        result["settling_time"] = float(t[outside[-1] + 1])
+    return result
+
+
+FIT_MAX_POINTS = 500      # 拟合前降采样到的最大点数，控制批量矩阵大小
+FIT_GRID = 40             # 每个非线性参数每轮的网格点数
+
+
+def first_order_step(t: np.ndarray, tau: np.ndarray) -> np.ndarray:
+    """一阶单位阶跃响应，t 形状 (N,) 或 (M, N)，tau 形状 (M,)，返回 (M, N)；t < 0 处为 0"""
+    tt = np.atleast_2d(np.maximum(t, 0.0))
+    return 1.0 - np.exp(-tt / tau[:, None])
+
+
+def second_order_step(t: np.ndarray, wn: np.ndarray, zeta: np.ndarray) -> np.ndarray:
+    """二阶单位阶跃响应，wn/zeta 形状 (M,)，返回 (M, N)；欠阻尼和过阻尼分别用各自的稳定形式"""
+    tt = np.atleast_2d(np.maximum(t, 0.0))
+    y = np.empty((len(wn), tt.shape[1]))
+    under = zeta < 1.0
+    if np.any(under):
+        w, z = wn[under, None], zeta[under, None]
+        wd = w * np.sqrt(1.0 - z ** 2)
+        y[under] = 1.0 - np.exp(-z * w * tt) * (np.cos(wd * tt) + z / np.sqrt(1.0 - z ** 2) * np.sin(wd * tt))
+    over = ~under
+    if np.any(over):
+        w, z = wn[over, None], zeta[over, None]
+        root = np.sqrt(z ** 2 - 1.0)
+        s1, s2 = -w * (z - root), -w * (z + root)      # 两个负实极点，指数都衰减，不会溢出
+        y[over] = 1.0 - (s2 * np.exp(s1 * tt) - s1 * np.exp(s2 * tt)) / (s2 - s1)
+    return y
+
+
+def _best_gain_fit(responses: np.ndarray, y: np.ndarray) -> Tuple[int, float, float]:
+    """
+    对一批候选单位响应 g（形状 (M, N)）求 y ≈ K·g 的最小二乘增益（闭式 K = <g,y>/<g,g>），
+    返回 (最优候选下标, 增益, 残差 RMS)
+    """
+    gg = np.einsum("mn,mn->m", responses, responses)
+    gy = responses @ y
+    gain = np.divide(gy, gg, out=np.zeros_like(gy), where=gg > 0)
+    sse = np.einsum("n,n->", y, y) - gain * gy
+    best = int(np.argmin(sse))
+    return best, float(gain[best]), float(np.sqrt(max(sse[best], 0.0) / len(y)))
+
+
+def _refine(best: float, grid: np.ndarray, log: bool) -> np.ndarray:
+    """在上一轮最优值两侧各一个网格步长内加密"""
+    i = int(np.clip(np.searchsorted(grid, best), 1, len(grid) - 1))
+    lo, hi = grid[max(i - 2, 0)], grid[min(i + 1, len(grid) - 1)]
+    return np.geomspace(lo, hi, FIT_GRID) if log else np.linspace(lo, hi, FIT_GRID)
+
+
+def fit_models(t: np.ndarray, y: np.ndarray, t_step: float, y0: float, du: float) -> Dict[str, Any]:
+    """
+    在阶跃后的数据上拟合 一阶 / 二阶 加纯滞后 模型：y - y0 = K·Δu·g(t - t_step - θ)
+    非线性参数（θ、τ 或 ωn、ζ）用两轮网格（粗 → 细）搜索，每轮所有候选的增益和残差一次性批量求解
+    """
+    after = t >= t_step
+    tr, yd = t[after] - t_step, (y[after] - y0) / du if du else y[after] - y0
+    if len(tr) > FIT_MAX_POINTS:
+        grid = np.linspace(tr[0], tr[-1], FIT_MAX_POINTS)
+        yd, tr = np.interp(grid, tr, yd), grid
+    span = max(float(tr[-1]), 1e-3)
+    ts = span / max(len(tr) - 1, 1)
+    delays = np.linspace(0.0, min(settings.STEP_TEST_MAX_DELAY, span / 2), FIT_GRID)
+
+    # 一阶：θ × τ
+    taus = np.geomspace(ts / 2, span * 2, FIT_GRID)
+    theta_grid = delays
+    for _ in range(2):
+        theta, tau = (g.ravel() for g in np.meshgrid(theta_grid, taus, indexing="ij"))
+        best, gain1, rms1 = _best_gain_fit(first_order_step(tr[None, :] - theta[:, None], tau), yd)
+        theta1, tau1 = float(theta[best]), float(tau[best])
+        theta_grid, taus = _refine(theta1, theta_grid, log=False), _refine(tau1, taus, log=True)
+    # 二阶：θ × ωn × ζ（θ 单独循环，控制内存）
+    wns = np.geomspace(2.0 * math.pi / (span * 4), math.pi / ts, FIT_GRID)
+    zetas = np.linspace(0.05, 3.0, FIT_GRID) + 1e-6      # 避开 ζ = 1 的 0/0
+    theta_grid = delays[::2]
+    for _ in range(2):
+        w, z = (g.ravel() for g in np.meshgrid(wns, zetas, indexing="ij"))
+        best_fit = None
+        for theta in theta_grid:
+            fit = _best_gain_fit(second_order_step(tr - theta, w, z), yd)
+            if best_fit is None or fit[2] < best_fit[0][2]:
+                best_fit = (fit, float(theta))
+        (best, gain2, rms2), theta2 = best_fit
+        wn2, zeta2 = float(w[best]), float(z[best])
+        theta_grid = _refine(theta2, theta_grid, log=False)[::4]
+        wns, zetas = _refine(wn2, wns, log=True), _refine(zeta2, zetas, log=False)
+
+    scale = abs(du) if du else 1.0
+    return {
+        "first_order": {"gain": gain1, "time_constant": tau1, "dead_time": theta1, "fit_rms": rms1 * scale},
+        "second_order": {
+            "gain": gain2, "natural_frequency_hz": wn2 / (2.0 * math.pi), "damping_ratio": zeta2,
+            "dead_time": theta2, "fit_rms": rms2 * scale,
+        },
+        # 二阶多两个参数，残差需明显更小（10%）才选二阶
+        "best": "second_order" if rms2 < 0.9 * rms1 else "first_order",
+    }
+
+
+# ========== 仿真对象 ==========
+
+class SimulatedDrive:
+    """二阶加纯滞后的驱动器模型（simulate=true 时代替总线）"""
+
+    def __init__(self, gain: float = 1.0, natural_hz: float = 2.0, damping: float = 0.6,
+                 dead_time: float = 0.03, noise: float = 0.005) -> None:
+        self.gain, self.wn, self.zeta = gain, 2.0 * math.pi * natural_hz, damping
+        self.dead_time, self.noise = dead_time, noise
+        self._rng = np.random.default_rng()
+
+    def response(self, t: np.ndarray, setpoint: np.ndarray) -> np.ndarray:
+        dt = np.diff(t, prepend=t[0])
+        y = np.empty(len(t))
+        pos, vel = float(setpoint[0]) * self.gain, 0.0
+        for k in range(len(t)):
+            # 半隐式欧拉积分 x'' = wn²·(K·u(t-θ) - x) - 2ζ·wn·x'
+            delayed = np.interp(t[k] - self.dead_time, t, setpoint, left=setpoint[0])
+            vel += (self.wn ** 2 * (self.gain * delayed - pos) - 2.0 * self.zeta * self.wn * vel) * dt[k]
+            pos += vel * dt[k]
+            y[k] = pos
+        scale = max(abs(float(setpoint[-1])), abs(float(setpoint[0])), 1.0)
+        return y + self._rng.normal(0.0, self.noise * scale, len(y))
+
+
+# ========== 实验执行 ==========
+
+class StepResponseRunner:
+    def __init__(self, results_file: Optional[str] = None) -> None:
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._results_file = Path(results_file or settings.STEP_TEST_RESULTS_FILE)
+        self._state = "idle"          # idle / running / completed / cancelled / failed
+        self._message = ""
+        self._request: Optional[Dict[str, Any]] = None
+        self._latest: Optional[Dict[str, Any]] = None
+        self._ids = 0
+
+    def start(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        request: mode (speed/current)、initial、final、pre_seconds、duration、
+                 acceleration/deceleration（erpm/s，可选，实验前写入）、restore、simulate
+        """
+        if request["mode"] not in CHANNELS:
+            raise ValueError(f"不支持的阶跃模式: {request['mode']}")
+        if not request.get("simulate") and not settings.USE_MODBUS:
+            raise ValueError("ModbusRTU 未启用，只能使用 simulate=true")
+        total = request["pre_seconds"] + request["duration"]
+        if total > settings.STEP_TEST_MAX_SECONDS:
+            raise ValueError(f"实验时长 {total:.1f}s 超过上限 {settings.STEP_TEST_MAX_SECONDS:.0f}s")
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                raise RuntimeError("阶跃实验正在执行")
+            self._ids += 1
+            self._request = dict(request, test_id=self._ids)
+            self._state = "running"
+            self._message = ""
+            self._cancel.clear()
+            self._thread = threading.Thread(target=self._run, args=(self._request,), name="step-response", daemon=True)
+            self._thread.start()
+        logger.info(f"阶跃实验 {self._ids} 开始: {request['mode']} {request['initial']} → {request['final']}")
+        return self.status()
+
+    def is_driving(self) -> bool:
+        """是否有正在直接写驱动器的实验（仿真实验不访问总线）"""
+        with self._lock:
+            return (
+                self._thread is not None and self._thread.is_alive()
+                and self._request is not None and not self._request.get("simulate")
+            )
+
+    def cancel(self) -> Dict[str, Any]:
+        self._cancel.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        return self.status()
+
+    def _run(self, request: Dict[str, Any]) -> None:
+        try:
+            if request.get("simulate"):
+                t, u, y = self._simulate(request)
+            else:
+                t, u, y = self._capture(request)
+            if self._cancel.is_set():
+                self._finish("cancelled")
+                return
+            result = self._analyze(request, t, u, y)
+            self._save(result)
+            with self._lock:
+                self._latest = result
+            self._finish("completed")
+        except Exception as e:
+            logger.error(f"阶跃实验失败: {e}", exc_info=True)
+            self._finish("failed", str(e))
+
+    def _simulate(self, request: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        hz = settings.STEP_TEST_SAMPLE_HZ
+        t = np.arange(0.0, request["pre_seconds"] + request["duration"], 1.0 / hz)
+        u = np.where(t >= request["pre_seconds"], request["final"], request["initial"]).astype(np.float64)
+        return t, u, SimulatedDrive().response(t, u)
+
+    def _capture(self, request: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        mode, initial, final = request["mode"], request["initial"], request["final"]
+        if request.get("acceleration"):
+            modbus_service.set_acceleration(int(request["acceleration"]))
+        if request.get("deceleration"):
+            modbus_service.set_deceleration(int(request["deceleration"]))
+
+        write = modbus_service.set_rpm if mode == "speed" else modbus_service.set_current
+        if not write(initial) or not modbus_service.set_mode(1 if mode == "speed" else 0, use_empty_mode=True):
+            raise RuntimeError("写入初始设定值失败")
+
+        hz = settings.STEP_TEST_SAMPLE_HZ
+        total = request["pre_seconds"] + request["duration"]
+        buffer = RingBuffer(int(total * hz * 1.5) + 16, ("t", "setpoint", "value"))
+        channel = CHANNELS[mode]
+        start = time.monotonic()
+        setpoint, stepped, k = initial, False, 0
+        try:
+            while not self._cancel.is_set():
+                now = time.monotonic() - start
+                if now >= total:
+                    break
+                if not stepped and now >= request["pre_seconds"]:
+                    if not write(final):
+                        raise RuntimeError("写入阶跃设定值失败")
+                    setpoint, stepped = final, True
+                    now = time.monotonic() - start
+                regs = modbus_service.read_input_block()
+                if regs is not None:
+                    value = modbus_service.decode_input_block(regs)[channel]
+                    buffer.append((time.monotonic() - start, setpoint, value))
+                # 按固定节拍读取（总线跟不上时就是总线能达到的最高速率）
+                k += 1
+                self._cancel.wait(max(0.0, start + k / hz - time.monotonic()))
+        finally:
+            if self._cancel.is_set() or request.get("restore", True):
+                modbus_service.set_mode(EMPTY_MODE, use_empty_mode=False)
+        data = buffer.latest()
+        if len(data) < 10:
+            raise RuntimeError(f"采集到的样本太少: {len(data)}")
+        return data[:, 0], data[:, 1], data[:, 2]
+
+    def _analyze(self, request: Dict[str, Any], t: np.ndarray, u: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
+        t_step = float(request["pre_seconds"])
+        pre = t < t_step
+        y0 = float(np.mean(y[pre])) if np.any(pre) else float(y[0])
+        return {
+            "test_id": request["test_id"],
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "mode": request["mode"],
+            "initial": request["initial"],
+            "final": request["final"],
+            "acceleration": request.get("acceleration"),
+            "deceleration": request.get("deceleration"),
+            "simulated": bool(request.get("simulate")),
+            "samples": int(len(t)),
+            "achieved_sample_hz": float((len(t) - 1) / (t[-1] - t[0])) if len(t) > 1 else 0.0,
+            "metrics": step_metrics(t, y, t_step, y0, request["final"]),
+            "model": fit_models(t, y, t_step, y0, request["final"] - request["initial"]),
+        }
+
+    def _save(self, result: Dict[str, Any]) -> None:
+        try:
+            self._results_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self._results_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.error(f"保存阶跃实验结果失败: {e}")
+
+    def _finish(self, state: str, message: str = "") -> None:
+        with self._lock:
+            self._state = state
+            self._message = message
+        logger.info(f"阶跃实验结束: {state}" + (f"（{message}）" if message else ""))
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._state,
+                "message": self._message,
+                "request": self._request,
+                "latest": self._latest,
+            }
+
+    def results(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """历史实验结果（最新在前）"""
+        if not self._results_file.exists():
+            return []
+        lines = self._results_file.read_text(encoding="utf-8").splitlines()
+        results = []
+        for line in reversed(lines):
+            try:
+                results.append(json.loads(line))
+            except ValueError:
+                continue
+            if len(results) >= limit:
+                break
+        return results
+
+
+# 创建全局阶跃实验实例
+step_response_runner = StepResponseRunner()
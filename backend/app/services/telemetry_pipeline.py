@@ -0,0 +1,73 @@
+"""
+遥测数据管道
+实时轮询、模拟数据和回放都通过 publish() 发布样本，
+由这里统一更新 control_service、写历史存储并分发给注册的下游消费者
+"""
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from app.core.config import settings
+from app.schemas.motor_schemas import MotorStatus, VibrationMetrics
+from app.services.control_service import control_service
+from app.services.history_service import history_store
+from app.utils.logger import get_logger
+
+logger = get_logger("telemetry-pipeline")
+
+
+class TelemetrySample(NamedTuple):
+    t_mono: float                          # 采样时刻（time.monotonic，秒）
+    timestamp_ms: int                      # 采样时刻（墙钟，毫秒）
+    motor_status: MotorStatus
+    vibration_metrics: VibrationMetrics
+    registers: Optional[Dict[str, float]]  # 解码后的输入寄存器（见 decode_input_block），模拟数据为 None
+    replayed: bool = False
+
+
+Consumer = Callable[[TelemetrySample], None]
+
+_consumers: List[Consumer] = []
+
+
+def register_consumer(consumer: Consumer) -> None:
+    """注册下游消费者，每个样本发布时同步调用（应只做 O(1) 的轻量处理）"""
+    if consumer not in _consumers:
+        _consumers.append(consumer)
+
+
+def unregister_consumer(consumer: Consumer) -> None:
+    if consumer in _consumers:
+        _consumers.remove(consumer)
+
+
+def publish(
+    motor_status: MotorStatus,
+    vibration_metrics: VibrationMetrics,
+    registers: Optional[Dict[str, float]] = None,
+    t_mono: Optional[float] = None,
+    timestamp_ms: Optional[int] = None,
+    replayed: bool = False,
+) -> TelemetrySample:
+    """发布一个样本；回放样本不会再次写入历史存储"""
+    sample = TelemetrySample(
+        t_mono=time.monotonic() if t_mono is None else t_mono,
+        timestamp_ms=int(time.time() * 1000) if timestamp_ms is None else timestamp_ms,
+        motor_status=motor_status,
+        vibration_metrics=vibration_metrics,
+        registers=registers,
+        replayed=replayed,
+    )
+
+    control_service.update_motor_status(motor_status)
+    control_service.update_vibration_metrics(vibration_metrics)
+
+    if settings.HISTORY_ENABLED and not replayed:
+        history_store.append_status(motor_status, sample.timestamp_ms)
+
+    for consumer in _consumers:
+        try:
+            consumer(sample)
+        except Exception as e:
+            logger.error(f"遥测消费者 {getattr(consumer, '__qualname__', consumer)} 处理失败: {e}", exc_info=True)
+
+    return sample
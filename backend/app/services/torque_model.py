@@ -0,0 +1,186 @@
+"""
+电流 × 温度 → 转矩 标定模型
+标定表为二维网格：行是温度，列是电流（均升序），值是转矩 (N·m)。
+正向（读回）和反向（设定值）都用向量化的双线性插值：
+先在温度方向插值出该温度下的 电流→转矩 曲线，再在电流方向插值/反查。
+
+- 读回：电流超出表范围时按最后一段斜率线性外推（饱和段斜率已变小）
+- 设定：目标转矩超过该温度下表内最大转矩时，电流限制在表内最大电流并标记饱和
+
+未配置标定文件时退化为 TORQUE_CURRENT_RATIO 的线性模型，与原来的行为一致。
+
+标定文件为 CSV（宽表），第一列为电流，其余列名为温度：
+    current_a,25,60,90
+    0,0,0,0
+    2.0,0.80,0.78,0.75
+    ...
+"""
+import csv
+import threading
+from pathlib import Path
+from typing import Sequence, Tuple, Union
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("torque-model")
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+# 线性模型的电流上限：设定电流寄存器为 short、单位 10mA，最大 327.67A
+LINEAR_MAX_CURRENT = 327.67
+
+
+class TorqueModel:
+    def __init__(
+        self,
+        currents: Sequence[float],
+        temperatures: Sequence[float],
+        table: Sequence[Sequence[float]],
+        source: str = "",
+    ) -> None:
+        self.currents = np.asarray(currents, dtype=np.float64)
+        self.temperatures = np.asarray(temperatures, dtype=np.float64)
+        self.table = np.asarray(table, dtype=np.float64)
+        self.source = source
+        self._validate()
+
+    def _validate(self) -> None:
+        if self.currents.ndim != 1 or len(self.currents) < 2:
+            raise ValueError("标定表至少需要两个电流点")
+        if self.temperatures.ndim != 1 or len(self.temperatures) < 1:
+            raise ValueError("标定表至少需要一个温度列")
+        if self.table.shape != (len(self.temperatures), len(self.currents)):
+            raise ValueError(f"标定表形状 {self.table.shape} 与网格 ({len(self.temperatures)}, {len(self.currents)}) 不一致")
+        if np.any(np.diff(self.currents) <= 0) or np.any(np.diff(self.temperatures) <= 0):
+            raise ValueError("标定表的电流和温度必须严格升序")
+        if self.currents[0] < 0:
+            raise ValueError("标定表电流必须非负（按电流绝对值查表）")
+        if np.any(np.diff(self.table, axis=1) <= 0):
+            raise ValueError("每个温度下转矩必须随电流严格递增，否则无法反查电流")
+
+    # ========== 构造 / 存储 ==========
+
+    @classmethod
+    def linear(cls, ratio: float) -> "TorqueModel":
+        return cls([0.0, LINEAR_MAX_CURRENT], [25.0], [[0.0, LINEAR_MAX_CURRENT * ratio]], source="linear")
+
+    @classmethod
+    def from_csv(cls, path: Union[str, Path]) -> "TorqueModel":
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = [row for row in csv.reader(f) if row and not row[0].startswith("#")]
+        header, body = rows[0], rows[1:]
+        temperatures = [float(t) for t in header[1:]]
+        data = np.array([[float(v) for v in row] for row in body])
+        return cls(data[:, 0], temperatures, data[:, 1:].T, source=str(path))
+
+    def to_csv(self, path: Union[str, Path]) -> None:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["current_a"] + [f"{t:g}" for t in self.temperatures])
+            for i, current in enumerate(self.currents):
+                writer.writerow([f"{current:g}"] + [f"{v:.6g}" for v in self.table[:, i]])
+
+    # ========== 插值 ==========
+
+    def _curves(self, temperature: np.ndarray) -> np.ndarray:
+        """各温度下的 电流→转矩 曲线，形状 (N, 电流点数)；温度超出表范围时取边界"""
+        if len(self.temperatures) == 1:
+            return np.broadcast_to(self.table[0], (len(temperature), len(self.currents)))
+        t = np.clip(temperature, self.temperatures[0], self.temperatures[-1])
+        i = np.clip(np.searchsorted(self.temperatures, t, side="right") - 1, 0, len(self.temperatures) - 2)
+        w = (t - self.temperatures[i]) / (self.temperatures[i + 1] - self.temperatures[i])
+        return self.table[i] * (1.0 - w)[:, None] + self.table[i + 1] * w[:, None]
+
+    def torque(self, current: ArrayLike, temperature: ArrayLike) -> Union[float, np.ndarray]:
+        """电流 (A) + 温度 (°C) → 转矩 (N·m)，按电流绝对值计算"""
+        scalar = np.ndim(current) == 0 and np.ndim(temperature) == 0
+        c, t = np.broadcast_arrays(np.abs(np.atleast_1d(np.asarray(current, dtype=np.float64))),
+                                   np.atleast_1d(np.asarray(temperature, dtype=np.float64)))
+        curves = self._curves(t.ravel())
+        c = c.ravel()
+        rows = np.arange(len(c))
+        j = np.clip(np.searchsorted(self.currents, c, side="right") - 1, 0, len(self.currents) - 2)
+        frac = (c - self.currents[j]) / (self.currents[j + 1] - self.currents[j])
+        result = curves[rows, j] + frac * (curves[rows, j + 1] - curves[rows, j])
+        result = np.maximum(result, 0.0).reshape(t.shape)
+        return float(result[0]) if scalar else result
+
+    def current(self, torque: ArrayLike, temperature: ArrayLike) -> Tuple[Union[float, np.ndarray], Union[bool, np.ndarray]]:
+        """
+        转矩 (N·m) + 温度 (°C) → 所需电流 (A)，按转矩绝对值计算
+        返回 (电流, 是否饱和)；饱和时电流为表内最大电流
+        """
+        scalar = np.ndim(torque) == 0 and np.ndim(temperature) == 0
+        tau, t = np.broadcast_arrays(np.abs(np.atleast_1d(np.asarray(torque, dtype=np.float64))),
+                                     np.atleast_1d(np.asarray(temperature, dtype=np.float64)))
+        shape = tau.shape
+        curves = self._curves(t.ravel())
+        tau = tau.ravel()
+        rows = np.arange(len(tau))
+        # 每条曲线单调递增，"小于目标的点数 - 1" 即所在区间
+        j = np.clip(np.count_nonzero(curves < tau[:, None], axis=1) - 1, 0, len(self.currents) - 2)
+        lo, hi = curves[rows, j], curves[rows, j + 1]
+        result = self.currents[j] + (tau - lo) / (hi - lo) * (self.currents[j + 1] - self.currents[j])
+        saturated = tau > curves[:, -1]
+        result = np.where(saturated, self.currents[-1], np.maximum(result, 0.0))
+        if scalar:
+            return float(result[0]), bool(saturated[0])
+        return result.reshape(shape), saturated.reshape(shape)
+
+
+def load_torque_model() -> TorqueModel:
+    """按配置加载标定表，未配置或加载失败时使用线性模型"""
+    if settings.TORQUE_TABLE_FILE:
+        try:
+            model = TorqueModel.from_csv(settings.TORQUE_TABLE_FILE)
+            logger.info(
+                f"已加载转矩标定表: {settings.TORQUE_TABLE_FILE}（{len(model.currents)} 个电流点 × "
+                f"{len(model.temperatures)} 个温度）"
+            )
+            return model
+        except (OSError, ValueError, IndexError) as e:
+            logger.error(f"转矩标定表加载失败，使用线性模型 (TORQUE_CURRENT_RATIO): {e}")
+    return TorqueModel.linear(settings.TORQUE_CURRENT_RATIO)
+
+
+class _ModelHolder:
+    """持有当前模型，支持运行中重新加载标定表"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._model = load_torque_model()
+
+    @property
+    def model(self) -> TorqueModel:
+        return self._model
+
+    def reload(self) -> TorqueModel:
+        """
+        重新加载标定表；加载失败时保留当前模型并抛出 ValueError
+        （不能像启动时那样退回线性模型，否则已生效的标定会被静默替换）
+        """
+        if settings.TORQUE_TABLE_FILE:
+            try:
+                model = TorqueModel.from_csv(settings.TORQUE_TABLE_FILE)
+            except (OSError, ValueError, IndexError) as e:
+                logger.error(f"转矩标定表重新加载失败，保留当前模型 ({self._model.source}): {e}")
+                raise ValueError(f"Failed to load torque table {settings.TORQUE_TABLE_FILE}: {e}") from e
+            logger.info(f"已重新加载转矩标定表: {settings.TORQUE_TABLE_FILE}")
+        else:
+            model = TorqueModel.linear(settings.TORQUE_CURRENT_RATIO)
+        with self._lock:
+            self._model = model
+        return model
+
+    def torque(self, current: ArrayLike, temperature: ArrayLike):
+        return self._model.torque(current, temperature)
+
+    def current(self, torque: ArrayLike, temperature: ArrayLike):
+        return self._model.current(torque, temperature)
+
+
+# 创建全局转矩模型实例
+torque_model = _ModelHolder()
@@ -0,0 +1,189 @@
+"""
+安全看门狗线程
+心跳（6000）原先是 asyncio 任务：事件循环被慢处理函数、重连 sleep 或 GC 停顿阻塞时心跳会中断，
+而控制逻辑卡死但事件循环仍在转时心跳又会照常发送。
+
+看门狗是独立的 OS 线程，负责：
+
+- 按单调时钟的绝对节拍（HEARTBEAT_INTERVAL）发送心跳，不受事件循环阻塞影响
+- 检查事件循环活性：循环中的 ping 任务周期性递增计数器，
+  计数器超过 WATCHDOG_LOOP_TIMEOUT 秒未变化即认为控制面无响应
+- 控制面无响应时发送空模式（0xFFFF）停机，并暂停心跳（驱动器自身的心跳超时作为第二道保护）；
+  ping 恢复后重新发送心跳，但不会自动恢复运动
+- 记录唤醒抖动（实际唤醒 - 计划时刻）和相邻两次成功心跳的间隔
+
+WATCHDOG_THREAD_PRIORITY > 0 时尝试把线程设为 SCHED_FIFO 实时优先级（Linux，需要 CAP_SYS_NICE），
+失败则保持普通优先级；线程仍受 GIL 约束，但 CPython 每 5ms 切换一次线程，纯 Python 的阻塞不会饿死看门狗
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.services.modbus_service import modbus_service
+from app.utils.histogram import LatencyHistogram
+from app.utils.logger import get_logger
+
+logger = get_logger("watchdog-service")
+
+EMPTY_MODE = 0xFFFF
+
+
+class SafetyWatchdog:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ping_task: Optional[asyncio.Task] = None
+        self._ping = 0
+        self._last_ping_value = -1
+        self._last_ping_change: Optional[float] = None
+        self._tripped = False
+        self._trips = 0
+        self._last_trip_ms: Optional[int] = None
+        self._last_heartbeat: Optional[float] = None
+        self._heartbeats_sent = 0
+        self._heartbeats_failed = 0
+        self._heartbeats_withheld = 0
+        self._realtime = False
+        self.jitter = LatencyHistogram()
+        self.heartbeat_gap = LatencyHistogram()
+
+    # ========== 启动 / 停止 ==========
+
+    def start(self) -> None:
+        """在事件循环中调用：启动 ping 任务和看门狗线程"""
+        if self._ping_task is None or self._ping_task.done():
+            self._ping_task = asyncio.create_task(self._ping_loop())
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._last_ping_change = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name="safety-watchdog", daemon=True)
+            self._thread.start()
+            logger.info(
+                f"安全看门狗已启动：心跳间隔 {settings.HEARTBEAT_INTERVAL}s，"
+                f"事件循环超时 {settings.WATCHDOG_LOOP_TIMEOUT}s"
+            )
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._ping_task is not None and not self._ping_task.done():
+            self._ping_task.cancel()
+        if self._thread is not None:
+            self._thread.join(timeout=settings.HEARTBEAT_INTERVAL * 2)
+        logger.info("安全看门狗已停止")
+
+    async def _ping_loop(self) -> None:
+        """事件循环活性计数器"""
+        while True:
+            self._ping += 1
+            await asyncio.sleep(settings.WATCHDOG_PING_INTERVAL)
+
+    # ========== 看门狗线程 ==========
+
+    def _raise_priority(self) -> None:
+        priority = settings.WATCHDOG_THREAD_PRIORITY
+        if priority <= 0 or not hasattr(os, "sched_setscheduler"):
+            return
+        try:
+            # Linux 上 pid 0 表示调用线程本身
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+            self._realtime = True
+            logger.info(f"看门狗线程已设为 SCHED_FIFO 优先级 {priority}")
+        except (OSError, AttributeError) as e:
+            logger.warning(f"无法提升看门狗线程优先级（{e}），使用普通优先级")
+
+    def _run(self) -> None:
+        self._raise_priority()
+        interval = settings.HEARTBEAT_INTERVAL
+        deadline = time.monotonic()
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            self.jitter.record(max(0.0, now - deadline))
+            try:
+                self._tick(now)
+            except Exception as e:
+                logger.error(f"看门狗周期异常: {e}", exc_info=True)
+            deadline += interval
+            now = time.monotonic()
+            if now - deadline > interval:
+                # 落后超过一个周期（如串口长时间占用），从当前时刻重新对齐，不补发
+                deadline = now
+            self._stop_event.wait(max(0.0, deadline - now))
+
+    def _tick(self, now: float) -> None:
+        ping = self._ping
+        with self._lock:
+            if ping != self._last_ping_value:
+                self._last_ping_value = ping
+                self._last_ping_change = now
+            stalled = now - self._last_ping_change > settings.WATCHDOG_LOOP_TIMEOUT
+            trip = stalled and not self._tripped
+            recovered = not stalled and self._tripped
+            if trip:
+                self._tripped = True
+                self._trips += 1
+                self._last_trip_ms = int(time.time() * 1000)
+            elif recovered:
+                self._tripped = False
+
+        if trip:
+            logger.error(
+                f"事件循环 {now - self._last_ping_change:.1f}s 无响应，看门狗停机（空模式）并暂停心跳"
+            )
+            if settings.USE_MODBUS and not modbus_service.set_mode(EMPTY_MODE, use_empty_mode=False):
+                logger.error("看门狗停机：切换空模式失败")
+        elif recovered:
+            logger.warning("事件循环已恢复响应，恢复心跳（电机保持空模式，需要重新下发命令）")
+
+        if stalled:
+            self._heartbeats_withheld += 1
+            return
+        if not settings.USE_MODBUS:
+            return
+        if modbus_service.send_heartbeat():
+            sent = time.monotonic()
+            if self._last_heartbeat is not None:
+                self.heartbeat_gap.record(sent - self._last_heartbeat)
+            self._last_heartbeat = sent
+            self._heartbeats_sent += 1
+        else:
+            self._heartbeats_failed += 1
+            logger.warning("心跳发送失败")
+
+    # ========== 状态 ==========
+
+    def snapshot(self, include_buckets: bool = False) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            ping_age = now - self._last_ping_change if self._last_ping_change is not None else None
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "realtime_priority": self._realtime,
+                "heartbeat_interval": settings.HEARTBEAT_INTERVAL,
+                "loop_timeout": settings.WATCHDOG_LOOP_TIMEOUT,
+                "loop_ping_age_ms": ping_age * 1000.0 if ping_age is not None else None,
+                "tripped": self._tripped,
+                "trips": self._trips,
+                "last_trip_ms": self._last_trip_ms,
+                "heartbeats_sent": self._heartbeats_sent,
+                "heartbeats_failed": self._heartbeats_failed,
+                "heartbeats_withheld": self._heartbeats_withheld,
+                "wake_jitter_ms": self.jitter.summary(include_buckets=include_buckets),
+                "heartbeat_gap_ms": self.heartbeat_gap.summary(include_buckets=include_buckets),
+            }
+
+    def reset(self) -> None:
+        self.jitter.reset()
+        self.heartbeat_gap.reset()
+        with self._lock:
+            self._trips = 0
+            self._heartbeats_sent = 0
+            self._heartbeats_failed = 0
+            self._heartbeats_withheld = 0
+
+
+# 创建全局安全看门狗实例
+safety_watchdog = SafetyWatchdog()
@@ -0,0 +1,140 @@
+"""
+原始振动波形服务
+接收原始振动波形块，保存最近一段时间的波形（供时频分析使用），
+并用频谱引擎计算最新的振动指标
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.spectrum_engine import SpectrumEngine, SpectrumResult
+from app.utils.logger import get_logger
+
+logger = get_logger("waveform-service")
+
+
+class WaveformBlock(NamedTuple):
+    timestamp_ms: int           # 块首样本的墙钟时间（毫秒）
+    t_mono: float               # 接收时刻（time.monotonic）
+    sample_rate: float
+    samples: np.ndarray         # float32，单位与 VibrationMetrics.amplitude 一致
+
+    @property
+    def duration_ms(self) -> float:
+        return len(self.samples) * 1000.0 / self.sample_rate
+
+
+WaveformListener = Callable[[WaveformBlock, SpectrumResult], None]
+
+
+class WaveformService:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._listeners: List[WaveformListener] = []
+        self._blocks: Deque[WaveformBlock] = deque()
+        self._buffered_seconds = 0.0
+        self._latest: Optional[SpectrumResult] = None
+        self._latest_t: Optional[float] = None
+        self._blocks_processed = 0
+        self.engine = SpectrumEngine(
+            nperseg=settings.SPECTRUM_NPERSEG,
+            overlap=settings.SPECTRUM_OVERLAP,
+            window=settings.SPECTRUM_WINDOW,
+            bands=settings.SPECTRUM_BANDS,
+            impulse_threshold=settings.SPECTRUM_IMPULSE_THRESHOLD,
+        )
+
+    def ingest(self, samples: np.ndarray, sample_rate: float, timestamp_ms: Optional[int] = None) -> SpectrumResult:
+        """保存一个波形块并计算频谱指标"""
+        samples = np.asarray(samples, dtype=np.float32)
+        t_mono = time.monotonic()
+        if timestamp_ms is None:
+            # 未给出时间戳时认为块刚刚采集完成
+            timestamp_ms = int(time.time() * 1000 - len(samples) * 1000.0 / sample_rate)
+        block = WaveformBlock(int(timestamp_ms), t_mono, float(sample_rate), samples)
+
+        result = self.engine.analyze(samples, sample_rate)
+
+        with self._lock:
+            self._blocks.append(block)
+            self._buffered_seconds += len(samples) / sample_rate
+            while self._buffered_seconds > settings.WAVEFORM_BUFFER_SECONDS and len(self._blocks) > 1:
+                old = self._blocks.popleft()
+                self._buffered_seconds -= len(old.samples) / old.sample_rate
+            self._latest = result
+            self._latest_t = t_mono
+            self._blocks_processed += 1
+        for listener in self._listeners:
+            try:
+                listener(block, result)
+            except Exception as e:
+                logger.error(f"波形块回调失败: {e}", exc_info=True)
+        return result
+
+    def add_listener(self, listener: WaveformListener) -> None:
+        """注册新波形块回调 (block, result)，在 ingest 调用方的线程中执行"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def latest(self) -> Optional[SpectrumResult]:
+        """最新的频谱结果；超过 WAVEFORM_STALE_TIMEOUT 未更新则返回 None"""
+        with self._lock:
+            if self._latest is None or time.monotonic() - self._latest_t > settings.WAVEFORM_STALE_TIMEOUT:
+                return None
+            return self._latest
+
+    @property
+    def blocks_processed(self) -> int:
+        """累计接收的波形块数，缓存方据此判断结果是否过期"""
+        return self._blocks_processed
+
+    def blocks_between(self, start_ms: int, end_ms: int) -> List[WaveformBlock]:
+        with self._lock:
+            return [
+                b for b in self._blocks
+                if b.timestamp_ms <= end_ms and b.timestamp_ms + b.duration_ms >= start_ms
+            ]
+
+    def retained_range(self) -> Optional[Tuple[int, float]]:
+        """缓冲中波形覆盖的 (最早起点, 最晚终点)（Unix 毫秒）；没有数据时为 None"""
+        with self._lock:
+            if not self._blocks:
+                return None
+            return self._blocks[0].timestamp_ms, max(b.timestamp_ms + b.duration_ms for b in self._blocks)
+
+    def spectrum_snapshot(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._latest
+            age = None if self._latest_t is None else time.monotonic() - self._latest_t
+        if result is None:
+            return None
+        return {
+            "age_s": age,
+            "sample_rate": result.sample_rate,
+            "main_freq": result.main_freq,
+            "rms": result.rms,
+            "peak": result.peak,
+            "impulse_count": result.impulse_count,
+            "bands": [
+                {"low_hz": lo, "high_hz": hi, "energy": energy}
+                for (lo, hi), energy in zip(self.engine.bands, result.band_energy)
+            ],
+            "freqs": result.freqs.tolist(),
+            "psd": result.psd.tolist(),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "blocks_buffered": len(self._blocks),
+                "buffered_seconds": self._buffered_seconds,
+                "blocks_processed": self._blocks_processed,
+            }
+
+
+# 创建全局波形服务实例
+waveform_service = WaveformService()
@@ -0,0 +1,238 @@
+"""
+位置航点队列
+一次上传整串航点（取放等多点定位），轨迹参数（6018/6020/6022）只在开始时写一次；
+之后由遥测管道里轮询到的位置（registers["position"]，5012 解码后的度数）判断到位，
+到位后立即发下一个目标，不额外读寄存器：
+
+- absolute：绝对位置（6006-6007，模式 3）
+- relative_last：相对上次目标（6008-6009，模式 4），期望位置 = 上一个期望位置 + 增量
+- relative_current：相对当前位置（6010-6011，模式 5），期望位置 = 发送时轮询到的位置 + 增量
+
+到位判定：|位置 - 期望位置| ≤ 容差，且连续 WAYPOINT_SETTLE_SAMPLES 个样本保持。
+判定在管道消费者中完成（O(1)），写寄存器交给执行线程，避免阻塞轮询
+"""
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from app.core.config import settings
+from app.services.modbus_service import modbus_service
+from app.services.telemetry_pipeline import TelemetrySample
+from app.utils.logger import get_logger
+
+logger = get_logger("waypoint-service")
+
+EMPTY_MODE = 0xFFFF
+KIND_MODES = {"absolute": 3, "relative_last": 4, "relative_current": 5}
+
+
+class Waypoint(NamedTuple):
+    position: float          # 度；relative_* 时为增量
+    kind: str = "absolute"
+    dwell: float = 0.0       # 到位后停留时间（秒）
+
+
+class WaypointExecutor:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sequence_id = 0
+        self._waypoints: List[Waypoint] = []
+        self._tolerance = settings.WAYPOINT_TOLERANCE
+        self._state = "idle"             # idle / running / completed / cancelled / failed
+        self._message = ""
+        self._index = -1                 # 当前正在前往的航点
+        self._pending_send = False       # 执行线程尚未发出当前航点
+        self._stop_requested = False     # 超时后由执行线程停机
+        self._expected: Optional[float] = None
+        self._last_expected: Optional[float] = None
+        self._position: Optional[float] = None
+        self._in_tolerance = 0
+        self._sent_mono: Optional[float] = None
+        self._arrivals: List[Dict[str, float]] = []
+
+    # ========== 提交 / 取消 ==========
+
+    def submit(
+        self,
+        waypoints: Sequence[Waypoint],
+        tolerance: Optional[float] = None,
+        max_speed_erpm: Optional[int] = None,
+        max_accel: Optional[int] = None,
+        max_decel: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        if not waypoints:
+            raise ValueError("航点序列不能为空")
+        for wp in waypoints:
+            if wp.kind not in KIND_MODES:
+                raise ValueError(f"不支持的航点类型: {wp.kind}")
+            if wp.dwell < 0:
+                raise ValueError("停留时间不能为负")
+        with self._lock:
+            if self._state == "running":
+                raise RuntimeError(f"航点序列 {self._sequence_id} 正在执行")
+            if waypoints[0].kind == "relative_current" and self._position is None:
+                raise ValueError("尚未收到位置数据，无法以当前位置为基准")
+            self._sequence_id += 1
+            self._waypoints = list(waypoints)
+            self._tolerance = tolerance if tolerance is not None else settings.WAYPOINT_TOLERANCE
+            self._state = "running"
+            self._message = ""
+            self._index = -1
+            self._stop_requested = False
+            self._expected = None
+            self._last_expected = self._position
+            self._arrivals = []
+
+        # 轨迹参数整串只写一次
+        if max_speed_erpm:
+            modbus_service.set_max_speed(max_speed_erpm)
+        if max_accel:
+            modbus_service.set_max_acceleration(max_accel)
+        if max_decel:
+            modbus_service.set_max_deceleration(max_decel)
+
+        with self._lock:
+            self._advance_locked()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="waypoint-executor", daemon=True)
+                self._thread.start()
+        logger.info(f"航点序列 {self._sequence_id} 开始: {len(waypoints)} 个航点，容差 {self._tolerance}°")
+        return self.progress()
+
+    def cancel(self, stop: bool = True) -> Dict[str, Any]:
+        with self._lock:
+            if self._state == "running":
+                self._state = "cancelled"
+                self._pending_send = False
+        if stop and settings.USE_MODBUS:
+            if not modbus_service.set_mode(EMPTY_MODE, use_empty_mode=False):
+                logger.error("取消航点序列：切换空模式失败")
+        logger.info("航点序列已取消" + ("，电机已停止" if stop else ""))
+        return self.progress()
+
+    # ========== 到位判定（管道消费者）==========
+
+    def on_sample(self, sample: TelemetrySample) -> None:
+        # 回放的位置不是驱动器当前位置，不能用于到位判定
+        if sample.replayed or sample.registers is None or "position" not in sample.registers:
+            return
+        position = sample.registers["position"]
+        with self._lock:
+            self._position = position
+            if self._state != "running" or self._pending_send or self._expected is None:
+                return
+            if abs(position - self._expected) <= self._tolerance:
+                self._in_tolerance += 1
+            else:
+                self._in_tolerance = 0
+            if self._in_tolerance >= settings.WAYPOINT_SETTLE_SAMPLES:
+                self._arrivals.append({
+                    "index": self._index,
+                    "target": self._expected,
+                    "position": position,
+                    "move_seconds": sample.t_mono - self._sent_mono,
+                })
+                self._advance_locked()
+            elif sample.t_mono - self._sent_mono > settings.WAYPOINT_TIMEOUT:
+                self._state = "failed"
+                self._message = f"航点 {self._index} 超时未到位（目标 {self._expected:.2f}°，当前 {position:.2f}°）"
+                self._stop_requested = True
+                self._wakeup.set()
+
+    def _advance_locked(self) -> None:
+        """切换到下一个航点（由执行线程发送）；全部完成时结束"""
+        self._index += 1
+        self._in_tolerance = 0
+        if self._index >= len(self._waypoints):
+            self._state = "completed"
+            self._expected = None
+            logger.info(f"航点序列 {self._sequence_id} 完成")
+        else:
+            self._pending_send = True
+        self._wakeup.set()
+
+    # ========== 执行线程 ==========
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            with self._lock:
+                stop, self._stop_requested = self._stop_requested, False
+                index = self._index if self._state == "running" and self._pending_send else None
+                waypoint = self._waypoints[index] if index is not None else None
+                previous = self._waypoints[index - 1] if index else None
+            if stop:
+                logger.error(f"航点序列 {self._sequence_id} 失败，停机: {self._message}")
+                if settings.USE_MODBUS:
+                    modbus_service.set_mode(EMPTY_MODE, use_empty_mode=False)
+            if waypoint is None:
+                continue
+            # 上一个航点的停留时间
+            if previous is not None and previous.dwell > 0:
+                time.sleep(previous.dwell)
+            try:
+                self._send(index, waypoint, previous)
+            except Exception as e:
+                logger.error(f"发送航点 {index} 失败: {e}", exc_info=True)
+                with self._lock:
+                    if self._state == "running":
+                        self._state = "failed"
+                        self._message = f"发送航点 {index} 失败: {e}"
+                if settings.USE_MODBUS:
+                    modbus_service.set_mode(EMPTY_MODE, use_empty_mode=False)
+
+    def _send(self, index: int, waypoint: Waypoint, previous: Optional[Waypoint]) -> None:
+        with self._lock:
+            if self._state != "running" or self._index != index:
+                return
+            base = self._last_expected if waypoint.kind == "relative_last" else self._position
+            if waypoint.kind != "absolute" and base is None:
+                raise RuntimeError("尚未收到位置数据，无法计算相对航点的期望位置")
+            expected = waypoint.position if waypoint.kind == "absolute" else base + waypoint.position
+
+        if settings.USE_MODBUS:
+            if waypoint.kind == "absolute":
+                ok = modbus_service.set_absolute_position(waypoint.position)
+            elif waypoint.kind == "relative_last":
+                ok = modbus_service.set_relative_position_last(waypoint.position)
+            else:
+                ok = modbus_service.set_relative_position_current(waypoint.position)
+            if not ok:
+                raise RuntimeError("写位置寄存器失败")
+            # 绝对位置模式下直接改目标即可；相对模式需要重新进入模式才会按新增量运动
+            if waypoint.kind != "absolute" or previous is None or previous.kind != "absolute":
+                if not modbus_service.set_mode(KIND_MODES[waypoint.kind], use_empty_mode=True):
+                    raise RuntimeError("切换位置模式失败")
+
+        with self._lock:
+            if self._state != "running" or self._index != index:
+                return
+            self._expected = expected
+            self._last_expected = expected
+            self._sent_mono = time.monotonic()
+            self._in_tolerance = 0
+            self._pending_send = False
+        logger.info(f"航点 {index}: {waypoint.kind} {waypoint.position:.2f}°，期望位置 {expected:.2f}°")
+
+    # ========== 状态 ==========
+
+    def progress(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sequence_id": self._sequence_id,
+                "state": self._state,
+                "message": self._message,
+                "index": max(self._index, 0),
+                "total": len(self._waypoints),
+                "target": self._expected,
+                "position": self._position,
+                "tolerance": self._tolerance,
+                "arrivals": list(self._arrivals),
+            }
+
+
+# 创建全局航点执行器实例
+waypoint_executor = WaypointExecutor()
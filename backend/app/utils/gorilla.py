@@ -0,0 +1,263 @@
+"""
+Gorilla 风格的时序压缩编码
+时间戳使用 delta-of-delta 编码，浮点值使用与前值异或（XOR）编码
+
+块格式（小端序）：
+    头部: magic(4s) | 样本数(H) | 列数(H) | 首个时间戳(q) | 末个时间戳(q) | 载荷长度(I)
+    载荷: [长度(I) + 时间戳比特流] + 每列 [长度(I) + 浮点比特流]
+
+头部包含时间范围和载荷长度，读取时可以不解码直接跳过不需要的块。
+"""
+import struct
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+BLOCK_MAGIC = b"GRL1"
+BLOCK_HEADER = struct.Struct("<4sHHqqI")
+MAX_BLOCK_SAMPLES = 0xFFFF      # 样本数字段为 uint16
+_STREAM_LEN = struct.Struct("<I")
+_FLOAT_BITS = struct.Struct(">d")
+_UINT64 = struct.Struct(">Q")
+
+# delta-of-delta 分桶：(前缀值, 前缀位数, 数值位数)
+_DOD_BUCKETS = (
+    (0b10, 2, 7),
+    (0b110, 3, 9),
+    (0b1110, 4, 12),
+)
+
+
+class BlockHeader(NamedTuple):
+    count: int
+    columns: int
+    t_first: int
+    t_last: int
+    payload_len: int
+
+
+class BitWriter:
+    """按位写入，满 64 位后落盘到 bytearray"""
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._acc = 0
+        self._nbits = 0
+
+    def write(self, value: int, nbits: int) -> None:
+        self._acc = (self._acc << nbits) | (value & ((1 << nbits) - 1))
+        self._nbits += nbits
+        if self._nbits >= 64:
+            extra = self._nbits - 64
+            self._buf += _UINT64.pack(self._acc >> extra)
+            self._acc &= (1 << extra) - 1
+            self._nbits = extra
+
+    def getvalue(self) -> bytes:
+        if self._nbits == 0:
+            return bytes(self._buf)
+        nbytes = (self._nbits + 7) // 8
+        tail = self._acc << (nbytes * 8 - self._nbits)
+        return bytes(self._buf) + tail.to_bytes(nbytes, "big")
+
+
+class BitReader:
+    """按位读取，每次最多取 64 位，单次读取为 O(1)"""
+
+    def __init__(self, data: bytes) -> None:
+        # 末尾补零，保证任意位置都能取满 9 个字节
+        self._data = bytes(data) + b"\x00" * 9
+        self._pos = 0
+
+    def read(self, nbits: int) -> int:
+        byte_index = self._pos >> 3
+        offset = self._pos & 7
+        chunk = int.from_bytes(self._data[byte_index:byte_index + 9], "big")
+        self._pos += nbits
+        return (chunk >> (72 - offset - nbits)) & ((1 << nbits) - 1)
+
+    def read_bit(self) -> int:
+        byte = self._data[self._pos >> 3]
+        bit = (byte >> (7 - (self._pos & 7))) & 1
+        self._pos += 1
+        return bit
+
+
+def _encode_timestamps(timestamps: Sequence[int]) -> bytes:
+    """首个时间戳存在块头，这里从第二个开始编码 delta-of-delta"""
+    writer = BitWriter()
+    prev = timestamps[0]
+    prev_delta = 0
+    for ts in timestamps[1:]:
+        delta = ts - prev
+        dod = delta - prev_delta
+        prev = ts
+        prev_delta = delta
+        if dod == 0:
+            writer.write(0, 1)
+            continue
+        for prefix, prefix_bits, value_bits in _DOD_BUCKETS:
+            limit = 1 << (value_bits - 1)
+            if -limit < dod <= limit:
+                writer.write(prefix, prefix_bits)
+                writer.write(dod, value_bits)
+                break
+        else:
+            writer.write(0b1111, 4)
+            writer.write(dod, 64)
+    return writer.getvalue()
+
+
+def _decode_timestamps(data: bytes, t_first: int, count: int) -> List[int]:
+    reader = BitReader(data)
+    timestamps = [t_first]
+    prev = t_first
+    prev_delta = 0
+    for _ in range(count - 1):
+        if reader.read_bit() == 0:
+            dod = 0
+        else:
+            if reader.read_bit() == 0:
+                value_bits = 7
+            elif reader.read_bit() == 0:
+                value_bits = 9
+            elif reader.read_bit() == 0:
+                value_bits = 12
+            else:
+                value_bits = 64
+            dod = reader.read(value_bits)
+            if dod > (1 << (value_bits - 1)):
+                dod -= 1 << value_bits
+        prev_delta += dod
+        prev += prev_delta
+        timestamps.append(prev)
+    return timestamps
+
+
+def _encode_floats(values: Sequence[float]) -> bytes:
+    writer = BitWriter()
+    prev_bits = int.from_bytes(_FLOAT_BITS.pack(values[0]), "big")
+    writer.write(prev_bits, 64)
+    prev_leading = -1
+    prev_trailing = 0
+    for value in values[1:]:
+        bits = int.from_bytes(_FLOAT_BITS.pack(value), "big")
+        xor = bits ^ prev_bits
+        prev_bits = bits
+        if xor == 0:
+            writer.write(0, 1)
+            continue
+        leading = min(64 - xor.bit_length(), 31)
+        trailing = (xor & -xor).bit_length() - 1
+        if prev_leading >= 0 and leading >= prev_leading and trailing >= prev_trailing:
+            # 复用上一个有效位窗口
+            writer.write(0b10, 2)
+            meaningful = 64 - prev_leading - prev_trailing
+            writer.write(xor >> prev_trailing, meaningful)
+        else:
+            meaningful = 64 - leading - trailing
+            writer.write(0b11, 2)
+            writer.write(leading, 5)
+            # 有效位长度 64 用 0 表示
+            writer.write(meaningful & 0x3F, 6)
+            writer.write(xor >> trailing, meaningful)
+            prev_leading = leading
+            prev_trailing = trailing
+    return writer.getvalue()
+
+
+def _decode_floats(data: bytes, count: int) -> List[float]:
+    reader = BitReader(data)
+    bits = reader.read(64)
+    values = [_FLOAT_BITS.unpack(bits.to_bytes(8, "big"))[0]]
+    leading = 0
+    trailing = 0
+    for _ in range(count - 1):
+        if reader.read_bit() == 1:
+            if reader.read_bit() == 1:
+                leading = reader.read(5)
+                meaningful = reader.read(6) or 64
+                trailing = 64 - leading - meaningful
+            meaningful = 64 - leading - trailing
+            bits ^= reader.read(meaningful) << trailing
+        values.append(_FLOAT_BITS.unpack(bits.to_bytes(8, "big"))[0])
+    return values
+
+
+def encode_block(timestamps: Sequence[int], columns: Sequence[Sequence[float]]) -> bytes:
+    """
+    编码一个数据块
+
+    Args:
+        timestamps: 毫秒时间戳列表（单调不减）
+        columns: 浮点列列表，每列长度与 timestamps 相同
+
+    Returns:
+        块的完整字节（头部 + 载荷）
+    """
+    count = len(timestamps)
+    if count == 0:
+        raise ValueError("空数据块无法编码")
+    if count > MAX_BLOCK_SAMPLES:
+        raise ValueError(f"每块最多 {MAX_BLOCK_SAMPLES} 个样本")
+    if any(len(col) != count for col in columns):
+        raise ValueError("列长度与时间戳数量不一致")
+
+    streams = [_encode_timestamps(timestamps)]
+    streams.extend(_encode_floats(col) for col in columns)
+    payload = b"".join(_STREAM_LEN.pack(len(s)) + s for s in streams)
+    header = BLOCK_HEADER.pack(
+        BLOCK_MAGIC, count, len(columns), int(timestamps[0]), int(timestamps[-1]), len(payload)
+    )
+    return header + payload
+
+
+def decode_payload(header: BlockHeader, payload: bytes) -> Tuple[List[int], List[List[float]]]:
+    """解码块载荷，返回 (时间戳列表, 列列表)"""
+    view = memoryview(payload)
+    offset = 0
+    streams = []
+    for _ in range(header.columns + 1):
+        (length,) = _STREAM_LEN.unpack_from(view, offset)
+        offset += _STREAM_LEN.size
+        streams.append(bytes(view[offset:offset + length]))
+        offset += length
+    timestamps = _decode_timestamps(streams[0], header.t_first, header.count)
+    columns = [_decode_floats(s, header.count) for s in streams[1:]]
+    return timestamps, columns
+
+
+def decode_block(data: bytes) -> Tuple[List[int], List[List[float]]]:
+    """解码 encode_block 产生的完整字节"""
+    header = parse_header(data[:BLOCK_HEADER.size])
+    if header is None:
+        raise ValueError("无效的数据块头部")
+    return decode_payload(header, data[BLOCK_HEADER.size:BLOCK_HEADER.size + header.payload_len])
+
+
+def parse_header(raw: bytes) -> Optional[BlockHeader]:
+    if len(raw) < BLOCK_HEADER.size:
+        return None
+    magic, count, columns, t_first, t_last, payload_len = BLOCK_HEADER.unpack_from(raw)
+    if magic != BLOCK_MAGIC:
+        return None
+    return BlockHeader(count, columns, t_first, t_last, payload_len)
+
+
+def iter_block_headers(fp: BinaryIO, limit: Optional[int] = None) -> Iterator[Tuple[BlockHeader, int]]:
+    """
+    顺序扫描文件中的块头，返回 (头部, 载荷偏移)，不读取载荷
+    遇到截断或损坏的块时停止（通常是写入过程中断电）；limit 给出时只扫描文件前 limit 字节
+    """
+    start = fp.tell()
+    fp.seek(0, 2)
+    end = fp.tell() if limit is None else min(fp.tell(), limit)
+    fp.seek(start)
+    while True:
+        raw = fp.read(BLOCK_HEADER.size)
+        header = parse_header(raw)
+        if header is None:
+            return
+        offset = fp.tell()
+        if offset + header.payload_len > end:
+            return
+        fp.seek(offset + header.payload_len)
+        yield header, offset
@@ -0,0 +1,89 @@
+"""
+对数分桶的延迟直方图
+桶边界按几何级数分布（默认 10µs ~ 100s，每十倍 20 个桶，相对误差约 12%），
+记录为一次二分查找 + 计数加一，内存固定；分位数按桶内几何插值估计
+"""
+import threading
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+
+class LatencyHistogram:
+    def __init__(self, min_seconds: float = 1e-5, max_seconds: float = 100.0, buckets_per_decade: int = 20) -> None:
+        decades = np.log10(max_seconds / min_seconds)
+        self.edges = np.geomspace(min_seconds, max_seconds, int(round(decades * buckets_per_decade)) + 1)
+        # 第 0 个桶收 < min_seconds，最后一个桶收 >= max_seconds
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        seconds = float(seconds)
+        i = int(np.searchsorted(self.edges, seconds, side="right"))
+        with self._lock:
+            self.counts[i] += 1
+            self.total += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts[:] = 0
+            self.total = 0
+            self.sum = 0.0
+            self.max = 0.0
+
+    def quantiles(self, qs: Sequence[float]) -> Dict[float, Optional[float]]:
+        with self._lock:
+            counts = self.counts.copy()
+            total, peak = self.total, self.max
+        if total == 0:
+            return {q: None for q in qs}
+        cumulative = np.cumsum(counts)
+        result = {}
+        for q in qs:
+            rank = q * total
+            i = int(np.searchsorted(cumulative, rank, side="left"))
+            if i == 0:
+                value = self.edges[0]
+            elif i > len(self.edges) - 1:
+                value = peak
+            else:
+                lo, hi = self.edges[i - 1], self.edges[i]
+                before = cumulative[i] - counts[i]
+                frac = (rank - before) / counts[i] if counts[i] else 1.0
+                value = lo * (hi / lo) ** min(max(frac, 0.0), 1.0)
+            result[q] = float(min(value, peak))
+        return result
+
+    def summary(self, scale: float = 1000.0, include_buckets: bool = False) -> Dict[str, Any]:
+        """统计摘要，数值乘以 scale（默认输出毫秒）"""
+        q = self.quantiles((0.5, 0.9, 0.99, 0.999))
+        with self._lock:
+            total, total_sum, peak = self.total, self.sum, self.max
+            counts = self.counts.copy()
+
+        def scaled(v: Optional[float]) -> Optional[float]:
+            return None if v is None else float(v * scale)
+
+        result: Dict[str, Any] = {
+            "count": total,
+            "mean": scaled(total_sum / total) if total else None,
+            "p50": scaled(q[0.5]),
+            "p90": scaled(q[0.9]),
+            "p99": scaled(q[0.99]),
+            "p999": scaled(q[0.999]),
+            "max": scaled(peak) if total else None,
+        }
+        if include_buckets:
+            nonzero = np.nonzero(counts)[0]
+            upper = np.append(self.edges, np.inf)
+            result["buckets"] = [
+                {"le": None if np.isinf(upper[i]) else float(upper[i] * scale), "count": int(counts[i])}
+                for i in nonzero
+            ]
+        return result
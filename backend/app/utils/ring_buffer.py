@@ -0,0 +1,62 @@
+"""
+定长数值环形缓冲
+预分配 float64 二维数组，按列名访问，写入不分配内存，读取时按时间顺序返回拷贝
+"""
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+
+class RingBuffer:
+    def __init__(self, capacity: int, fields: Sequence[str]) -> None:
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        self._index: Dict[str, int] = {name: i for i, name in enumerate(self.fields)}
+        self._data = np.zeros((capacity, len(self.fields)), dtype=np.float64)
+        self._total = 0
+
+    def __len__(self) -> int:
+        return min(self._total, self.capacity)
+
+    @property
+    def total(self) -> int:
+        """累计写入的行数（含已被覆盖的行），可作为行序号"""
+        return self._total
+
+    def append(self, row: Iterable[float]) -> None:
+        self._data[self._total % self.capacity] = row
+        self._total += 1
+
+    def extend(self, rows: np.ndarray) -> None:
+        """批量写入二维数组（行数可以超过容量，只保留最后 capacity 行）"""
+        n = len(rows)
+        if n == 0:
+            return
+        if n > self.capacity:
+            self._total += n - self.capacity
+            rows = rows[-self.capacity:]
+            n = self.capacity
+        start = self._total % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = rows[:first]
+        if first < n:
+            self._data[:n - first] = rows[first:]
+        self._total += n
+
+    def latest(self, n: Optional[int] = None) -> np.ndarray:
+        """按写入顺序返回最后 n 行（默认全部保留的行）"""
+        size = len(self)
+        n = size if n is None else min(n, size)
+        idx = np.arange(self._total - n, self._total) % self.capacity
+        return self._data[idx]
+
+    def since(self, seq: int) -> np.ndarray:
+        """返回行序号 >= seq 且仍在缓冲内的行"""
+        seq = max(seq, self._total - len(self))
+        return self.latest(self._total - seq) if seq < self._total else self._data[:0]
+
+    def column_index(self, name: str) -> int:
+        return self._index[name]
+
+    def clear(self) -> None:
+        self._total = 0
@@ -0,0 +1,15 @@
+"""
+时间换算
+查询接口的时间参数统一按此换算：未带时区的 datetime 按 UTC 处理，与服务器本地时区无关
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def to_ms(value: Optional[datetime]) -> Optional[int]:
+    """datetime → Unix 毫秒；None 原样返回"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
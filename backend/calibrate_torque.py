@@ -0,0 +1,164 @@
+"""
+转矩标定表生成工具
+由录制数据拟合 电流 × 温度 → 转矩 标定表（CSV，供 XMOTOR_TORQUE_TABLE_FILE 使用）
+
+标定流程：
+  1. 开启原始寄存器抓取（XMOTOR_CAPTURE_ENABLED=true），在测功机/转矩传感器上按一系列
+     电流设定值运行，覆盖冷机到热机的温度范围
+  2. 同时记录参考转矩（CSV：timestamp_ms,torque_nm，墙钟毫秒）
+  3. 运行本工具：按时间把抓取记录中的电流/温度与参考转矩对齐，拟合标定表
+       python calibrate_torque.py --capture data/capture/raw_registers.bin --reference dyno.csv \\
+           --temperatures 25 45 65 85 --max-current 20 --output torque_table.csv
+     也可以直接给出已对齐的样本（CSV：current_a,temperature_c,torque_nm）：
+       python calibrate_torque.py --samples samples.csv --output torque_table.csv
+  4. 设置 XMOTOR_TORQUE_TABLE_FILE=torque_table.csv，
+     调用 POST /api/control/torque-model/reload 或重启后端生效
+
+拟合方法：标定表在评估时做双线性插值，因此每个样本的转矩是 4 个相邻网格值的线性组合；
+对所有样本解带平滑正则的最小二乘（正规方程，向量化累加），无样本的网格由平滑项外推，
+最后保证每个温度下转矩随电流严格递增（反查电流的前提）
+"""
+import sys
+import csv
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到 Python 路径
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from app.core.config import settings
+from app.services.torque_model import TorqueModel
+
+
+def load_capture_samples(capture: str, reference: str, max_gap_ms: float):
+    """抓取记录（电流/温度）与参考转矩按时间对齐"""
+    from app.services.replay_service import iter_capture_frames
+
+    t, current, temperature = [], [], []
+    for frame in iter_capture_frames(capture):
+        t.append(frame.timestamp_ms)
+        current.append(abs(frame.registers["motor_current"]))
+        temperature.append(frame.registers["temperature"])
+    if not t:
+        raise SystemExit(f"抓取文件中没有轮询记录: {capture}")
+    t = np.array(t, dtype=np.float64)
+
+    with open(reference, newline="", encoding="utf-8") as f:
+        rows = [(float(r["timestamp_ms"]), float(r["torque_nm"])) for r in csv.DictReader(f)]
+    ref = np.array(sorted(rows))
+    ref_t, ref_torque = ref[:, 0], np.abs(ref[:, 1])
+
+    # 只保留两侧参考样本都足够近的点，避免跨越记录中断插值
+    right = np.clip(np.searchsorted(ref_t, t), 1, len(ref_t) - 1)
+    gap = np.maximum(np.abs(t - ref_t[right - 1]), np.abs(ref_t[right] - t))
+    keep = (t >= ref_t[0]) & (t <= ref_t[-1]) & (gap <= max_gap_ms)
+    torque = np.interp(t[keep], ref_t, ref_torque)
+    print(f"  抓取记录 {len(t)} 条，参考转矩 {len(ref_t)} 条，对齐后 {int(keep.sum())} 条")
+    return np.array(current)[keep], np.array(temperature)[keep], torque
+
+
+def load_sample_csv(path: str):
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [(float(r["current_a"]), float(r["temperature_c"]), float(r["torque_nm"])) for r in csv.DictReader(f)]
+    data = np.array(rows)
+    print(f"  样本 {len(data)} 条")
+    return np.abs(data[:, 0]), data[:, 1], np.abs(data[:, 2])
+
+
+def bilinear_weights(values: np.ndarray, grid: np.ndarray):
+    """每个值在网格上的 (左下标, 右权重)，超出范围时取边界"""
+    if len(grid) == 1:
+        return np.zeros(len(values), dtype=np.int64), np.zeros(len(values))
+    v = np.clip(values, grid[0], grid[-1])
+    i = np.clip(np.searchsorted(grid, v, side="right") - 1, 0, len(grid) - 2)
+    return i, (v - grid[i]) / (grid[i + 1] - grid[i])
+
+
+def fit_table(current, temperature, torque, currents, temperatures, smoothing: float) -> np.ndarray:
+    nt, nc = len(temperatures), len(currents)
+    ci, cw = bilinear_weights(current, currents)
+    ti, tw = bilinear_weights(temperature, temperatures)
+    ti2 = np.minimum(ti + 1, nt - 1)
+
+    # 每个样本的 4 个 (网格下标, 权重)
+    cells = np.stack([ti * nc + ci, ti * nc + ci + 1, ti2 * nc + ci, ti2 * nc + ci + 1], axis=1)
+    weights = np.stack([(1 - tw) * (1 - cw), (1 - tw) * cw, tw * (1 - cw), tw * cw], axis=1)
+
+    n = nt * nc
+    ata = np.zeros((n, n))
+    np.add.at(ata, (cells[:, :, None], cells[:, None, :]), weights[:, :, None] * weights[:, None, :])
+    atb = np.bincount(cells.ravel(), weights=(weights * torque[:, None]).ravel(), minlength=n)
+
+    # 平滑正则：电流方向和温度方向的二阶差分
+    scale = smoothing * max(1.0, len(torque) / n)
+    penalty = np.zeros((n, n))
+    for row in range(nt):
+        for col in range(1, nc - 1):
+            d = np.zeros(n)
+            d[[row * nc + col - 1, row * nc + col, row * nc + col + 1]] = (1, -2, 1)
+            penalty += np.outer(d, d)
+    for col in range(nc):
+        for row in range(1, nt - 1):
+            d = np.zeros(n)
+            d[[(row - 1) * nc + col, row * nc + col, (row + 1) * nc + col]] = (1, -2, 1)
+            penalty += np.outer(d, d)
+    # 极小的零阶项保证矩阵可逆（没有任何样本的温度列）
+    system = ata + scale * penalty + 1e-9 * np.eye(n)
+    table = np.linalg.solve(system, atb).reshape(nt, nc)
+
+    # 保证严格递增
+    table = np.maximum(table, 0.0)
+    step = 1e-6 * max(1.0, float(table.max()))
+    table = np.maximum.accumulate(table + step * np.arange(nc), axis=1)
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="由录制数据拟合电流×温度→转矩标定表")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--capture", help="原始寄存器抓取文件（配合 --reference 使用）")
+    source.add_argument("--samples", help="已对齐的样本 CSV：current_a,temperature_c,torque_nm")
+    parser.add_argument("--reference", help="参考转矩 CSV：timestamp_ms,torque_nm")
+    parser.add_argument("--max-gap-ms", type=float, default=50.0, help="对齐时允许的最大参考样本间隔（毫秒）")
+    parser.add_argument("--max-current", type=float, help="电流网格上限（A），默认取样本最大值向上取整")
+    parser.add_argument("--current-points", type=int, default=21, help="电流网格点数")
+    parser.add_argument("--temperatures", type=float, nargs="+", default=[25.0, 50.0, 75.0], help="温度网格（℃）")
+    parser.add_argument("--smoothing", type=float, default=1e-3, help="平滑正则强度")
+    parser.add_argument("--output", default="torque_table.csv", help="输出标定表路径")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("转矩标定表拟合")
+    print("=" * 60)
+    if args.capture:
+        if not args.reference:
+            parser.error("--capture 需要同时提供 --reference")
+        current, temperature, torque = load_capture_samples(args.capture, args.reference, args.max_gap_ms)
+    else:
+        current, temperature, torque = load_sample_csv(args.samples)
+    if len(current) == 0:
+        raise SystemExit("没有可用的样本")
+
+    max_current = args.max_current or float(np.ceil(current.max()))
+    currents = np.linspace(0.0, max_current, args.current_points)
+    temperatures = np.array(sorted(args.temperatures))
+    table = fit_table(current, temperature, torque, currents, temperatures, args.smoothing)
+    model = TorqueModel(currents, temperatures, table, source=args.output)
+
+    fitted = model.torque(current, temperature)
+    linear = current * settings.TORQUE_CURRENT_RATIO
+    print("\n[拟合结果]")
+    print(f"  网格: {len(currents)} 个电流点 (0 ~ {max_current:.2f} A) × 温度 {', '.join(f'{t:g}' for t in temperatures)} ℃")
+    print(f"  标定表残差 RMS:   {np.sqrt(np.mean((fitted - torque) ** 2)):.4f} N·m")
+    print(f"  线性模型残差 RMS: {np.sqrt(np.mean((linear - torque) ** 2)):.4f} N·m"
+          f"（TORQUE_CURRENT_RATIO={settings.TORQUE_CURRENT_RATIO}）")
+
+    model.to_csv(args.output)
+    print(f"\n已写入 {args.output}，设置 XMOTOR_TORQUE_TABLE_FILE={args.output} 后生效")
+
+
+if __name__ == "__main__":
+    main()
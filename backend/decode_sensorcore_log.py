@@ -0,0 +1,48 @@
+"""
+SensorCore 原始字节日志批量解码工具
+把串口录制的原始字节流解析为 CSV，并输出帧统计和解析吞吐量
+
+用法示例：
+    python decode_sensorcore_log.py sensorcore_raw.bin > frames.csv
+    python decode_sensorcore_log.py sensorcore_raw.bin --stats-only
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from app.services.sensorcore_protocol import SensorCoreFrame, SensorCoreParser, iter_frames_from_stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SensorCore 原始字节日志解码工具")
+    parser.add_argument("path", help="原始字节日志文件")
+    parser.add_argument("--stats-only", action="store_true", help="只输出统计信息，不输出 CSV")
+    args = parser.parse_args()
+
+    frame_parser = SensorCoreParser()
+    start = time.perf_counter()
+    count = 0
+    with open(args.path, "rb") as fp:
+        if not args.stats_only:
+            print(",".join(SensorCoreFrame._fields))
+        for frame in iter_frames_from_stream(fp, frame_parser):
+            count += 1
+            if not args.stats_only:
+                print(",".join(str(v) for v in frame))
+    elapsed = time.perf_counter() - start
+
+    stats = frame_parser.stats()
+    print(f"有效帧: {stats['frames']}, 重同步: {stats['resyncs']}, "
+          f"长度错误: {stats['length_errors']}, 帧尾错误: {stats['footer_errors']}, "
+          f"校验错误: {stats['checksum_errors']}, 丢弃字节: {stats['bytes_discarded']}", file=sys.stderr)
+    if elapsed > 0:
+        print(f"解析吞吐: {count / elapsed:,.0f} 帧/秒, {stats['bytes_received'] / elapsed / 1e6:.1f} MB/秒", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
 from app.services.modbus_service import modbus_service
+from app.services.torque_model import torque_model
 from app.core.config import settings
 
 
@@ -21,6 +22,7 @@ def diagnose_torque():
     
     print(f"\n配置信息:")
     print(f"  转矩转换系数 (TORQUE_CURRENT_RATIO): {settings.TORQUE_CURRENT_RATIO}")
+    print(f"  转矩标定表 (TORQUE_TABLE_FILE): {settings.TORQUE_TABLE_FILE or '未配置，使用线性系数'}")
     print(f"  电流寄存器地址 (REG_INPUT_MOTOR_CURRENT): {settings.REG_INPUT_MOTOR_CURRENT}")
     
     # 检查连接
@@ -71,8 +73,11 @@ def diagnose_torque():
     
     # 计算转矩
     print(f"\n[4] 计算转矩:")
-    print(f"  公式: 转矩(Nm) = 电流(A) × 系数")
-    print(f"  计算: {abs(current):.6f} A × {settings.TORQUE_CURRENT_RATIO} = {abs(current) * settings.TORQUE_CURRENT_RATIO:.6f} Nm")
+    if torque_model.model.source == "linear":
+        print(f"  公式: 转矩(Nm) = 电流(A) × 系数")
+        print(f"  计算: {abs(current):.6f} A × {settings.TORQUE_CURRENT_RATIO} = {abs(current) * settings.TORQUE_CURRENT_RATIO:.6f} Nm")
+    else:
+        print(f"  公式: 电流 × 温度 查转矩标定表 ({torque_model.model.source})")
     
     torque = modbus_service.read_torque()
     if torque is not None:
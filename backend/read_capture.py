@@ -0,0 +1,72 @@
+"""
+原始寄存器抓取文件离线查看工具
+直接解析 capture_service 写出的定长二进制记录，不依赖后端服务运行
+
+用法示例：
+    python read_capture.py data/capture/raw_registers.bin
+    python read_capture.py data/capture/raw_registers.bin.prev --tail 200
+    python read_capture.py data/capture/raw_registers.bin --address 5000 --csv > fault.csv
+"""
+import sys
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from app.services.capture_service import (
+    open_capture,
+    read_header,
+    iter_records,
+    FC_READ_HOLDING,
+    FC_READ_INPUT,
+    FC_WRITE_SINGLE,
+    FC_WRITE_MULTIPLE,
+)
+
+FUNCTION_NAMES = {
+    FC_READ_HOLDING: "R03",
+    FC_READ_INPUT: "R04",
+    FC_WRITE_SINGLE: "W06",
+    FC_WRITE_MULTIPLE: "W10",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="原始寄存器抓取文件查看工具")
+    parser.add_argument("path", help="抓取文件路径")
+    parser.add_argument("--address", type=int, default=None, help="只显示以该地址开始的记录")
+    parser.add_argument("--tail", type=int, default=None, help="只显示最后 N 条记录")
+    parser.add_argument("--csv", action="store_true", help="以 CSV 输出")
+    args = parser.parse_args()
+
+    buf = open_capture(args.path)
+    header = read_header(buf)
+    retained = min(header.write_seq, header.capacity)
+    if not args.csv:
+        print(f"容量: {header.capacity} 条, 累计写入: {header.write_seq} 条, 保留: {retained} 条", file=sys.stderr)
+
+    records = iter_records(buf, header)
+    if args.tail is not None:
+        records = (r for r in records if r.seq >= header.write_seq - args.tail)
+
+    if args.csv:
+        print("seq,t_mono_ns,wall_time,function,slave,address,registers")
+    for record in records:
+        if args.address is not None and record.address != args.address:
+            continue
+        wall = datetime.fromtimestamp(header.to_wall_ns(record.t_mono_ns) / 1e9, tz=timezone.utc)
+        wall_text = wall.isoformat(timespec="milliseconds")
+        function = FUNCTION_NAMES.get(record.function, f"0x{record.function:02X}")
+        if args.csv:
+            regs = " ".join(str(v) for v in record.registers)
+            print(f"{record.seq},{record.t_mono_ns},{wall_text},{function},{record.slave},{record.address},{regs}")
+        else:
+            regs = " ".join(f"{v:04X}" for v in record.registers)
+            print(f"{record.seq:>10} {wall_text} {function} @{record.address:<5} [{regs}]")
+
+
+if __name__ == "__main__":
+    main()
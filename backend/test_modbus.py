@@ -13,6 +13,7 @@ backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
 from app.services.modbus_service import modbus_service
+from app.services.torque_model import torque_model
 from app.core.config import settings
 
 
@@ -105,8 +106,7 @@ def test_read_input_registers():
     if torque is not None:
         print(f"  转矩: {torque:.3f} Nm")
         if current is not None:
-            ratio = settings.TORQUE_CURRENT_RATIO
-            print(f"  (电流: {current:.3f} A × 系数 {ratio} = {torque:.3f} Nm)")
+            print(f"  (电流: {current:.3f} A，转矩模型: {torque_model.model.source})")
     else:
         print("  [FAIL] 读取失败")
     
@@ -9,6 +9,7 @@ backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
 from app.services.modbus_service import modbus_service
+from app.services.torque_model import torque_model
 from app.core.config import settings
 
 
@@ -52,8 +53,11 @@ def test_torque_calculation():
     
     # 验证计算
     print(f"\n[3] 验证计算:")
-    expected_torque = abs(current) * settings.TORQUE_CURRENT_RATIO
-    print(f"  计算: {abs(current):.6f} A × {settings.TORQUE_CURRENT_RATIO} = {expected_torque:.6f} N·m")
+    temperature = modbus_service.read_temperature()
+    if temperature is None:
+        temperature = settings.TORQUE_REFERENCE_TEMPERATURE
+    expected_torque = torque_model.torque(current, temperature)
+    print(f"  计算: 标定模型({torque_model.model.source}) {abs(current):.6f} A @ {temperature:.0f}℃ = {expected_torque:.6f} N·m")
     print(f"  实际: {torque:.6f} N·m")
     
     if abs(torque - expected_torque) < 0.0001: